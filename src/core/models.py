@@ -11,6 +11,9 @@ class Transaction:
     account: str
     category: Optional[str] = None
     subcategory: Optional[str] = None
+    fingerprint: Optional[str] = None
+    page_id: Optional[str] = None
+    is_transfer: bool = False  # Movement between own accounts (stored in "Transferencias")
 
     @property
     def is_expense(self) -> bool:
@@ -23,3 +26,7 @@ class Transaction:
     @property
     def abs_amount(self) -> float:
         return abs(self.amount)
+
+    @property
+    def cents(self) -> int:
+        return int(round(self.amount * 100))
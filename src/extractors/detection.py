@@ -0,0 +1,40 @@
+import os
+from typing import Optional
+
+from src.core.interfaces import BankParserStrategy
+from src.extractors.bbva import BBVAParser, BBVA
+from src.extractors.laboral_kutxa import LaboralKutxaParser
+from src.extractors.revolut import RevolutParser
+from src.extractors.spec import compile_format
+
+SUPPORTED_EXTENSIONS = (".csv", ".xlsx", ".xls")
+
+
+def _read_header(file_path: str) -> str:
+    for encoding in ("utf-8-sig", "latin-1"):
+        try:
+            with open(file_path, encoding=encoding) as f:
+                return f.readline()
+        except UnicodeDecodeError:
+            continue
+    return ""
+
+
+def detect_parser(file_path: str) -> Optional[BankParserStrategy]:
+    """
+    Picks the parser for a statement from its extension and header line.
+    Returns None when the format is not recognised.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in (".xlsx", ".xls"):
+        # Only BBVA exports Excel statements, but any spreadsheet may be dropped in the folder
+        return BBVAParser() if compile_format(BBVA).matches(file_path) else None
+    if ext != ".csv":
+        return None
+
+    header = _read_header(file_path)
+    if "Fecha de inicio" in header and "Comisión" in header:
+        return RevolutParser()
+    if "Fecha valor" in header and ";" in header:
+        return LaboralKutxaParser()
+    return None
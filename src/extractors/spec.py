@@ -0,0 +1,295 @@
+"""
+Declarative bank statement formats.
+
+A BankFormat describes a statement layout (columns, delimiter, date format,
+decimal convention, description rewrites, sign rules). compile_format turns
+it, once per format, into a column pipeline: every row of a file is parsed
+with a handful of vectorized pandas operations instead of a Python loop.
+Adding a bank means writing a BankFormat and a one-line SpecParser subclass.
+"""
+import logging
+import string
+from dataclasses import dataclass
+from datetime import date, datetime
+from functools import lru_cache
+from typing import List, Tuple, Optional, Dict
+
+import pandas as pd
+
+from src.core.interfaces import BankParserStrategy
+from src.core.models import Transaction
+
+logger = logging.getLogger(__name__)
+
+# Excel statements have a preamble before the header row
+HEADER_SEARCH_ROWS = 20
+
+
+@dataclass(frozen=True)
+class DescriptionRule:
+    """When the description contains `contains` (case-insensitive), it becomes `template`."""
+    contains: str
+    template: str  # e.g. "Bizum: {Observaciones}"; fields are column names
+
+
+@dataclass(frozen=True)
+class BankFormat:
+    account: str
+    date_column: str
+    description_column: str
+    amount_column: str
+    date_format: str
+    reader: str = "csv"  # "csv" or "excel"
+    delimiter: str = ","
+    skip_rows: int = 0
+    # "," -> 1.234,56 ; "." -> 1234.56 ; "auto" -> Spanish only when a comma is present
+    decimal: str = ","
+    strip_chars: str = ""  # removed from amounts before parsing (currency symbols, spaces)
+    blank_amount_is_zero: bool = False
+    date_first_token: bool = False  # "01/01/2024 00:00" -> "01/01/2024"
+    fee_column: Optional[str] = None  # subtracted from the amount
+    invert_sign: bool = False  # for banks that export expenses as positive numbers
+    description_rules: Tuple[DescriptionRule, ...] = ()
+
+    @property
+    def required_columns(self) -> List[str]:
+        columns = [self.date_column, self.description_column, self.amount_column]
+        if self.fee_column:
+            columns.append(self.fee_column)
+        return columns
+
+    @property
+    def optional_columns(self) -> List[str]:
+        """Columns used only by description templates: missing ones render as ''."""
+        fields = []
+        for rule in self.description_rules:
+            for _, field, _, _ in string.Formatter().parse(rule.template):
+                if field and field not in self.required_columns and field not in fields:
+                    fields.append(field)
+        return fields
+
+
+class CompiledFormat:
+    """Column pipeline for one BankFormat. Build it with compile_format."""
+
+    def __init__(self, spec: BankFormat):
+        self.spec = spec
+        self.columns = spec.required_columns + spec.optional_columns
+        self.rules = [
+            (rule.contains.lower(), list(string.Formatter().parse(rule.template)))
+            for rule in spec.description_rules
+        ]
+
+    # Reading
+
+    def read(self, file_path: str, limit: Optional[int] = None) -> Tuple[Optional[pd.DataFrame], List[int], List[str]]:
+        """Returns (frame with the format's columns, spreadsheet row numbers, errors)."""
+        if self.spec.reader == "excel" and not file_path.lower().endswith(".xls"):
+            return self._read_xlsx(file_path, limit)
+
+        try:
+            if self.spec.reader == "excel":
+                # Legacy binary format: openpyxl cannot stream it
+                df = pd.read_excel(file_path, skiprows=self.spec.skip_rows, dtype=str, nrows=limit)
+            else:
+                wanted = set(self.columns)
+                df = pd.read_csv(file_path, delimiter=self.spec.delimiter, dtype=str,
+                                 skiprows=self.spec.skip_rows, nrows=limit,
+                                 usecols=lambda column: column in wanted)
+        except Exception as e:
+            kind = "Excel" if self.spec.reader == "excel" else "CSV"
+            return None, [], [f"Error al leer el archivo {kind}: {str(e)}"]
+
+        if not all(col in df.columns for col in self.spec.required_columns):
+            return None, [], [f"El archivo no tiene las columnas requeridas: {self.spec.required_columns}"]
+
+        # +2: 1-based rows plus the header line
+        first_row = self.spec.skip_rows + 2
+        return df, [first_row + i for i in range(len(df))], []
+
+    def _read_xlsx(self, file_path: str, limit: Optional[int]):
+        try:
+            from openpyxl import load_workbook
+            # read_only streams rows from the sheet XML instead of building every cell object
+            workbook = load_workbook(file_path, read_only=True, data_only=True)
+        except Exception as e:
+            return None, [], [f"Error al leer el archivo Excel: {str(e)}"]
+
+        try:
+            rows = enumerate(workbook.worksheets[0].iter_rows(values_only=True), start=1)
+            positions = self._find_header(rows)
+            if positions is None:
+                return None, [], [f"El archivo no tiene las columnas requeridas: {self.spec.required_columns}"]
+
+            data: Dict[str, list] = {column: [] for column in positions}
+            row_numbers = []
+            for row_number, row in rows:
+                if limit is not None and len(row_numbers) >= limit:
+                    break
+                if not any(v is not None and v != "" for v in row):
+                    continue
+                for column, i in positions.items():
+                    data[column].append(row[i] if i < len(row) else None)
+                row_numbers.append(row_number)
+        finally:
+            workbook.close()
+
+        return pd.DataFrame(data, dtype=object), row_numbers, []
+
+    def matches(self, file_path: str) -> bool:
+        """Whether the file has this format's header. Only the first rows are read."""
+        try:
+            if self.spec.reader == "csv":
+                df = pd.read_csv(file_path, delimiter=self.spec.delimiter, dtype=str,
+                                 skiprows=self.spec.skip_rows, nrows=0)
+                return all(col in df.columns for col in self.spec.required_columns)
+            if file_path.lower().endswith(".xls"):
+                head = pd.read_excel(file_path, header=None, dtype=str,
+                                     nrows=max(HEADER_SEARCH_ROWS, self.spec.skip_rows + 1))
+                return self._find_header(enumerate(head.itertuples(index=False, name=None), start=1)) is not None
+
+            from openpyxl import load_workbook
+            workbook = load_workbook(file_path, read_only=True, data_only=True)
+            try:
+                rows = enumerate(workbook.worksheets[0].iter_rows(values_only=True), start=1)
+                return self._find_header(rows) is not None
+            finally:
+                workbook.close()
+        except Exception as e:
+            logger.debug(f"No se pudo leer la cabecera de {file_path}: {e}")
+            return False
+
+    def _find_header(self, rows) -> Optional[Dict[str, int]]:
+        """Consumes rows up to and including the header; returns column name -> index."""
+        for row_number, row in rows:
+            names = [str(v).strip() if v is not None else "" for v in row]
+            if all(col in names for col in self.spec.required_columns):
+                return {name: names.index(name) for name in self.columns if name in names}
+            if row_number >= max(HEADER_SEARCH_ROWS, self.spec.skip_rows + 1):
+                break
+        return None
+
+    # Column pipeline
+
+    def transform(self, df: pd.DataFrame, row_numbers: List[int]) -> Tuple[List[Transaction], List[str]]:
+        spec = self.spec
+        dates = self._parse_dates(df[spec.date_column])
+        amounts = self._parse_amounts(df[spec.amount_column])
+        if spec.fee_column:
+            amounts = amounts - self._parse_amounts(df[spec.fee_column])
+        if spec.invert_sign:
+            amounts = -amounts
+        descriptions = self._describe(df)
+
+        valid = (dates.notna() & amounts.notna()).to_numpy()
+        transactions = [
+            Transaction(date=tx_date, description=description, amount=amount, account=spec.account)
+            for tx_date, description, amount in zip(
+                dates[valid].dt.date, descriptions[valid], amounts[valid].tolist()
+            )
+        ]
+
+        errors = []
+        if not valid.all():
+            bad = ~valid
+            bad_dates = dates.isna().to_numpy()
+            records = df[bad].astype(object).where(df[bad].notna(), None).to_dict("records")
+            numbers = [n for n, is_bad in zip(row_numbers, bad) if is_bad]
+            for row_number, bad_date, record in zip(numbers, bad_dates[bad], records):
+                reason = "Fecha inválida" if bad_date else "Importe inválido"
+                errors.append(f"Fila {row_number}: Error procesando: {reason} | Datos: {record}")
+        return transactions, errors
+
+    def _parse_dates(self, values: pd.Series) -> pd.Series:
+        parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+        text = values
+        if values.dtype == object:
+            # Excel cells may already hold dates
+            native = values.map(lambda v: isinstance(v, (datetime, date))).astype(bool)
+            if native.any():
+                parsed[native] = pd.to_datetime(values[native].tolist()).as_unit("ns")
+                text = values[~native]
+            text = text.where(text.map(lambda v: isinstance(v, str)).astype(bool), None)
+        text = text.astype("string").str.strip()
+        if self.spec.date_first_token:
+            text = text.str.split().str[0]
+        if len(text):
+            parsed[text.index] = pd.to_datetime(text, format=self.spec.date_format, errors="coerce").astype("datetime64[ns]")
+        return parsed
+
+    def _parse_amounts(self, values: pd.Series) -> pd.Series:
+        spec = self.spec
+        amounts = pd.Series(float("nan"), index=values.index, dtype="float64")
+        text = values
+        if values.dtype == object:
+            # Excel cells may already hold numbers
+            numeric = values.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)).astype(bool)
+            if numeric.any():
+                amounts[numeric] = values[numeric].astype("float64")
+                text = values[~numeric]
+            text = text.where(text.notna(), None)
+        text = text.astype("string").str.strip()
+
+        for char in spec.strip_chars:
+            text = text.str.replace(char, "", regex=False)
+        if spec.decimal == ",":
+            text = text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+        elif spec.decimal == "auto":
+            spanish = text.str.contains(",", regex=False).fillna(False).astype(bool)
+            text = text.where(~spanish, text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+
+        if len(text):
+            parsed = pd.to_numeric(text, errors="coerce").astype("float64")
+            if spec.blank_amount_is_zero:
+                parsed[(text.isna() | (text == "")).fillna(True).astype(bool)] = 0.0
+            amounts[text.index] = parsed
+        return amounts
+
+    def _describe(self, df: pd.DataFrame) -> pd.Series:
+        base = self._text(df, self.spec.description_column)
+        if not self.rules:
+            return base
+
+        result = base.copy()
+        pending = pd.Series(True, index=df.index)
+        lowered = base.str.lower()
+        for contains, pieces in self.rules:
+            mask = pending & lowered.str.contains(contains, regex=False)
+            if not mask.any():
+                continue
+            rendered = pd.Series("", index=df.index[mask], dtype=object)
+            for literal, field, _, _ in pieces:
+                rendered = rendered + literal
+                if field is not None:
+                    rendered = rendered + self._text(df, field)[mask]
+            result[mask] = rendered
+            pending &= ~mask
+        return result
+
+    @staticmethod
+    def _text(df: pd.DataFrame, column: str) -> pd.Series:
+        if column not in df.columns:
+            return pd.Series("", index=df.index, dtype=object)
+        values = df[column]
+        return values.where(values.notna(), "").astype(str).astype(object)
+
+
+@lru_cache(maxsize=None)
+def compile_format(spec: BankFormat) -> CompiledFormat:
+    return CompiledFormat(spec)
+
+
+class SpecParser(BankParserStrategy):
+    """Parser driven by a BankFormat. `limit` reads only the first N data rows."""
+    bank_format: BankFormat = None
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit
+
+    def parse(self, file_path: str) -> Tuple[List[Transaction], List[str]]:
+        pipeline = compile_format(self.bank_format)
+        df, row_numbers, errors = pipeline.read(file_path, self.limit)
+        if df is None:
+            return [], errors
+        transactions, row_errors = pipeline.transform(df, row_numbers)
+        return transactions, errors + row_errors
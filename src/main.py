@@ -1,6 +1,7 @@
 import os
 import logging
 import sys
+import argparse
 from dotenv import load_dotenv
 
 # Ensure src is in path if running from root
@@ -23,11 +24,227 @@ console_handler = logging.StreamHandler()
 console_handler.setLevel(logging.INFO)
 logging.getLogger().addHandler(console_handler)
 
-from src.ui.gui import create_main_window
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Gestor de Gastos Notion")
+    parser.add_argument("--perfil", action="store_true",
+                        help="Guarda en logs/profiles un perfil de CPU y memoria de cada importación y exportación")
+    parser.add_argument("--asincrono", action="store_true",
+                        help="Usa el cliente de Notion basado en aiohttp (NOTION_CLIENT=async)")
+    subparsers = parser.add_subparsers(dest="command")
 
-def main():
+    undo = subparsers.add_parser("deshacer", help="Archiva las páginas creadas por una importación")
+    undo.add_argument("run_id", nargs="?", help="Id de la importación (por defecto, la última)")
+    undo.add_argument("--hilos", type=int, default=4, help="Peticiones simultáneas")
+
+    subparsers.add_parser("importaciones", help="Lista las importaciones registradas")
+
+    index = subparsers.add_parser("indice", help="Construye el índice de sugerencias de categoría")
+    index.add_argument("exportacion", help="Fichero exportado de Notion (CSV, Parquet o Feather)")
+
+    summary = subparsers.add_parser("resumen", help="Muestra totales por categoría, mes o cuenta")
+    summary.add_argument("--por", choices=["categoria", "mes", "cuenta"], default="categoria")
+    summary.add_argument("--desde", help="Mes inicial (AAAA-MM)")
+    summary.add_argument("--hasta", help="Mes final (AAAA-MM)")
+    summary.add_argument("--reconstruir", metavar="EXPORTACION", help="Recalcula los resúmenes desde una exportación")
+
+    history = subparsers.add_parser("historial", help="Historial local columnar de movimientos")
+    history.add_argument("--reconstruir", metavar="EXPORTACION", help="Recrea el historial desde una exportación")
+    history.add_argument("--desde", help="Fecha inicial (AAAA-MM-DD)")
+    history.add_argument("--hasta", help="Fecha final (AAAA-MM-DD)")
+
+    watch = subparsers.add_parser("vigilar", help="Importa automáticamente los extractos que aparecen en una carpeta")
+    watch.add_argument("carpeta", help="Carpeta donde se descargan los extractos")
+    watch.add_argument("--espera", type=float, default=3.0,
+                       help="Segundos sin cambios antes de importar un fichero")
+    watch.add_argument("--reintento", type=float, default=300.0,
+                       help="Segundos antes de reintentar un fichero cuya importación falló")
+
+    backfill = subparsers.add_parser("huellas", help="Escribe la huella de deduplicación en las páginas antiguas")
+    backfill.add_argument("--hilos", type=int, default=4, help="Peticiones simultáneas")
+
+    targets = subparsers.add_parser("destinos", help="Ejecuta una operación en varias bases de datos a la vez")
+    targets.add_argument("accion", choices=["listar", "importar", "exportar", "sincronizar", "categorias",
+                                                  "huellas"])
+    targets.add_argument("--config", help="Fichero de destinos (por defecto NOTION_TARGETS o notion_targets.json)")
+    targets.add_argument("--solo", action="append", metavar="DESTINO", help="Limita la operación a estos destinos")
+    targets.add_argument("--archivo", action="append", default=[], metavar="DESTINO=RUTA",
+                         help="Extracto a importar en un destino (se puede repetir)")
+    targets.add_argument("--carpeta", default="exports", help="Carpeta de las exportaciones, una por destino")
+    targets.add_argument("--formato", choices=["csv", "parquet", "feather"], default="csv")
+    targets.add_argument("--completo", action="store_true",
+                         help="Al sincronizar, busca las páginas archivadas en toda la base (si no, una vez por semana)")
+    targets.add_argument("--hilos", type=int, default=4, help="Peticiones simultáneas por destino (huellas)")
+    return parser
+
+def run_rollback(args) -> int:
+    from src.services.notion_service import create_client
+    from src.services.import_runs import ImportRunLog, rollback_run
+    from src.services.history_store import HistoryStore
+    from src.services.reporting import RollupStore
+
+    run_log = ImportRunLog()
+    run_id = args.run_id
+    if not run_id:
+        last = run_log.last_run()
+        if not last:
+            print("No hay importaciones que deshacer.")
+            return 1
+        run_id = last["run_id"]
+
+    def progress(done, total):
+        print(f"\rArchivando {done}/{total}", end="", flush=True)
+
+    result = rollback_run(create_client(), run_id, run_log, max_workers=args.hilos, progress=progress,
+                          history=HistoryStore.open_existing(), rollups=RollupStore.load())
+    print(f"\nImportación {run_id}: {result.to_string()}")
+    return 0 if not result.failed else 1
+
+def list_runs() -> int:
+    from src.services.import_runs import ImportRunLog
+
+    for run in ImportRunLog().list_runs():
+        state = " (deshecha)" if run["rolled_back"] else ""
+        print(f"{run['run_id']}  {run['timestamp']}  {run['parser']}  "
+              f"insertados={run['inserted']}  {run['file']}{state}")
+    return 0
+
+def run_backfill(args) -> int:
+    from src.services.notion_service import create_client
+    from src.services.fingerprints import backfill_fingerprints
+
+    def progress(done, total):
+        print(f"\rEscribiendo huellas {done}/{total}", end="", flush=True)
+
+    result = backfill_fingerprints(create_client(), max_workers=args.hilos, progress=progress)
+    print(f"\nHuellas: {result.to_string()}")
+    return 0 if not result.failed else 1
+
+def build_suggestion_index(args) -> int:
+    from src.services.suggestions import CategorySuggester, DEFAULT_INDEX_PATH
+
+    suggester = CategorySuggester.from_export(args.exportacion)
+    suggester.save(DEFAULT_INDEX_PATH)
+    print(f"Índice guardado en {DEFAULT_INDEX_PATH} ({len(suggester.labels)} descripciones)")
+    return 0
+
+def show_summary(args) -> int:
+    from src.services.reporting import RollupStore
+
+    if args.reconstruir:
+        store = RollupStore()
+        store.rebuild_from_export(args.reconstruir)
+        store.save()
+    else:
+        store = RollupStore.load()
+        if store is None:
+            print("No hay resúmenes. Usa --reconstruir con una exportación de Notion.")
+            return 1
+
+    print(store.summary(by=args.por, start=args.desde, end=args.hasta).to_string(index=False))
+    return 0
+
+def show_history(args) -> int:
+    from datetime import date
+    from src.services.history_store import HistoryStore
+
+    store = HistoryStore()
+    if args.reconstruir:
+        store.rebuild_from_export(args.reconstruir)
+
+    rows = store.range(
+        date.fromisoformat(args.desde) if args.desde else None,
+        date.fromisoformat(args.hasta) if args.hasta else None,
+    )
+    print(f"{len(rows)} movimientos | saldo neto {rows.cents.sum() / 100:.2f}")
+    return 0
+
+def watch_folder(args) -> int:
+    from src.services.notion_service import create_client
+    from src.services.processor import TransactionProcessor
+    from src.services.watcher import FolderWatcher
+
+    watcher = FolderWatcher(args.carpeta, TransactionProcessor(create_client()), settle_seconds=args.espera,
+                            retry_seconds=args.reintento)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def run_targets(args) -> int:
+    from src.services.targets import ClientPool
+    from src.services.fingerprints import backfill_fingerprints
+
+    try:
+        pool = ClientPool.from_config(args.config)
+    except ValueError as e:
+        print(e)
+        return 1
+    try:
+        if args.accion == "listar":
+            for target in pool.targets.values():
+                print(f"{target.name}  {target.database_id}  estado={target.state_dir or '(por defecto)'}")
+            return 0
+        if args.accion == "importar":
+            files = {}
+            for entry in args.archivo:
+                name, sep, file_path = entry.partition("=")
+                if not sep:
+                    print(f"Formato esperado DESTINO=RUTA: {entry}")
+                    return 1
+                files.setdefault(name, []).append(file_path)
+            if not files:
+                print("Indica al menos un --archivo DESTINO=RUTA")
+                return 1
+            result = pool.import_files(files, names=args.solo)
+        elif args.accion == "exportar":
+            result = pool.export_all(args.carpeta, f".{args.formato}", names=args.solo)
+        elif args.accion == "sincronizar":
+            result = pool.sync_exports(args.carpeta, f".{args.formato}", names=args.solo,
+                                       detect_deletions=True if args.completo else None)
+        elif args.accion == "categorias":
+            result = pool.export_categories(args.carpeta, names=args.solo)
+        else:
+            result = pool.run_all(lambda name: backfill_fingerprints(pool.clients[name], max_workers=args.hilos),
+                                  names=args.solo)
+    except ValueError as e:
+        # Unknown targets in --solo or --archivo
+        print(e)
+        return 1
+    finally:
+        pool.close()
+
+    print(result.to_string())
+    return 0 if not result.failed else 1
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.perfil:
+        # Must be set before the services are imported: @profiled decides at import time
+        os.environ["GASTOS_PROFILE"] = "1"
+    if args.asincrono:
+        os.environ["NOTION_CLIENT"] = "async"
+    if args.command == "deshacer":
+        return run_rollback(args)
+    if args.command == "importaciones":
+        return list_runs()
+    if args.command == "huellas":
+        return run_backfill(args)
+    if args.command == "resumen":
+        return show_summary(args)
+    if args.command == "historial":
+        return show_history(args)
+    if args.command == "vigilar":
+        return watch_folder(args)
+    if args.command == "indice":
+        return build_suggestion_index(args)
+    if args.command == "destinos":
+        return run_targets(args)
+
+    from src.ui.gui import create_main_window
     root = create_main_window()
     root.mainloop()
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
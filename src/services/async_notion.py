@@ -0,0 +1,398 @@
+"""
+asyncio Notion client on one pooled keep-alive aiohttp session.
+
+AsyncNotionClient mirrors NotionClient's methods as coroutines, so hundreds
+of operations can be in flight at once while AsyncRateLimiter paces what
+actually reaches the API. SyncNotionClient runs it on an event loop in a
+background thread and exposes the same blocking API as NotionClient, so
+existing callers (processor, exporter, GUI threads) can use it unchanged.
+
+aiohttp is optional: it is only needed when one of these clients is created.
+"""
+import asyncio
+import functools
+import inspect
+import logging
+import os
+import threading
+from datetime import date
+from typing import Optional, List, Dict, Set, AsyncIterator
+
+from src.core.models import Transaction
+from src.services.interval_cache import IntervalCache
+from src.services.page_schema import PageFlattener
+from src.services.rate_limiter import AsyncRateLimiter
+from src.services.notion_service import (
+    RUN_PROPERTY, FINGERPRINT_PROPERTY, range_filter, fingerprint_filter, page_fingerprints, transfer_candidate_filter,
+    range_cache_accepts, page_to_transaction, transaction_payload,
+)
+
+logger = logging.getLogger(__name__)
+
+# Same retry policy as NotionClient's urllib3 Retry
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+MAX_BACKOFF = 30.0
+
+
+def _require_aiohttp():
+    try:
+        import aiohttp
+    except ImportError as e:
+        raise ImportError("El cliente asíncrono de Notion necesita aiohttp (pip install aiohttp)") from e
+    return aiohttp
+
+
+def _retry_delay(response, attempt: int) -> float:
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(float(retry_after), MAX_BACKOFF)
+        except ValueError:
+            pass
+    return min(2.0 ** attempt, MAX_BACKOFF)
+
+
+class AsyncNotionClient:
+    def __init__(self, token: Optional[str] = None, database_id: Optional[str] = None,
+                 rate_limiter: Optional[AsyncRateLimiter] = None,
+                 max_connections: int = 1, timeout: float = 60.0):
+        self._aiohttp = _require_aiohttp()
+        self.token = token or os.environ.get("NOTION_TOKEN")
+        self.database_id = database_id or os.environ.get("NOTION_DATABASE_ID")
+        self.api_url = "https://api.notion.com/v1/"
+        self.version = os.environ.get("NOTION_VERSION", "2022-06-28")
+
+        if not self.token or not self.database_id:
+            raise ValueError("Faltan credenciales de Notion (NOTION_TOKEN, NOTION_DATABASE_ID)")
+
+        self.headers = {
+            "Authorization": f"Bearer {self.token}",
+            "Notion-Version": self.version,
+            "Content-Type": "application/json",
+        }
+
+        # Requests beyond max_connections queue on the pool instead of opening sockets
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or AsyncRateLimiter()
+        self.range_cache = IntervalCache()
+        self._session = None
+        self._schema: Optional[Dict[str, Dict]] = None
+        self._flattener: Optional[PageFlattener] = None
+        self._schema_lock: Optional[asyncio.Lock] = None
+        self._known_fingerprints: Set[str] = set()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _get_session(self):
+        # Created lazily so it belongs to the loop that runs the requests
+        if self._session is None or self._session.closed:
+            aiohttp = self._aiohttp
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def _request(self, method: str, url: str, json: Optional[Dict] = None,
+                       params: Optional[List] = None, idempotent: bool = True) -> Dict:
+        """
+        Sends a request through the pooled session, paced by the rate limiter.
+        Retries 429/5xx like NotionClient, and connections that could not be
+        opened. Timeouts and dropped connections are only retried when the
+        request is idempotent: a create that timed out may still have succeeded.
+        Other errors raise ClientResponseError.
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            await self.rate_limiter.acquire()
+            try:
+                async with self._get_session().request(method, url, json=json, params=params) as response:
+                    if response.status not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                        response.raise_for_status()
+                        return await response.json()
+                    delay = _retry_delay(response, attempt)
+                    logger.warning(f"Notion respondió {response.status}; reintento en {delay:.1f}s")
+            except (self._aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                # Nothing was sent when the connection could not be opened
+                never_sent = isinstance(e, self._aiohttp.ClientConnectorError)
+                if attempt == MAX_RETRIES or not (idempotent or never_sent):
+                    raise
+                delay = min(2.0 ** attempt, MAX_BACKOFF)
+                logger.warning(f"Error de conexión con Notion ({type(e).__name__}: {e}); reintento en {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    # Queries
+
+    async def iter_page_batches(self, filter: Optional[Dict] = None,
+                                filter_properties: Optional[List[str]] = None,
+                                database_id: Optional[str] = None) -> AsyncIterator[List[Dict]]:
+        """Streams a database query one API page (up to 100 records) at a time."""
+        params = [("filter_properties", prop_id) for prop_id in filter_properties or []]
+        query_url = f"{self.api_url}databases/{database_id or self.database_id}/query"
+        next_cursor = None
+        while True:
+            payload = {"page_size": 100}
+            if filter:
+                payload["filter"] = filter
+            if next_cursor:
+                payload["start_cursor"] = next_cursor
+
+            data = await self._request("POST", query_url, json=payload, params=params)
+            yield data.get("results", [])
+            next_cursor = data.get("next_cursor")
+            if not data.get("has_more", False):
+                break
+
+    async def _query_all(self, filter: Optional[Dict] = None, **kwargs) -> List[Dict]:
+        pages = []
+        async for batch in self.iter_page_batches(filter=filter, **kwargs):
+            pages.extend(batch)
+        return pages
+
+    async def get_transactions_in_range(self, start_date: date, end_date: date,
+                                        legacy_only: bool = False, account: Optional[str] = None) -> List[Transaction]:
+        """Same as NotionClient.get_transactions_in_range; the uncovered gaps are fetched concurrently."""
+        key = (account, legacy_only)
+        gaps = self.range_cache.missing(key, start_date, end_date)
+        results = await asyncio.gather(*(
+            self._query_all(range_filter(gap_start, gap_end, legacy_only, account)) for gap_start, gap_end in gaps
+        ))
+        for (gap_start, gap_end), pages in zip(gaps, results):
+            fetched = await self._map_pages(pages)
+            self.range_cache.add_range(key, gap_start, gap_end, fetched)
+        return self.range_cache.get(key, start_date, end_date)
+
+    async def fetch_all_pages(self) -> List[Dict]:
+        """Fetches all pages from the database (for export)."""
+        return await self._query_all()
+
+    async def fetch_page_ids(self) -> Set[str]:
+        pages = await self._query_all(filter_properties=["title"])
+        return {page["id"] for page in pages}
+
+    async def fetch_database_query(self, database_id: str) -> List[Dict]:
+        """Generic fetch for any database (e.g., categories, projects)."""
+        results = []
+        try:
+            async for batch in self.iter_page_batches(database_id=database_id):
+                results.extend(batch)
+        except self._aiohttp.ClientResponseError as e:
+            logger.error(f"Error fetching DB {database_id}: {e}")
+        return results
+
+    async def get_page_title(self, page_id: str) -> Optional[str]:
+        try:
+            data = await self._request("GET", f"{self.api_url}pages/{page_id}")
+        except self._aiohttp.ClientResponseError:
+            return None
+        for prop in data.get("properties", {}).values():
+            if prop.get("type") == "title":
+                titles = prop.get("title", [])
+                if titles:
+                    return titles[0].get("plain_text")
+        return None
+
+    async def find_existing_fingerprints(self, fingerprints: List[str], batch_size: int = 50) -> Set[str]:
+        """Same as NotionClient.find_existing_fingerprints, with every batch in flight at once."""
+        found = self._known_fingerprints & set(fingerprints)
+        unique = sorted(set(fingerprints) - found)
+        chunks = [unique[i:i + batch_size] for i in range(0, len(unique), batch_size)]
+        for pages in await asyncio.gather(*(self._query_all(fingerprint_filter(chunk)) for chunk in chunks)):
+            found.update(page_fingerprints(pages))
+        found &= set(fingerprints)
+        # Only positive answers are cached: another run may insert the others
+        self._known_fingerprints |= found
+        return found
+
+    async def get_transfer_candidates(self, amounts: List[float], start_date: date, end_date: date,
+                                      batch_size: int = 25) -> List[Transaction]:
+        unique = sorted({round(abs(a), 2) for a in amounts if a})
+        chunks = [unique[i:i + batch_size] for i in range(0, len(unique), batch_size)]
+        results = await asyncio.gather(*(
+            self._query_all(transfer_candidate_filter(chunk, start_date, end_date)) for chunk in chunks
+        ))
+        transactions = []
+        for pages in results:
+            transactions.extend(await self._map_pages(pages))
+        return transactions
+
+    async def find_pages_by_run(self, run_id: str) -> List[str]:
+        page_filter = {"property": RUN_PROPERTY, "rich_text": {"equals": run_id}}
+        pages = await self._query_all(page_filter, filter_properties=["title"])
+        return [page["id"] for page in pages]
+
+    # Writes
+
+    async def get_database_schema(self) -> Dict[str, Dict]:
+        """Property name -> definition (with its "type"), read once per client."""
+        if self._schema_lock is None:
+            self._schema_lock = asyncio.Lock()
+        async with self._schema_lock:
+            if self._schema is None:
+                data = await self._request("GET", f"{self.api_url}databases/{self.database_id}")
+                self._schema = data.get("properties", {})
+        return self._schema
+
+    async def page_flattener(self, sample_pages: Optional[List[Dict]] = None) -> PageFlattener:
+        """Same as NotionClient.page_flattener."""
+        if self._flattener is None:
+            try:
+                self._flattener = PageFlattener(await self.get_database_schema())
+            except Exception as e:
+                if not sample_pages:
+                    raise
+                logger.warning(f"No se pudo leer el esquema de la base de datos ({e}); se usa el de las páginas")
+                self._flattener = PageFlattener.from_pages(sample_pages)
+        return self._flattener
+
+    async def _map_pages(self, pages: List[Dict]) -> List[Transaction]:
+        if not pages:
+            return []
+        return (await self.page_flattener(pages)).transactions(pages, FINGERPRINT_PROPERTY)
+
+    async def ensure_text_properties(self, names: List[str]):
+        """Adds the given rich_text properties to the database if they are missing."""
+        schema = await self.get_database_schema()
+        async with self._schema_lock:
+            missing = [name for name in names if name not in schema]
+            if not missing:
+                return
+
+            logger.info(f"Añadiendo propiedades a la base de datos: {missing}")
+            db_url = f"{self.api_url}databases/{self.database_id}"
+            await self._request("PATCH", db_url, json={"properties": {name: {"rich_text": {}} for name in missing}})
+            schema.update({name: {"type": "rich_text"} for name in missing})
+            self._flattener = None
+
+    async def create_transaction(self, transaction: Transaction, run_id: Optional[str] = None) -> bool:
+        try:
+            data = await self._request("POST", f"{self.api_url}pages",
+                                       json=transaction_payload(self.database_id, transaction, run_id),
+                                       idempotent=False)
+        except Exception as e:
+            logger.error(f"Error creating transaction: {e}")
+            return False
+        transaction.page_id = data.get("id")
+        self._remember_insert(transaction)
+        return True
+
+    async def create_transactions(self, transactions: List[Transaction], run_id: Optional[str] = None) -> List[bool]:
+        """Schedules every insert at once; the rate limiter decides the pace. Results follow input order."""
+        return list(await asyncio.gather(*(self.create_transaction(tx, run_id) for tx in transactions)))
+
+    def _remember_insert(self, transaction: Transaction):
+        if transaction.fingerprint:
+            self._known_fingerprints.add(transaction.fingerprint)
+        self.range_cache.add_transaction(transaction, range_cache_accepts)
+
+    async def update_page(self, page_id: str, properties: Dict) -> bool:
+        try:
+            await self._request("PATCH", f"{self.api_url}pages/{page_id}", json={"properties": properties})
+            return True
+        except Exception as e:
+            logger.error(f"Error updating page {page_id}: {e}")
+            return False
+
+    async def mark_as_transfer(self, transaction: Transaction) -> bool:
+        return await self.update_page(transaction.page_id, {
+            "Gasto": {"number": None},
+            "Ingreso": {"number": None},
+            "Transferencias": {"number": transaction.amount},
+        })
+
+    async def restore_amount(self, page_id: str, amount: float) -> bool:
+        return await self.update_page(page_id, {
+            "Gasto": {"number": -amount if amount < 0 else None},
+            "Ingreso": {"number": amount if amount > 0 else None},
+            "Transferencias": {"number": None},
+        })
+
+    async def archive_page(self, page_id: str) -> bool:
+        try:
+            await self._request("PATCH", f"{self.api_url}pages/{page_id}", json={"archived": True})
+        except Exception as e:
+            logger.error(f"Error archiving page {page_id}: {e}")
+            return False
+        self.range_cache.discard_page(page_id)
+        # The archived page's fingerprint may be in the positive cache
+        self._known_fingerprints.clear()
+        return True
+
+    @staticmethod
+    def _map_page_to_transaction(page: Dict) -> Optional[Transaction]:
+        return page_to_transaction(page)
+
+
+class SyncNotionClient:
+    """
+    Blocking facade over AsyncNotionClient with NotionClient's API. Its
+    event loop runs in a daemon thread; calls from any thread are submitted
+    to it, so every caller shares one connection pool and one rate limiter.
+    Do not call it from inside that loop. With share_loop_with, the client
+    runs on another SyncNotionClient's loop instead, so both can share an
+    AsyncRateLimiter (which belongs to one loop).
+    """
+    def __init__(self, client: Optional[AsyncNotionClient] = None,
+                 share_loop_with: Optional["SyncNotionClient"] = None, **kwargs):
+        self._client = client or AsyncNotionClient(**kwargs)
+        self._owns_loop = share_loop_with is None
+        if self._owns_loop:
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="notion-async", daemon=True)
+            self._thread.start()
+        else:
+            self._loop = share_loop_with._loop
+            self._thread = share_loop_with._thread
+
+    def run(self, coroutine):
+        """Runs a coroutine on the client's loop and waits for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if inspect.isasyncgenfunction(attr):
+            @functools.wraps(attr)
+            def iterate(*args, **kwargs):
+                return self._iterate(attr(*args, **kwargs))
+            return iterate
+        if inspect.iscoroutinefunction(attr):
+            @functools.wraps(attr)
+            def call(*args, **kwargs):
+                return self.run(attr(*args, **kwargs))
+            return call
+        return attr
+
+    def __setattr__(self, name, value):
+        # Public attributes (api_url, database_id...) live on the wrapped client
+        if name.startswith("_"):
+            super().__setattr__(name, value)
+        else:
+            setattr(self._client, name, value)
+
+    def _iterate(self, generator):
+        while True:
+            try:
+                yield self.run(generator.__anext__())
+            except StopAsyncIteration:
+                return
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        self.run(self._client.close())
+        if not self._owns_loop:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
@@ -0,0 +1,54 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterable, List, Optional, Tuple, Any
+
+logger = logging.getLogger(__name__)
+
+
+class BulkResult:
+    def __init__(self):
+        self.succeeded = 0
+        self.failed: List[Tuple[Any, str]] = []
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Operations per second."""
+        total = self.succeeded + len(self.failed)
+        return total / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_string(self):
+        return (f"Correctos: {self.succeeded} | Fallidos: {len(self.failed)} | "
+                f"{self.elapsed:.1f} s ({self.throughput:.1f} op/s)")
+
+
+def run_concurrently(func: Callable[[Any], bool], items: Iterable[Any], max_workers: int = 4,
+                     progress: Optional[Callable[[int, int], None]] = None) -> BulkResult:
+    """
+    Runs func(item) for every item on a thread pool. func returns True on
+    success; exceptions count as failures. The Notion client's rate limiter
+    paces the actual requests, so max_workers only bounds in-flight calls.
+    progress(done, total) is called after each item.
+    """
+    items = list(items)
+    result = BulkResult()
+    start = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(func, item): item for item in items}
+        for done, future in enumerate(as_completed(futures), start=1):
+            item = futures[future]
+            try:
+                if future.result():
+                    result.succeeded += 1
+                else:
+                    result.failed.append((item, "La operación devolvió error"))
+            except Exception as e:
+                logger.error(f"Error en operación masiva sobre {item}: {e}")
+                result.failed.append((item, str(e)))
+            if progress:
+                progress(done, len(items))
+
+    result.elapsed = time.monotonic() - start
+    return result
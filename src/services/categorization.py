@@ -48,3 +48,33 @@ def categorize_record(nombre, rules_df):
         elif concept_contains and str(concept_contains) in nombre_str:
             return rule['Subcategoria_UUID'] if rule['Subcategoria_UUID'] else None
     return None
+
+def categorize_records(nombres, rules_df):
+    """
+    Batch version of categorize_record: returns one Subcategoria_UUID (or None)
+    per name. Rules are applied once each, in priority order, over the whole
+    column, and the first matching rule decides (same result as categorize_record).
+    """
+    names = pd.Series(list(nombres), dtype=object).fillna("").astype(str)
+    result = pd.Series([None] * len(names), dtype=object)
+    if rules_df.empty or names.empty:
+        return result.tolist()
+
+    decided = pd.Series(False, index=names.index)
+    for _, rule in rules_df.iterrows():
+        concept_contains = rule['Concepto_Contiene']
+        concept_exact = rule['Concepto_Exacto']
+
+        match = pd.Series(False, index=names.index)
+        if concept_exact:
+            match |= names == str(concept_exact)
+        if concept_contains:
+            match |= names.str.contains(str(concept_contains), regex=False)
+
+        newly = match & ~decided
+        if newly.any():
+            result[newly] = rule['Subcategoria_UUID'] if rule['Subcategoria_UUID'] else None
+            decided |= newly
+            if decided.all():
+                break
+    return result.tolist()
@@ -1,15 +1,88 @@
 import pandas as pd
+import json
 import logging
 import os
-from typing import List, Dict, Optional, Set
+from datetime import date
+from typing import List, Dict, Optional, Set, Iterable
 from src.services.notion_service import NotionClient
+from src.services.profiling import profiled
 
 logger = logging.getLogger(__name__)
 
+COLUMNAR_FORMATS = ("parquet", "feather")
+
+EXPORT_COLUMNS = (
+    "Nombre", "Fecha", "Cuenta", "Gasto", "Ingreso", "Transferencias",
+    "Subcategoría", "Categoría", "Proyecto/Viaje", "Mes", "Script", "url", "id",
+)
+
+# Columns written to Parquet/Feather, in the same order as the CSV export.
+# Low-cardinality text columns are dictionary-encoded.
+DATE_COLUMNS = ("Fecha",)
+NUMBER_COLUMNS = ("Gasto", "Ingreso", "Transferencias")
+DICTIONARY_COLUMNS = ("Cuenta", "Subcategoría", "Categoría")
+BOOL_COLUMNS = ("Script",)
+
+
+def columnar_format_from_path(file_path: str) -> Optional[str]:
+    """Returns 'parquet' or 'feather' based on the file extension, or None."""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    if ext in (".feather", ".arrow"):
+        return "feather"
+    return None
+
+
+# Days between full sweeps for pages archived without a new last_edited_time
+DELETION_SWEEP_DAYS = 7
+
+
+def watermark_path(file_path: str) -> str:
+    """State file kept next to an export for incremental runs."""
+    return f"{file_path}.watermark.json"
+
+
+def _to_date(value) -> Optional[date]:
+    if value is None or isinstance(value, date):
+        return value
+    # Notion dates may carry a time part ("2024-01-01T10:00:00.000+01:00")
+    return date.fromisoformat(str(value)[:10])
+
+
+class _DictionaryEncoder:
+    """
+    Keeps one growing dictionary per column across row groups, so each new
+    batch only adds a delta instead of replacing the dictionary.
+    """
+    def __init__(self):
+        self.values: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def encode(self, pa, column: List[Optional[str]]):
+        indices = []
+        for value in column:
+            if value is None:
+                indices.append(None)
+                continue
+            pos = self.index.get(value)
+            if pos is None:
+                pos = len(self.values)
+                self.index[value] = pos
+                self.values.append(value)
+            indices.append(pos)
+        return pa.DictionaryArray.from_arrays(
+            pa.array(indices, type=pa.int32()),
+            pa.array(self.values, type=pa.string()),
+        )
+
 class ExporterService:
-    def __init__(self, notion_client: NotionClient):
+    def __init__(self, notion_client: NotionClient, project_database_id: Optional[str] = None):
         self.notion = notion_client
+        # "" disables project names; None falls back to NOTION_PROJECT_DATABASE_ID
+        self.project_database_id = project_database_id
 
+    @profiled
     def export_all_to_csv(self, file_path: str) -> bool:
         """
         Exports all Notion database records to a CSV file.
@@ -21,22 +94,247 @@ class ExporterService:
             # Resolve Projects/Trips if configured
             project_map = self._build_project_map(raw_records)
 
-            rows = []
-            for record in raw_records:
-                rows.append(self._flatten_record(record, project_map))
-
-            df = pd.DataFrame(rows)
+            df = pd.DataFrame(self._flatten(raw_records, project_map), columns=list(EXPORT_COLUMNS))
             df.to_csv(file_path, index=False, sep=";", decimal=",")
             return True
         except Exception as e:
             logger.error(f"Error exporting to CSV: {e}", exc_info=True)
             return False
 
+    def export_all_to_columnar(self, file_path: str, fmt: Optional[str] = None,
+                               row_group_size: int = 10000) -> bool:
+        """
+        Exports all Notion database records to Parquet or Feather with typed
+        columns. Pages are streamed from Notion and written in row groups.
+        """
+        fmt = fmt or columnar_format_from_path(file_path)
+        if fmt not in COLUMNAR_FORMATS:
+            logger.error(f"Formato de exportación no soportado: {fmt}")
+            return False
+
+        try:
+            import pyarrow as pa
+        except ImportError:
+            logger.error("Para exportar a Parquet/Feather hay que instalar pyarrow")
+            return False
+
+        try:
+            project_map = self._load_project_map()
+            column_chunks = (
+                self._flatten(batch, project_map) for batch in self.notion.iter_page_batches()
+            )
+            self._write_columnar(file_path, fmt, column_chunks, row_group_size)
+            return True
+        except Exception as e:
+            logger.error(f"Error exporting to {fmt}: {e}", exc_info=True)
+            return False
+
+    def _write_columnar(self, file_path: str, fmt: str, column_chunks: Iterable[Dict[str, list]],
+                        row_group_size: int = 10000):
+        """Writes flattened columns to Parquet/Feather, one row group per ~row_group_size rows."""
+        import pyarrow as pa
+
+        schema = self._arrow_schema(pa)
+        encoders = {col: _DictionaryEncoder() for col in DICTIONARY_COLUMNS}
+        writer = self._open_columnar_writer(pa, file_path, fmt, schema)
+        try:
+            columns = {col: [] for col in EXPORT_COLUMNS}
+            written = 0
+            for chunk in column_chunks:
+                for col in EXPORT_COLUMNS:
+                    columns[col].extend(chunk[col])
+                if len(columns["id"]) >= row_group_size:
+                    writer.write_table(self._columns_to_arrow(pa, columns, schema, encoders))
+                    written += len(columns["id"])
+                    columns = {col: [] for col in EXPORT_COLUMNS}
+
+            # An empty database still gets one (empty) group so the file is readable
+            if columns["id"] or not written:
+                writer.write_table(self._columns_to_arrow(pa, columns, schema, encoders))
+        finally:
+            writer.close()
+
+    def export_incremental(self, file_path: str, detect_deletions: Optional[bool] = None) -> bool:
+        """
+        Updates an existing export (CSV, Parquet or Feather) with the pages
+        edited since the last run, upserting them by page id. The
+        last_edited_time watermark and the ids of removed pages (tombstones)
+        are stored next to the file. Without a previous export it does a full one.
+
+        Archived pages the query returns become tombstones on every run. The
+        sweep that lists every live id (one request per 100 pages) to catch
+        the rest runs when detect_deletions is True, or, with None, once every
+        DELETION_SWEEP_DAYS days.
+        """
+        state_path = watermark_path(file_path)
+        fmt = columnar_format_from_path(file_path)
+        try:
+            state = self._load_export_state(state_path)
+            existing = self._read_export(file_path, fmt) if state.get("last_edited_time") else None
+            if existing is not None and "id" not in existing.columns:
+                # Export made before page ids were included: start over
+                existing = None
+            since = state.get("last_edited_time") if existing is not None else None
+
+            page_filter = None
+            if since:
+                # last_edited_time has minute granularity, so re-read the boundary minute
+                page_filter = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": since}}
+
+            pages = []
+            for batch in self.notion.iter_page_batches(filter=page_filter):
+                pages.extend(batch)
+
+            tombstones = set(state.get("tombstones", []))
+            live_pages = [p for p in pages if not (p.get("archived") or p.get("in_trash"))]
+            tombstones.update(p["id"] for p in pages if p.get("archived") or p.get("in_trash"))
+
+            project_map = self._load_project_map()
+            updated = pd.DataFrame(self._flatten(live_pages, project_map), columns=list(EXPORT_COLUMNS))
+
+            last_sweep = state.get("last_sweep")
+            if detect_deletions is None:
+                detect_deletions = (last_sweep is None or
+                                    (date.today() - date.fromisoformat(last_sweep)).days >= DELETION_SWEEP_DAYS)
+            if existing is None or detect_deletions:
+                # A full export sees every live page too
+                last_sweep = date.today().isoformat()
+            if existing is not None and detect_deletions:
+                # The query endpoint does not return every archived page, so compare ids
+                live_ids = self.notion.fetch_page_ids()
+                tombstones.update(set(existing["id"].dropna()) - live_ids)
+            # A page edited after being restored is alive again
+            tombstones.difference_update(updated["id"])
+
+            if existing is not None:
+                stale = existing["id"].isin(set(updated["id"]) | tombstones)
+                df = pd.concat([existing[~stale], updated], ignore_index=True)
+            else:
+                df = updated
+
+            self._write_export(df, file_path, fmt)
+
+            watermark = max([since or ""] + [p.get("last_edited_time", "") for p in pages])
+            self._save_export_state(state_path, {
+                "last_edited_time": watermark or None,
+                "tombstones": sorted(tombstones),
+                "last_sweep": last_sweep,
+            })
+            logger.info(f"Exportación incremental: {len(updated)} actualizados, "
+                        f"{len(tombstones)} archivados, {len(df)} en total")
+            return True
+        except Exception as e:
+            logger.error(f"Error in incremental export: {e}", exc_info=True)
+            return False
+
+    def _load_export_state(self, state_path: str) -> Dict:
+        if not os.path.exists(state_path):
+            return {}
+        with open(state_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_export_state(self, state_path: str, state: Dict):
+        with open(state_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+
+    def _read_export(self, file_path: str, fmt: Optional[str]) -> Optional[pd.DataFrame]:
+        if not os.path.exists(file_path):
+            return None
+        if fmt == "parquet":
+            return pd.read_parquet(file_path)
+        if fmt == "feather":
+            return pd.read_feather(file_path)
+        text_columns = {c: str for c in EXPORT_COLUMNS if c not in NUMBER_COLUMNS}
+        return pd.read_csv(file_path, sep=";", decimal=",", dtype=text_columns)
+
+    def _write_export(self, df: pd.DataFrame, file_path: str, fmt: Optional[str]):
+        # Write to a temporary file first so a failed run never corrupts the export
+        tmp_path = f"{file_path}.tmp"
+        if fmt in COLUMNAR_FORMATS:
+            columns = {
+                col: df[col].astype(object).where(df[col].notna(), None).tolist() if col in df.columns
+                else [None] * len(df)
+                for col in EXPORT_COLUMNS
+            }
+            self._write_columnar(tmp_path, fmt, [columns])
+        else:
+            df.to_csv(tmp_path, index=False, sep=";", decimal=",")
+        os.replace(tmp_path, file_path)
+
+    def _arrow_schema(self, pa):
+        fields = []
+        for col in EXPORT_COLUMNS:
+            if col in DATE_COLUMNS:
+                fields.append(pa.field(col, pa.date32()))
+            elif col in NUMBER_COLUMNS:
+                fields.append(pa.field(col, pa.float64()))
+            elif col in DICTIONARY_COLUMNS:
+                fields.append(pa.field(col, pa.dictionary(pa.int32(), pa.string())))
+            elif col in BOOL_COLUMNS:
+                fields.append(pa.field(col, pa.bool_()))
+            else:
+                fields.append(pa.field(col, pa.string()))
+        return pa.schema(fields)
+
+    def _open_columnar_writer(self, pa, file_path: str, fmt: str, schema):
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(file_path, schema, compression="zstd")
+
+        import pyarrow.ipc as ipc
+        # Feather v2 is the Arrow IPC file format
+        options = ipc.IpcWriteOptions(compression="zstd", emit_dictionary_deltas=True)
+        return ipc.new_file(file_path, schema, options=options)
+
+    def _columns_to_arrow(self, pa, columns: Dict[str, list], schema, encoders: Dict[str, _DictionaryEncoder]):
+        arrays = []
+        for field in schema:
+            column = columns[field.name]
+            if field.name in DATE_COLUMNS:
+                # Notion dates may carry a time part ("2024-01-01T10:00:00.000+01:00")
+                arrays.append(pa.array([_to_date(v) for v in column], type=field.type))
+            elif field.name in NUMBER_COLUMNS:
+                arrays.append(pa.array(
+                    [float(v) if v is not None else None for v in column],
+                    type=field.type,
+                ))
+            elif field.name in DICTIONARY_COLUMNS:
+                arrays.append(encoders[field.name].encode(pa, column))
+            else:
+                arrays.append(pa.array(column, type=field.type))
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    def _load_project_map(self) -> Dict[str, str]:
+        """
+        Builds a map of page_id -> title for every project, without needing
+        the expense records first (used by the streaming exports).
+        """
+        project_db_id = self._project_database_id()
+        if not project_db_id:
+            return {}
+
+        mapping = {}
+        for p in self.notion.fetch_database_query(project_db_id):
+            mapping[p["id"]] = self._page_title(p)
+        return mapping
+
+    def _project_database_id(self) -> Optional[str]:
+        if self.project_database_id is not None:
+            return self.project_database_id
+        return os.environ.get("NOTION_PROJECT_DATABASE_ID")
+
+    def _page_title(self, page: Dict) -> str:
+        for val in page.get("properties", {}).values():
+            if val.get("type") == "title":
+                t_list = val.get("title", [])
+                return t_list[0].get("plain_text", "") if t_list else "Untitled"
+        return "Untitled"
+
     def _build_project_map(self, records: List[Dict]) -> Dict[str, str]:
         """
         Builds a map of page_id -> title for related projects.
         """
-        project_db_id = os.environ.get("NOTION_PROJECT_DATABASE_ID")
+        project_db_id = self._project_database_id()
         if not project_db_id:
             return {}
 
@@ -87,6 +385,7 @@ class ExporterService:
 
         return mapping
 
+    @profiled
     def export_categories_to_csv(self, file_path: str, category_db_id: str) -> bool:
         try:
             records = self.notion.fetch_database_query(category_db_id)
@@ -115,71 +414,8 @@ class ExporterService:
             logger.error(f"Error exporting categories: {e}")
             return False
 
-    def _flatten_record(self, record: Dict, project_map: Dict[str, str]) -> Dict:
-        props = record.get("properties", {})
-
-        def get_number(prop_name):
-            return props.get(prop_name, {}).get("number")
-
-        def get_select(prop_name):
-            return props.get(prop_name, {}).get("select", {}).get("name")
-
-        def get_date(prop_name):
-            return props.get(prop_name, {}).get("date", {}).get("start")
-
-        def get_title(prop_name):
-            t = props.get(prop_name, {}).get("title", [])
-            return t[0].get("plain_text") if t else None
-
-        def get_relation_id(prop_name):
-            r = props.get(prop_name, {}).get("relation", [])
-            return r[0].get("id") if r else None
-
-        def get_rollup_value(prop_name):
-            # Try to extract plain text from rollup (array of text/select/etc)
-            rollup = props.get(prop_name, {}).get("rollup", {})
-            if rollup.get("type") == "array":
-                array = rollup.get("array", [])
-                if array:
-                    first = array[0]
-                    if first.get("type") == "select":
-                        return first["select"]["name"]
-                    if first.get("type") == "rich_text":
-                        return first["rich_text"][0].get("plain_text") if first["rich_text"] else None
-            return None
-
-        # Resolve Project Names
-        project_names = []
-        # From relation
-        relation = props.get("Proyecto/Viaje", {}).get("relation", [])
-        for r in relation:
-            name = project_map.get(r["id"])
-            if name: project_names.append(name)
-
-        # Original code also handled rollup for projects?
-        # "If not proyecto_names and proyecto_prop type == rollup"
-        if not project_names:
-            rollup = props.get("Proyecto/Viaje", {}).get("rollup", {})
-            if rollup.get("type") == "array":
-                 for item in rollup.get("array", []):
-                    if item.get("type") == "relation":
-                        rid = item["relation"]["id"]
-                        name = project_map.get(rid)
-                        if name: project_names.append(name)
-
-        project_str = ", ".join(project_names) if project_names else None
-
-        return {
-            "Nombre": get_title("Nombre"),
-            "Fecha": get_date("Fecha"),
-            "Cuenta": get_select("Cuenta"),
-            "Gasto": get_number("Gasto"),
-            "Ingreso": get_number("Ingreso"),
-            "Transferencias": get_number("Transferencias"),
-            "Subcategoría": get_relation_id("Subcategoría"),
-            "Categoría": get_rollup_value("Categoría"),
-            "Proyecto/Viaje": project_str,
-            "Mes": props.get("Mes", {}).get("formula", {}).get("string"),
-            "Script": props.get("Script", {}).get("checkbox"),
-            "url": record.get("url"),
-        }
+    def _flatten(self, pages: List[Dict], project_map: Dict[str, str]) -> Dict[str, list]:
+        """Column buffers (EXPORT_COLUMNS) for a batch of pages, via the compiled schema."""
+        if not pages:
+            return {col: [] for col in EXPORT_COLUMNS}
+        return self.notion.page_flattener(pages).flatten(pages, project_map)
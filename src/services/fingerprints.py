@@ -0,0 +1,65 @@
+import logging
+from collections import defaultdict
+from typing import List, Dict, Tuple, Optional, Callable
+
+from src.core.models import Transaction
+from src.services.notion_service import NotionClient, FINGERPRINT_PROPERTY
+from src.services.bulk import run_concurrently, BulkResult
+
+logger = logging.getLogger(__name__)
+
+
+def make_fingerprint(account: str, tx_date, cents: int, occurrence: int) -> str:
+    """Stable id of a bank movement: account, date, amount in cents and occurrence index."""
+    return f"{account}|{tx_date.isoformat()}|{cents}|{occurrence}"
+
+
+def assign_fingerprints(transactions: List[Transaction]) -> None:
+    """
+    Sets tx.fingerprint on every transaction. Identical movements on the
+    same day (two coffees at 1,50) get occurrence indexes 0, 1, ... in file
+    order, so both are kept and both are recognised on re-import.
+    """
+    seen: Dict[Tuple, int] = defaultdict(int)
+    for tx in transactions:
+        key = (tx.account, tx.date, tx.cents)
+        tx.fingerprint = make_fingerprint(tx.account, tx.date, tx.cents, seen[key])
+        seen[key] += 1
+
+
+def backfill_fingerprints(notion: NotionClient, max_workers: int = 4,
+                          progress: Optional[Callable[[int, int], None]] = None) -> BulkResult:
+    """
+    One-off migration: writes a fingerprint on every page that lacks one,
+    so later imports no longer need the date-range check for old pages.
+    Occurrence indexes already taken by fingerprinted pages are skipped.
+    """
+    notion.ensure_text_properties([FINGERPRINT_PROPERTY])
+
+    by_key: Dict[Tuple, List] = defaultdict(list)
+    for batch in notion.iter_page_batches():
+        for page in batch:
+            tx = notion._map_page_to_transaction(page)
+            if tx:
+                by_key[(tx.account, tx.date, tx.cents)].append((page.get("created_time", ""), tx))
+
+    updates = []
+    for (account, tx_date, cents), items in by_key.items():
+        used = {tx.fingerprint for _, tx in items if tx.fingerprint}
+        occurrence = 0
+        for _, tx in sorted(items, key=lambda item: item[0]):
+            if tx.fingerprint:
+                continue
+            while make_fingerprint(account, tx_date, cents, occurrence) in used:
+                occurrence += 1
+            fp = make_fingerprint(account, tx_date, cents, occurrence)
+            used.add(fp)
+            updates.append((tx.page_id, fp))
+
+    logger.info(f"Huellas pendientes de escribir: {len(updates)}")
+
+    def write(update) -> bool:
+        page_id, fp = update
+        return notion.update_page(page_id, {FINGERPRINT_PROPERTY: {"rich_text": [{"text": {"content": fp}}]}})
+
+    return run_concurrently(write, updates, max_workers=max_workers, progress=progress)
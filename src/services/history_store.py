@@ -0,0 +1,383 @@
+import json
+import logging
+import os
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.core.models import Transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_DIR = Path("history")
+
+# One raw little-endian file per column; rows are kept sorted by date
+COLUMNS = {
+    "days": np.dtype("<i4"),         # days since 1970-01-01
+    "cents": np.dtype("<i8"),        # signed amount
+    "account": np.dtype("<i2"),      # index into accounts.json
+    "description": np.dtype("<i4"),  # string table ids, -1 = empty
+    "subcategory": np.dtype("<i4"),
+    "page": np.dtype("<i4"),
+    "flags": np.dtype("u1"),         # bit 0: internal transfer
+    "run": np.dtype("<i4"),          # string id of the import run, -1 = unknown
+}
+FLAG_TRANSFER = 1
+EPOCH = date(1970, 1, 1).toordinal()
+
+
+def _to_day(d: date) -> int:
+    return d.toordinal() - EPOCH
+
+
+class HistorySlice:
+    """Zero-copy views over the rows of a date range."""
+    def __init__(self, store: "HistoryStore", columns: Dict[str, np.ndarray]):
+        self.store = store
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns["days"])
+
+    def __getattr__(self, name):
+        try:
+            return self.columns[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def select(self, mask: np.ndarray) -> "HistorySlice":
+        """Rows where mask is True (copies, unlike range slices)."""
+        return HistorySlice(self.store, {name: np.asarray(col)[mask] for name, col in self.columns.items()})
+
+    def to_transactions(self) -> List[Transaction]:
+        s = self.store
+        return [
+            Transaction(
+                date=date.fromordinal(int(day) + EPOCH),
+                description=s.string(desc) or "",
+                amount=int(cents) / 100,
+                account=s.accounts[acc],
+                subcategory=s.string(sub),
+                page_id=s.string(page),
+                is_transfer=bool(flags & FLAG_TRANSFER),
+            )
+            for day, cents, acc, desc, sub, page, flags in zip(
+                self.days, self.cents, self.account, self.description,
+                self.subcategory, self.page, self.flags)
+        ]
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Export-like columns (Nombre, Fecha, Cuenta, Gasto, Ingreso, Transferencias, Subcategoría, id)."""
+        s = self.store
+        cents = np.asarray(self.cents)
+        transfer = (np.asarray(self.flags) & FLAG_TRANSFER).astype(bool)
+        amounts = cents / 100
+        return pd.DataFrame({
+            "Nombre": [s.string(i) for i in self.description],
+            "Fecha": (np.asarray(self.days).astype("datetime64[D]")),
+            "Cuenta": pd.Categorical.from_codes(np.asarray(self.account), categories=s.accounts)
+                      if s.accounts else pd.Categorical([]),
+            "Gasto": np.where(~transfer & (cents < 0), -amounts, np.nan),
+            "Ingreso": np.where(~transfer & (cents > 0), amounts, np.nan),
+            "Transferencias": np.where(transfer, amounts, np.nan),
+            "Subcategoría": [s.string(i) for i in self.subcategory],
+            "id": [s.string(i) for i in self.page],
+        })
+
+
+class HistoryStore:
+    """
+    Local append-only columnar copy of the transaction history. Columns are
+    memory-mapped, descriptions and ids live in an interned string table,
+    and rows are kept sorted by date, so the sorted day column is the date
+    index: a range scan is two binary searches and a slice of each map.
+
+    Appends that arrive in date order are written at the end of the files;
+    older rows trigger a (cheap) merge rewrite to keep the order.
+    """
+    def __init__(self, path=DEFAULT_HISTORY_DIR):
+        self.path = Path(path)
+        self.rows = 0
+        self.accounts: List[str] = []
+        self._n_strings = 0
+        self._generation = 0  # Suffix of the column files; bumped by every rewrite
+        self._maps: Dict[str, np.ndarray] = {}
+        self._string_maps = None
+        self._intern: Optional[Dict[str, int]] = None
+        if (self.path / "meta.json").exists():
+            self._load_meta()
+
+    @classmethod
+    def open_existing(cls, path=DEFAULT_HISTORY_DIR) -> Optional["HistoryStore"]:
+        return cls(path) if (Path(path) / "meta.json").exists() else None
+
+    # --- metadata and raw files -------------------------------------------------
+
+    def _load_meta(self):
+        with open(self.path / "meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.rows = meta["rows"]
+        self.accounts = meta["accounts"]
+        self._n_strings = meta["strings"]
+        self._generation = meta.get("generation", 0)
+
+    def _save_meta(self):
+        # meta.json is the commit point: bytes past `rows` in a column file are ignored,
+        # and column files of another generation are not read
+        tmp = self.path / "meta.json.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"rows": self.rows, "accounts": self.accounts, "strings": self._n_strings,
+                       "generation": self._generation}, f)
+        os.replace(tmp, self.path / "meta.json")
+
+    def refresh(self):
+        """
+        Re-reads the on-disk state, which another process or instance may have
+        changed. Writers call it first, while holding the local state lease.
+        """
+        if not (self.path / "meta.json").exists():
+            return
+        known = (self.rows, self._n_strings, self._generation, list(self.accounts))
+        self._load_meta()
+        if (self.rows, self._n_strings, self._generation, self.accounts) != known:
+            self._close_maps()
+            self._intern = None
+
+    def _column_path(self, name: str, generation: Optional[int] = None) -> Path:
+        generation = self._generation if generation is None else generation
+        return self.path / (f"{name}.bin" if generation == 0 else f"{name}.{generation}.bin")
+
+    def _close_maps(self):
+        self._maps = {}
+        self._string_maps = None
+
+    def _column(self, name: str) -> np.ndarray:
+        if name not in self._maps:
+            if self.rows == 0:
+                self._maps[name] = np.zeros(0, dtype=COLUMNS[name])
+            elif name == "run" and not self._column_path(name).exists():
+                # Stores written before runs were recorded
+                self._maps[name] = np.full(self.rows, -1, dtype=COLUMNS[name])
+            else:
+                self._maps[name] = np.memmap(self._column_path(name), dtype=COLUMNS[name],
+                                             mode="r", shape=(self.rows,))
+        return self._maps[name]
+
+    def _append_raw(self, file_path: Path, data: np.ndarray, keep_items: int):
+        with open(file_path, "ab") as f:
+            # Drop leftovers of an interrupted append before writing
+            f.truncate(keep_items * data.dtype.itemsize)
+            f.write(np.ascontiguousarray(data).tobytes())
+
+    # --- string table -----------------------------------------------------------
+
+    def _strings(self):
+        if self._string_maps is None:
+            if self._n_strings == 0:
+                self._string_maps = (np.zeros(1, dtype="<i8"), b"")
+            else:
+                offsets = np.memmap(self.path / "offsets.bin", dtype="<i8", mode="r",
+                                    shape=(self._n_strings + 1,))
+                blob = np.memmap(self.path / "strings.bin", dtype="u1", mode="r",
+                                 shape=(int(offsets[-1]),)) if offsets[-1] else b""
+                self._string_maps = (offsets, blob)
+        return self._string_maps
+
+    def string(self, string_id) -> Optional[str]:
+        string_id = int(string_id)
+        if string_id < 0:
+            return None
+        offsets, blob = self._strings()
+        return bytes(blob[int(offsets[string_id]):int(offsets[string_id + 1])]).decode("utf-8")
+
+    def _intern_strings(self, values: List[Optional[str]]) -> np.ndarray:
+        if self._intern is None:
+            self._intern = {self.string(i): i for i in range(self._n_strings)}
+
+        ids = np.empty(len(values), dtype="<i4")
+        new_strings = []
+        for i, value in enumerate(values):
+            if value is None or value == "":
+                ids[i] = -1
+                continue
+            sid = self._intern.get(value)
+            if sid is None:
+                sid = self._n_strings + len(new_strings)
+                self._intern[value] = sid
+                new_strings.append(value)
+            ids[i] = sid
+
+        if new_strings:
+            offsets, _ = self._strings()
+            encoded = [s.encode("utf-8") for s in new_strings]
+            start = int(offsets[-1])
+            new_offsets = start + np.cumsum([len(b) for b in encoded], dtype=np.int64)
+            self._string_maps = None
+            if self._n_strings == 0:
+                self._append_raw(self.path / "offsets.bin", np.zeros(1, dtype="<i8"), 0)
+            self._append_raw(self.path / "strings.bin", np.frombuffer(b"".join(encoded), dtype="u1"), start)
+            self._append_raw(self.path / "offsets.bin", new_offsets.astype("<i8"), self._n_strings + 1)
+            self._n_strings += len(new_strings)
+        return ids
+
+    # --- writing ----------------------------------------------------------------
+
+    def append(self, transactions: List[Transaction], run_id: Optional[str] = None):
+        """Adds transactions to the store, keeping rows sorted by date. run_id allows remove_run."""
+        if not transactions:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        # Another instance may have appended since this one was loaded
+        self.refresh()
+        if self.rows and not self._column_path("run").exists():
+            self._append_raw(self._column_path("run"), np.full(self.rows, -1, dtype=COLUMNS["run"]), 0)
+
+        account_codes = {name: i for i, name in enumerate(self.accounts)}
+        for tx in transactions:
+            if tx.account not in account_codes:
+                account_codes[tx.account] = len(self.accounts)
+                self.accounts.append(tx.account)
+
+        batch = {
+            "days": np.array([_to_day(t.date) for t in transactions], dtype=COLUMNS["days"]),
+            "cents": np.array([t.cents for t in transactions], dtype=COLUMNS["cents"]),
+            "account": np.array([account_codes[t.account] for t in transactions], dtype=COLUMNS["account"]),
+            "description": self._intern_strings([t.description for t in transactions]),
+            "subcategory": self._intern_strings([t.subcategory for t in transactions]),
+            "page": self._intern_strings([t.page_id for t in transactions]),
+            "flags": np.array([FLAG_TRANSFER if t.is_transfer else 0 for t in transactions],
+                              dtype=COLUMNS["flags"]),
+            "run": self._intern_strings([run_id] * len(transactions)),
+        }
+        order = np.argsort(batch["days"], kind="stable")
+        batch = {name: col[order] for name, col in batch.items()}
+
+        days = self._column("days")
+        if self.rows == 0 or batch["days"][0] >= days[-1]:
+            self._close_maps()
+            for name, col in batch.items():
+                self._append_raw(self._column_path(name), col, self.rows)
+            self.rows += len(order)
+        else:
+            self._rewrite_merged(batch)
+        self._save_meta()
+
+    def _rewrite_merged(self, batch: Dict[str, np.ndarray]):
+        merged = {name: np.concatenate([np.asarray(self._column(name)), col]) for name, col in batch.items()}
+        order = np.argsort(merged["days"], kind="stable")
+        self._rewrite({name: col[order] for name, col in merged.items()})
+
+    def _rewrite(self, columns: Dict[str, np.ndarray]):
+        """
+        Writes every column to files of a new generation and commits them by
+        replacing meta.json, so a crash leaves either the old or the new store.
+        """
+        old_generation = self._generation
+        self._close_maps()
+        self._generation = old_generation + 1
+        for name, col in columns.items():
+            col.astype(COLUMNS[name]).tofile(self._column_path(name))
+        self.rows = len(columns["days"])
+        self._save_meta()
+        for name in COLUMNS:
+            try:
+                self._column_path(name, old_generation).unlink()
+            except OSError:
+                # Missing, or still mapped by a reader (Windows): left behind, never read again
+                pass
+
+    def remove_run(self, run_id: str) -> int:
+        """Deletes the rows appended by an import run (after a rollback). Returns how many."""
+        self.refresh()
+        if self.rows == 0:
+            return 0
+        if self._intern is None:
+            self._intern = {self.string(i): i for i in range(self._n_strings)}
+        string_id = self._intern.get(run_id)
+        if string_id is None:
+            return 0
+        keep = np.asarray(self._column("run")) != string_id
+        removed = int(self.rows - keep.sum())
+        if removed:
+            self._rewrite({name: np.asarray(self._column(name))[keep] for name in COLUMNS})
+        return removed
+
+    def mark_transfers(self, page_ids: List[str], transfer: bool = True):
+        """Sets (or, with transfer=False, clears) the transfer flag of the given pages' rows, in place."""
+        if not page_ids:
+            return
+        self.refresh()
+        if self.rows == 0:
+            return
+        if self._intern is None:
+            self._intern = {self.string(i): i for i in range(self._n_strings)}
+        ids = [self._intern[p] for p in page_ids if p in self._intern]
+        if not ids:
+            return
+        rows = np.isin(np.asarray(self._column("page")), ids)
+        self._close_maps()
+        flags = np.memmap(self._column_path("flags"), dtype=COLUMNS["flags"], mode="r+", shape=(self.rows,))
+        if transfer:
+            flags[rows] |= FLAG_TRANSFER
+        else:
+            flags[rows] &= ~np.uint8(FLAG_TRANSFER)
+        flags.flush()
+        del flags
+
+    def rebuild(self, transactions: List[Transaction]):
+        """Replaces the whole store (e.g. from a fresh export)."""
+        self._close_maps()
+        if self.path.exists():
+            for file_path in self.path.glob("*.bin"):
+                file_path.unlink()
+            meta = self.path / "meta.json"
+            if meta.exists():
+                meta.unlink()
+        self.rows, self.accounts, self._n_strings, self._intern = 0, [], 0, None
+        self._generation = 0
+        self.append(transactions)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._save_meta()
+
+    def rebuild_from_export(self, file_path: str):
+        from src.services.reporting import read_export
+
+        df = read_export(file_path)
+        df = df[df["Fecha"].notna()]
+        transactions = []
+        for row in df.itertuples(index=False):
+            gasto, ingreso, transfer = (getattr(row, c) for c in ("Gasto", "Ingreso", "Transferencias"))
+            is_transfer = False
+            if pd.notna(gasto):
+                amount = -float(gasto)
+            elif pd.notna(ingreso):
+                amount = float(ingreso)
+            elif pd.notna(transfer):
+                amount, is_transfer = float(transfer), True
+            else:
+                amount = 0.0
+            subcat = row.Subcategoría
+            page_id = getattr(row, "id", None)
+            transactions.append(Transaction(
+                date=date.fromisoformat(str(row.Fecha)[:10]),
+                description=str(row.Nombre) if pd.notna(row.Nombre) else "",
+                amount=amount,
+                account=str(row.Cuenta) if pd.notna(row.Cuenta) else "Unknown",
+                subcategory=str(subcat) if pd.notna(subcat) else None,
+                page_id=str(page_id) if page_id is not None and pd.notna(page_id) else None,
+                is_transfer=is_transfer,
+            ))
+        self.rebuild(transactions)
+        logger.info(f"Historial local reconstruido: {self.rows} movimientos")
+
+    # --- reading ----------------------------------------------------------------
+
+    def range(self, start: Optional[date] = None, end: Optional[date] = None) -> HistorySlice:
+        """Rows with start <= date <= end (both inclusive, open when None)."""
+        days = self._column("days")
+        lo = 0 if start is None else int(np.searchsorted(days, _to_day(start), side="left"))
+        hi = self.rows if end is None else int(np.searchsorted(days, _to_day(end), side="right"))
+        return HistorySlice(self, {name: self._column(name)[lo:hi] for name in COLUMNS})
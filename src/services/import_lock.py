@@ -0,0 +1,196 @@
+import json
+import logging
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager, ExitStack
+from datetime import date
+from pathlib import Path
+from typing import List, Optional
+
+from src.core.models import Transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCK_DIR = Path("logs") / "locks"
+# Lease name guarding the local history and rollup files
+LOCAL_STATE_LEASE = "_estado_local"
+
+
+class ImportLockTimeout(RuntimeError):
+    pass
+
+
+class ImportLease:
+    """
+    Cross-process, cross-thread lease on (account, date range). Leases are
+    files in a per-account directory; a short-lived mutex file created with
+    O_EXCL makes "check for overlaps, then write our lease" atomic. Leases
+    carry an expiry that a heartbeat thread keeps extending, so a crashed
+    import only blocks others until its lease expires. Works on Windows and
+    POSIX without extra dependencies.
+    """
+    MUTEX_STALE_SECONDS = 30
+
+    def __init__(self, account: str, start: date, end: date, lock_dir=DEFAULT_LOCK_DIR,
+                 ttl: float = 120.0, timeout: float = 600.0, poll: float = 0.2):
+        slug = re.sub(r"[^A-Za-z0-9_-]+", "_", account) or "_"
+        self.dir = Path(lock_dir) / slug
+        self.account = account
+        self.start = start
+        self.end = end
+        self.ttl = ttl
+        self.timeout = timeout
+        self.poll = poll
+        self.path = self.dir / f"{uuid.uuid4().hex}.lease"
+        self._stop = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    # --- mutex ------------------------------------------------------------------
+
+    def _acquire_mutex(self, deadline: float):
+        mutex = self.dir / ".mutex"
+        while True:
+            try:
+                fd = os.open(mutex, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                return
+            except FileExistsError:
+                if self._break_stale_mutex(mutex):
+                    continue
+            if time.monotonic() > deadline:
+                raise ImportLockTimeout(f"No se pudo bloquear {self.account}: otra importación no responde")
+            time.sleep(0.01)
+
+    def _break_stale_mutex(self, mutex: Path) -> bool:
+        """
+        Removes a mutex left behind by a crashed import. Returns True when the
+        caller should try to create the mutex again.
+        """
+        try:
+            if time.time() - mutex.stat().st_mtime <= self.MUTEX_STALE_SECONDS:
+                return False
+            # Only one waiter can rename it, and a waiter whose stat is outdated moves
+            # whatever mutex is there now instead of deleting it: checked again below
+            broken = mutex.with_name(f".mutex.{uuid.uuid4().hex}.stale")
+            os.rename(mutex, broken)
+        except FileNotFoundError:
+            return True
+
+        stale = time.time() - broken.stat().st_mtime > self.MUTEX_STALE_SECONDS
+        if not stale:
+            # Created after our stat: give it back to its owner (link fails if yet another exists)
+            try:
+                os.link(broken, mutex)
+            except OSError as e:
+                logger.warning(f"No se pudo devolver el bloqueo de {self.account}: {e}")
+        broken.unlink()
+        return stale
+
+    def _release_mutex(self):
+        try:
+            (self.dir / ".mutex").unlink()
+        except FileNotFoundError:
+            pass
+
+    # --- leases -----------------------------------------------------------------
+
+    def _write(self):
+        data = {
+            "account": self.account,
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "expires": time.time() + self.ttl,
+        }
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+    def _conflicts(self) -> List[dict]:
+        conflicts = []
+        now = time.time()
+        for lease_path in self.dir.glob("*.lease"):
+            try:
+                with open(lease_path, encoding="utf-8") as f:
+                    lease = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if lease.get("expires", 0) < now:
+                logger.warning(f"Liberando bloqueo caducado: {lease_path.name}")
+                lease_path.unlink(missing_ok=True)
+                continue
+            if date.fromisoformat(lease["start"]) <= self.end and self.start <= date.fromisoformat(lease["end"]):
+                conflicts.append(lease)
+        return conflicts
+
+    def acquire(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        deadline = time.monotonic() + self.timeout
+        waiting_logged = False
+        while True:
+            self._acquire_mutex(deadline)
+            try:
+                conflicts = self._conflicts()
+                if not conflicts:
+                    self._write()
+                    break
+            finally:
+                self._release_mutex()
+
+            if not waiting_logged:
+                logger.info(f"Esperando a otra importación de {self.account} "
+                            f"({conflicts[0]['start']} - {conflicts[0]['end']})")
+                waiting_logged = True
+            if time.monotonic() > deadline:
+                raise ImportLockTimeout(f"Otra importación de {self.account} sigue en curso")
+            time.sleep(self.poll)
+
+        self._stop.clear()
+        self._heartbeat = threading.Thread(target=self._renew_loop, daemon=True)
+        self._heartbeat.start()
+
+    def _renew_loop(self):
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                self._write()
+            except OSError as e:
+                logger.error(f"No se pudo renovar el bloqueo {self.path.name}: {e}")
+
+    def release(self):
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        self.path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+
+class ImportCoordinator:
+    """Takes the leases an import needs: one per account, over the file's date range."""
+    def __init__(self, lock_dir=DEFAULT_LOCK_DIR, ttl: float = 120.0, timeout: float = 600.0):
+        self.lock_dir = lock_dir
+        self.ttl = ttl
+        self.timeout = timeout
+
+    @contextmanager
+    def lease(self, transactions: List[Transaction]):
+        with ExitStack() as stack:
+            # Always in the same order, so two runs over several accounts cannot deadlock
+            for account in sorted({t.account for t in transactions}):
+                dates = [t.date for t in transactions if t.account == account]
+                stack.enter_context(ImportLease(account, min(dates), max(dates), self.lock_dir,
+                                                ttl=self.ttl, timeout=self.timeout))
+            yield
@@ -0,0 +1,131 @@
+import json
+import logging
+import os
+import uuid
+from datetime import date, datetime
+from typing import Dict, List, Optional, Callable
+
+from src.services.notion_service import NotionClient
+from src.services.bulk import run_concurrently, BulkResult
+from src.services.import_lock import ImportLease, DEFAULT_LOCK_DIR, LOCAL_STATE_LEASE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RUN_LOG_PATH = os.path.join("logs", "import_runs.jsonl")
+
+
+def new_run_id() -> str:
+    return f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+
+class ImportRunLog:
+    """
+    Append-only local log of import runs (JSON lines). Rollbacks are
+    appended as separate events and merged when listing.
+    """
+    def __init__(self, path: str = DEFAULT_RUN_LOG_PATH):
+        self.path = path
+
+    def _append(self, entry: Dict):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def record_run(self, run_id: str, file_path: str, parser_name: str, result) -> None:
+        self._append({
+            "event": "import",
+            "run_id": run_id,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "file": file_path,
+            "parser": parser_name,
+            "read": result.total_read,
+            "inserted": result.successful_inserts,
+            "duplicates": result.duplicates,
+            "errors": len(result.errors),
+            # Stored pages this run rewrote as transfers, with the amount to restore on rollback
+            "transfers_marked": [
+                {"page_id": tx.page_id, "amount": tx.amount}
+                for tx in getattr(result, "marked_transfers", [])
+            ],
+        })
+
+    def record_rollback(self, run_id: str, archived: int, failed: int) -> None:
+        self._append({
+            "event": "rollback",
+            "run_id": run_id,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "archived": archived,
+            "failed": failed,
+        })
+
+    def list_runs(self) -> List[Dict]:
+        """Import runs, oldest first, with a 'rolled_back' flag."""
+        if not os.path.exists(self.path):
+            return []
+
+        runs: Dict[str, Dict] = {}
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry.get("event") == "import":
+                    runs[entry["run_id"]] = dict(entry, rolled_back=False)
+                elif entry.get("event") == "rollback" and entry["run_id"] in runs:
+                    runs[entry["run_id"]]["rolled_back"] = entry.get("failed", 0) == 0
+        return list(runs.values())
+
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        for run in self.list_runs():
+            if run["run_id"] == run_id:
+                return run
+        return None
+
+    def last_run(self) -> Optional[Dict]:
+        runs = [r for r in self.list_runs() if not r["rolled_back"] and r["inserted"]]
+        return runs[-1] if runs else None
+
+
+def rollback_run(notion: NotionClient, run_id: str, run_log: Optional[ImportRunLog] = None,
+                 max_workers: int = 4,
+                 progress: Optional[Callable[[int, int], None]] = None,
+                 history=None, rollups=None, lock_dir=DEFAULT_LOCK_DIR) -> BulkResult:
+    """
+    Archives every page created by the given import run and gives back their
+    Gasto/Ingreso to the stored pages it marked as transfers. When every page
+    was archived, the run is also taken out of the local history and rollups.
+    """
+    page_ids = notion.find_pages_by_run(run_id)
+    logger.info(f"Deshaciendo importación {run_id}: {len(page_ids)} páginas")
+
+    result = run_concurrently(notion.archive_page, page_ids, max_workers=max_workers, progress=progress)
+    archived, archive_failed = result.succeeded, len(result.failed)
+
+    run = run_log.get_run(run_id) if run_log is not None else None
+    marked = (run or {}).get("transfers_marked", [])
+    restored_ids = []
+    if marked:
+        logger.info(f"Restaurando {len(marked)} movimientos marcados como transferencia")
+        restored = run_concurrently(lambda entry: notion.restore_amount(entry["page_id"], entry["amount"]),
+                                    marked, max_workers=max_workers)
+        failed_ids = {entry["page_id"] for entry, _ in restored.failed}
+        restored_ids = [entry["page_id"] for entry in marked if entry["page_id"] not in failed_ids]
+        result.succeeded += restored.succeeded
+        result.failed.extend(restored.failed)
+    logger.info(f"Importación {run_id} deshecha: {result.to_string()}")
+
+    # With pages left in Notion the run is not undone: keep its local rows so a retry finds them
+    if archive_failed == 0 and (history is not None or rollups is not None):
+        with ImportLease(LOCAL_STATE_LEASE, date.min, date.max, lock_dir):
+            if history is not None:
+                removed = history.remove_run(run_id)
+                history.mark_transfers(restored_ids, transfer=False)
+                logger.info(f"Historial: {removed} movimientos de {run_id} eliminados")
+            if rollups is not None:
+                rollups.reload()
+                if rollups.remove_run(run_id):
+                    rollups.save()
+
+    if run_log is not None:
+        run_log.record_rollback(run_id, archived, archive_failed)
+    return result
@@ -0,0 +1,79 @@
+import threading
+from datetime import date, timedelta
+from typing import Dict, Hashable, List, Optional, Tuple, Callable
+
+from src.core.models import Transaction
+
+Interval = Tuple[date, date]
+
+
+class IntervalCache:
+    """
+    In-session cache of date-range query results. For each key (e.g.
+    account and query flavour) it remembers which date windows were already
+    fetched, so later queries only need the uncovered gaps. Thread-safe.
+    """
+    def __init__(self):
+        self._covered: Dict[Hashable, List[Interval]] = {}
+        self._items: Dict[Hashable, List[Transaction]] = {}
+        self._lock = threading.Lock()
+
+    def missing(self, key: Hashable, start: date, end: date) -> List[Interval]:
+        """Sub-ranges of [start, end] (inclusive) not fetched yet for key."""
+        gaps = []
+        cursor = start
+        with self._lock:
+            for lo, hi in self._covered.get(key, []):
+                if hi < cursor:
+                    continue
+                if lo > end:
+                    break
+                if lo > cursor:
+                    gaps.append((cursor, lo - timedelta(days=1)))
+                cursor = max(cursor, hi + timedelta(days=1))
+                if cursor > end:
+                    break
+        if cursor <= end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def add_range(self, key: Hashable, start: date, end: date, transactions: List[Transaction]):
+        """Stores the result of fetching [start, end] for key."""
+        with self._lock:
+            items = self._items.setdefault(key, [])
+            seen = {t.page_id for t in items if t.page_id}
+            items.extend(t for t in transactions if not t.page_id or t.page_id not in seen)
+
+            merged = []
+            for lo, hi in sorted(self._covered.get(key, []) + [(start, end)]):
+                if merged and lo <= merged[-1][1] + timedelta(days=1):
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+                else:
+                    merged.append((lo, hi))
+            self._covered[key] = merged
+
+    def get(self, key: Hashable, start: date, end: date) -> List[Transaction]:
+        with self._lock:
+            return [t for t in self._items.get(key, []) if start <= t.date <= end]
+
+    def add_transaction(self, transaction: Transaction, accepts: Callable[[Hashable, Transaction], bool]):
+        """
+        Feeds one of our own inserts back into every key whose covered
+        windows include its date and for which accepts(key, tx) is True.
+        """
+        with self._lock:
+            for key, intervals in self._covered.items():
+                if not accepts(key, transaction):
+                    continue
+                if any(lo <= transaction.date <= hi for lo, hi in intervals):
+                    self._items[key].append(transaction)
+
+    def discard_page(self, page_id: str):
+        with self._lock:
+            for key, items in self._items.items():
+                self._items[key] = [t for t in items if t.page_id != page_id]
+
+    def clear(self):
+        with self._lock:
+            self._covered.clear()
+            self._items.clear()
@@ -1,17 +1,141 @@
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterator, Set
 import os
 import requests
 import logging
-import time
 from datetime import date
 from urllib3.util.retry import Retry
 from requests.adapters import HTTPAdapter
 from src.core.models import Transaction
+from src.services.rate_limiter import RateLimiter
+from src.services.interval_cache import IntervalCache
+from src.services.page_schema import PageFlattener
 
 logger = logging.getLogger(__name__)
 
+# Rich text property holding the id of the import run that created the page
+RUN_PROPERTY = "Importación"
+# Rich text property holding the transaction fingerprint used for dedup
+FINGERPRINT_PROPERTY = "Huella"
+# "async" selects SyncNotionClient (aiohttp, src/services/async_notion.py) instead of NotionClient
+CLIENT_ENV = "NOTION_CLIENT"
+
+
+def range_filter(start_date: date, end_date: date, legacy_only: bool = False,
+                 account: Optional[str] = None) -> Dict:
+    """Query filter for pages dated within [start_date, end_date]."""
+    page_filter = {
+        "and": [
+            {
+                "property": "Fecha",
+                "date": {
+                    "on_or_after": start_date.isoformat()
+                }
+            },
+            {
+                "property": "Fecha",
+                "date": {
+                    "on_or_before": end_date.isoformat()
+                }
+            }
+        ]
+    }
+    if legacy_only:
+        page_filter["and"].append(
+            {"property": FINGERPRINT_PROPERTY, "rich_text": {"is_empty": True}}
+        )
+    if account:
+        page_filter["and"].append({"property": "Cuenta", "select": {"equals": account}})
+    return page_filter
+
+
+def fingerprint_filter(fingerprints: List[str]) -> Dict:
+    return {"or": [
+        {"property": FINGERPRINT_PROPERTY, "rich_text": {"equals": fp}} for fp in fingerprints
+    ]}
+
+
+def page_fingerprints(pages: List[Dict]) -> Set[str]:
+    found = set()
+    for page in pages:
+        text = page.get("properties", {}).get(FINGERPRINT_PROPERTY, {}).get("rich_text", [])
+        if text:
+            found.add(text[0].get("plain_text"))
+    return found
+
+
+def transfer_candidate_filter(amounts: List[float], start_date: date, end_date: date) -> Dict:
+    """Pages within the dates whose Gasto or Ingreso is one of the (absolute) amounts."""
+    date_filters = [
+        {"property": "Fecha", "date": {"on_or_after": start_date.isoformat()}},
+        {"property": "Fecha", "date": {"on_or_before": end_date.isoformat()}},
+    ]
+    amount_filters = [{"property": prop, "number": {"equals": a}}
+                      for a in amounts for prop in ("Gasto", "Ingreso")]
+    return {"and": date_filters + [{"or": amount_filters}]}
+
+
+def range_cache_accepts(key, tx: Transaction) -> bool:
+    """Whether a freshly inserted page belongs to the cached range query `key`."""
+    account, legacy_only = key
+    # Fingerprinted pages never show up in legacy-only queries
+    return (account is None or account == tx.account) and not (legacy_only and tx.fingerprint)
+
+
+def page_to_transaction(page: Dict) -> Optional[Transaction]:
+    """Single-page mapping; batches should go through a PageFlattener compiled once."""
+    transactions = PageFlattener.from_pages([page]).transactions([page], FINGERPRINT_PROPERTY)
+    return transactions[0] if transactions else None
+
+
+def transaction_payload(database_id: str, transaction: Transaction, run_id: Optional[str] = None) -> Dict:
+    """Body of the create-page request for a transaction."""
+    properties = {
+        "Nombre": {"title": [{"text": {"content": transaction.description}}]},
+        "Fecha": {"date": {"start": transaction.date.isoformat()}},
+        "Cuenta": {"select": {"name": transaction.account}},
+        "Script": {"checkbox": True},
+    }
+
+    if transaction.is_transfer:
+        properties["Transferencias"] = {"number": transaction.amount}
+    elif transaction.is_expense:
+        properties["Gasto"] = {"number": transaction.abs_amount}
+    else:
+        properties["Ingreso"] = {"number": transaction.abs_amount}
+
+    if transaction.fingerprint:
+        properties[FINGERPRINT_PROPERTY] = {"rich_text": [{"text": {"content": transaction.fingerprint}}]}
+
+    if run_id:
+        properties[RUN_PROPERTY] = {"rich_text": [{"text": {"content": run_id}}]}
+
+    if transaction.subcategory:
+        properties["Subcategoría"] = {"relation": [{"id": transaction.subcategory}]}
+
+    return {
+        "parent": {"database_id": database_id},
+        "properties": properties
+    }
+
+
+def create_session(pool_size: int = 10) -> requests.Session:
+    """HTTP session with retries on rate limiting and server errors, keeping up to pool_size connections."""
+    session = requests.Session()
+    retry = Retry(
+        total=5,
+        backoff_factor=1,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["POST", "GET", "PATCH"],
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
 class NotionClient:
-    def __init__(self, token: Optional[str] = None, database_id: Optional[str] = None):
+    def __init__(self, token: Optional[str] = None, database_id: Optional[str] = None,
+                 rate_limiter: Optional[RateLimiter] = None, session: Optional[requests.Session] = None):
         self.token = token or os.environ.get("NOTION_TOKEN")
         self.database_id = database_id or os.environ.get("NOTION_DATABASE_ID")
         self.api_url = "https://api.notion.com/v1/"
@@ -26,47 +150,39 @@ class NotionClient:
             "Content-Type": "application/json",
         }
 
-        self.session = self._create_session()
-
-    def _create_session(self) -> requests.Session:
-        session = requests.Session()
-        retry = Retry(
-            total=5,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["POST", "GET"],
-        )
-        adapter = HTTPAdapter(max_retries=retry)
-        session.mount("https://", adapter)
-        session.mount("http://", adapter)
-        return session
-
-    def get_transactions_in_range(self, start_date: date, end_date: date) -> List[Transaction]:
+        # Clients on the same integration token may share one session (and its connection pool)
+        self.session = session or create_session()
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self._schema: Optional[Dict[str, Dict]] = None
+        self._flattener: Optional[PageFlattener] = None
+        self.range_cache = IntervalCache()
+        self._known_fingerprints: Set[str] = set()
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Sends a request through the shared session, paced by the rate limiter."""
+        self.rate_limiter.acquire()
+        return self.session.request(method, url, headers=self.headers, **kwargs)
+
+    def get_transactions_in_range(self, start_date: date, end_date: date,
+                                  legacy_only: bool = False, account: Optional[str] = None) -> List[Transaction]:
         """
         Fetches transactions from Notion within the given date range.
         Optimized to avoid downloading the whole database.
+        legacy_only restricts it to pages without a fingerprint, account to one Cuenta.
+        Windows already fetched in this session are served from the interval
+        cache; only the uncovered gaps are queried.
         """
+        key = (account, legacy_only)
+        for gap_start, gap_end in self.range_cache.missing(key, start_date, end_date):
+            fetched = self._query_transactions_in_range(gap_start, gap_end, legacy_only, account)
+            self.range_cache.add_range(key, gap_start, gap_end, fetched)
+        return self.range_cache.get(key, start_date, end_date)
+
+    def _query_transactions_in_range(self, start_date: date, end_date: date,
+                                     legacy_only: bool, account: Optional[str]) -> List[Transaction]:
         query_url = f"{self.api_url}databases/{self.database_id}/query"
 
-        # Filter payload
-        payload = {
-            "filter": {
-                "and": [
-                    {
-                        "property": "Fecha",
-                        "date": {
-                            "on_or_after": start_date.isoformat()
-                        }
-                    },
-                    {
-                        "property": "Fecha",
-                        "date": {
-                            "on_or_before": end_date.isoformat()
-                        }
-                    }
-                ]
-            }
-        }
+        payload = {"filter": range_filter(start_date, end_date, legacy_only, account)}
 
         results = []
         has_more = True
@@ -76,7 +192,7 @@ class NotionClient:
             if next_cursor:
                 payload["start_cursor"] = next_cursor
 
-            response = self.session.post(query_url, headers=self.headers, json=payload)
+            response = self._request("POST", query_url, json=payload)
             response.raise_for_status()
             data = response.json()
 
@@ -84,69 +200,108 @@ class NotionClient:
             has_more = data.get("has_more", False)
             next_cursor = data.get("next_cursor")
 
-        transactions = []
-        for page in results:
-            t = self._map_page_to_transaction(page)
-            if t:
-                transactions.append(t)
-        return transactions
+        return self._map_pages(results)
+
+    def _map_pages(self, pages: List[Dict]) -> List[Transaction]:
+        """Batch version of _map_page_to_transaction, through the compiled schema."""
+        if not pages:
+            return []
+        return self.page_flattener(pages).transactions(pages, FINGERPRINT_PROPERTY)
 
     def _map_page_to_transaction(self, page: Dict) -> Optional[Transaction]:
-        props = page.get("properties", {})
-
-        # Extract Date
-        date_prop = props.get("Fecha", {}).get("date")
-        if not date_prop:
-            return None
-        tx_date_str = date_prop.get("start")
-        tx_date = date.fromisoformat(tx_date_str)
-
-        # Extract Account
-        account_select = props.get("Cuenta", {}).get("select")
-        account = account_select.get("name") if account_select else "Unknown"
-
-        # Extract Name
-        title_list = props.get("Nombre", {}).get("title", [])
-        description = title_list[0].get("plain_text") if title_list else "Sin Nombre"
-
-        # Extract Amount (Gasto or Ingreso)
-        expense = props.get("Gasto", {}).get("number")
-        income = props.get("Ingreso", {}).get("number")
-
-        amount = 0.0
-        if expense is not None:
-            amount = -float(expense) # Store as negative
-        elif income is not None:
-            amount = float(income)
-
-        return Transaction(
-            date=tx_date,
-            description=description,
-            amount=amount,
-            account=account
-        )
+        return page_to_transaction(page)
 
     def fetch_all_pages(self) -> List[Dict]:
         """Fetches all pages from the database (for export)."""
-        query_url = f"{self.api_url}databases/{self.database_id}/query"
         results = []
+        for batch in self.iter_page_batches():
+            results.extend(batch)
+        return results
+
+    def iter_page_batches(self, filter: Optional[Dict] = None,
+                          filter_properties: Optional[List[str]] = None) -> Iterator[List[Dict]]:
+        """
+        Streams the database query one API page (up to 100 records) at a time,
+        so callers can process large databases without holding every page.
+        filter_properties (property ids) limits which properties Notion returns.
+        """
+        params = [("filter_properties", prop_id) for prop_id in filter_properties or []]
+        query_url = f"{self.api_url}databases/{self.database_id}/query"
         has_more = True
         next_cursor = None
 
         while has_more:
-            payload = {}
+            payload = {"page_size": 100}
+            if filter:
+                payload["filter"] = filter
             if next_cursor:
                 payload["start_cursor"] = next_cursor
 
-            response = self.session.post(query_url, headers=self.headers, json=payload)
+            response = self._request("POST", query_url, json=payload, params=params)
             response.raise_for_status()
             data = response.json()
 
-            results.extend(data.get("results", []))
+            yield data.get("results", [])
             has_more = data.get("has_more", False)
             next_cursor = data.get("next_cursor")
 
-        return results
+    def find_existing_fingerprints(self, fingerprints: List[str], batch_size: int = 50) -> Set[str]:
+        """
+        Returns the subset of fingerprints already stored in Notion, using
+        one OR-filtered query per batch, so the cost depends on the file size
+        and not on the date span it covers.
+        """
+        found = self._known_fingerprints & set(fingerprints)
+        unique = sorted(set(fingerprints) - found)
+        for i in range(0, len(unique), batch_size):
+            chunk = unique[i:i + batch_size]
+            for batch in self.iter_page_batches(filter=fingerprint_filter(chunk)):
+                found.update(page_fingerprints(batch))
+        found &= set(fingerprints)
+        # Only positive answers are cached: another run may insert the others
+        self._known_fingerprints |= found
+        return found
+
+    def get_transfer_candidates(self, amounts: List[float], start_date: date, end_date: date,
+                                batch_size: int = 25) -> List[Transaction]:
+        """
+        Fetches stored expenses/incomes within the date range whose absolute
+        amount is one of `amounts`, i.e. the possible other side of a transfer.
+        """
+        unique = sorted({round(abs(a), 2) for a in amounts if a})
+
+        transactions = []
+        for i in range(0, len(unique), batch_size):
+            chunk = unique[i:i + batch_size]
+            for batch in self.iter_page_batches(filter=transfer_candidate_filter(chunk, start_date, end_date)):
+                transactions.extend(self._map_pages(batch))
+        return transactions
+
+    def mark_as_transfer(self, transaction: Transaction) -> bool:
+        """Moves a stored page's amount from Gasto/Ingreso to a signed Transferencias."""
+        return self.update_page(transaction.page_id, {
+            "Gasto": {"number": None},
+            "Ingreso": {"number": None},
+            "Transferencias": {"number": transaction.amount},
+        })
+
+    def restore_amount(self, page_id: str, amount: float) -> bool:
+        """Undoes mark_as_transfer: the signed amount goes back to Gasto or Ingreso."""
+        return self.update_page(page_id, {
+            "Gasto": {"number": -amount if amount < 0 else None},
+            "Ingreso": {"number": amount if amount > 0 else None},
+            "Transferencias": {"number": None},
+        })
+
+    def fetch_page_ids(self) -> Set[str]:
+        """
+        Lists the ids of all live pages. Only the title property is requested,
+        so this sweep is much lighter than fetch_all_pages.
+        """
+        ids = set()
+        for batch in self.iter_page_batches(filter_properties=["title"]):
+            ids.update(page["id"] for page in batch)
+        return ids
 
     def fetch_database_query(self, database_id: str) -> List[Dict]:
         """Generic fetch for any database (e.g., categories, projects)."""
@@ -160,7 +315,7 @@ class NotionClient:
             if next_cursor:
                 payload["start_cursor"] = next_cursor
 
-            response = self.session.post(query_url, headers=self.headers, json=payload)
+            response = self._request("POST", query_url, json=payload)
             if response.status_code != 200:
                 logger.error(f"Error fetching DB {database_id}: {response.text}")
                 break
@@ -174,7 +329,7 @@ class NotionClient:
 
     def get_page_title(self, page_id: str) -> Optional[str]:
         url = f"{self.api_url}pages/{page_id}"
-        resp = self.session.get(url, headers=self.headers)
+        resp = self._request("GET", url)
         if resp.status_code == 200:
             props = resp.json().get("properties", {})
             # This is specific logic to extract title from whatever property is title
@@ -186,33 +341,110 @@ class NotionClient:
                         return titles[0].get("plain_text")
         return None
 
-    def create_transaction(self, transaction: Transaction) -> bool:
+    def get_database_schema(self) -> Dict[str, Dict]:
+        """Property name -> definition (with its "type"), read once per client."""
+        if self._schema is None:
+            response = self._request("GET", f"{self.api_url}databases/{self.database_id}")
+            response.raise_for_status()
+            self._schema = response.json().get("properties", {})
+        return self._schema
+
+    def page_flattener(self, sample_pages: Optional[List[Dict]] = None) -> PageFlattener:
+        """
+        Extractors compiled from the database schema, built once per client.
+        If the schema cannot be read, the first of sample_pages is used instead.
+        """
+        if self._flattener is None:
+            try:
+                self._flattener = PageFlattener(self.get_database_schema())
+            except Exception as e:
+                if not sample_pages:
+                    raise
+                logger.warning(f"No se pudo leer el esquema de la base de datos ({e}); se usa el de las páginas")
+                self._flattener = PageFlattener.from_pages(sample_pages)
+        return self._flattener
+
+    def ensure_text_properties(self, names: List[str]):
+        """
+        Adds the given rich_text properties to the database if they are
+        missing. The schema is read once per client.
+        """
+        schema = self.get_database_schema()
+        missing = [name for name in names if name not in schema]
+        if not missing:
+            return
+
+        logger.info(f"Añadiendo propiedades a la base de datos: {missing}")
+        db_url = f"{self.api_url}databases/{self.database_id}"
+        response = self._request("PATCH", db_url, json={"properties": {name: {"rich_text": {}} for name in missing}})
+        response.raise_for_status()
+        schema.update({name: {"type": "rich_text"} for name in missing})
+        self._flattener = None
+
+    def create_transaction(self, transaction: Transaction, run_id: Optional[str] = None) -> bool:
         url = f"{self.api_url}pages"
 
-        properties = {
-            "Nombre": {"title": [{"text": {"content": transaction.description}}]},
-            "Fecha": {"date": {"start": transaction.date.isoformat()}},
-            "Cuenta": {"select": {"name": transaction.account}},
-            "Script": {"checkbox": True},
-        }
+        data = transaction_payload(self.database_id, transaction, run_id)
+
+        try:
+            response = self._request("POST", url, json=data)
+            response.raise_for_status()
+            transaction.page_id = response.json().get("id")
+            self._remember_insert(transaction)
+            return True
+        except Exception as e:
+            logger.error(f"Error creating transaction: {e}")
+            return False
 
-        if transaction.is_expense:
-             properties["Gasto"] = {"number": transaction.abs_amount}
-        else:
-             properties["Ingreso"] = {"number": transaction.abs_amount}
+    def _remember_insert(self, transaction: Transaction):
+        """Keeps the session caches coherent with our own inserts, without re-querying."""
+        if transaction.fingerprint:
+            self._known_fingerprints.add(transaction.fingerprint)
 
-        if transaction.subcategory:
-             properties["Subcategoría"] = {"relation": [{"id": transaction.subcategory}]}
+        self.range_cache.add_transaction(transaction, range_cache_accepts)
 
-        data = {
-            "parent": {"database_id": self.database_id},
-            "properties": properties
-        }
+    def update_page(self, page_id: str, properties: Dict) -> bool:
+        url = f"{self.api_url}pages/{page_id}"
+        try:
+            response = self._request("PATCH", url, json={"properties": properties})
+            response.raise_for_status()
+            return True
+        except Exception as e:
+            logger.error(f"Error updating page {page_id}: {e}")
+            return False
 
+    def archive_page(self, page_id: str) -> bool:
+        url = f"{self.api_url}pages/{page_id}"
         try:
-            response = self.session.post(url, headers=self.headers, json=data)
+            response = self._request("PATCH", url, json={"archived": True})
             response.raise_for_status()
+            self.range_cache.discard_page(page_id)
+            # The archived page's fingerprint may be in the positive cache
+            self._known_fingerprints.clear()
             return True
         except Exception as e:
-            logger.error(f"Error creating transaction: {e}")
+            logger.error(f"Error archiving page {page_id}: {e}")
             return False
+
+    def find_pages_by_run(self, run_id: str) -> List[str]:
+        """Returns the ids of the pages created by the given import run."""
+        page_filter = {"property": RUN_PROPERTY, "rich_text": {"equals": run_id}}
+        ids = []
+        for batch in self.iter_page_batches(filter=page_filter, filter_properties=["title"]):
+            ids.extend(page["id"] for page in batch)
+        return ids
+
+
+def use_async_client() -> bool:
+    return os.environ.get(CLIENT_ENV, "").strip().lower() == "async"
+
+
+def create_client(token: Optional[str] = None, database_id: Optional[str] = None):
+    """
+    The Notion client the application uses: NotionClient, or with
+    NOTION_CLIENT=async the aiohttp-based SyncNotionClient (same API).
+    """
+    if use_async_client():
+        from src.services.async_notion import SyncNotionClient
+        return SyncNotionClient(token=token, database_id=database_id)
+    return NotionClient(token, database_id)
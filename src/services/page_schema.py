@@ -0,0 +1,218 @@
+"""
+Schema-compiled flattening of Notion pages.
+
+The database schema (property name -> type) is read once and compiled into
+one extractor per exported column. Each extractor walks a whole batch of
+pages in a single list comprehension and fills a column buffer, instead of
+walking every page's properties with nested .get() chains.
+"""
+import logging
+from datetime import date
+from typing import Callable, Dict, List, Optional, Iterable
+
+from src.core.models import Transaction
+
+logger = logging.getLogger(__name__)
+
+# Property read for the Proyecto/Viaje column (relation, or rollup of relations)
+PROJECT_PROPERTY = "Proyecto/Viaje"
+
+ColumnExtractor = Callable[[List[Dict]], list]
+
+
+# Safe per-value readers: used when a batch does not match the schema
+# (missing property, null value, unexpected shape)
+
+def _read_title(prop):
+    items = (prop or {}).get("title") or (prop or {}).get("rich_text") or []
+    return items[0].get("plain_text") if items else None
+
+
+def _read_select(prop):
+    return ((prop or {}).get("select") or (prop or {}).get("status") or {}).get("name")
+
+
+def _read_date(prop):
+    return ((prop or {}).get("date") or {}).get("start")
+
+
+def _read_relation(prop):
+    items = (prop or {}).get("relation") or []
+    return items[0].get("id") if items else None
+
+
+def _read_formula(prop):
+    formula = (prop or {}).get("formula") or {}
+    return formula.get(formula.get("type"))
+
+
+def _read_rollup(prop):
+    # First value of an array rollup (select or text)
+    rollup = (prop or {}).get("rollup") or {}
+    if rollup.get("type") == "array":
+        array = rollup.get("array", [])
+        if array:
+            first = array[0]
+            if first.get("type") == "select":
+                return (first.get("select") or {}).get("name")
+            if first.get("type") == "rich_text":
+                return first["rich_text"][0].get("plain_text") if first["rich_text"] else None
+    return None
+
+
+def _read_scalar(kind):
+    def read(prop):
+        return (prop or {}).get(kind)
+    return read
+
+
+SAFE_READERS = {
+    "title": _read_title,
+    "rich_text": _read_title,
+    "select": _read_select,
+    "status": _read_select,
+    "date": _read_date,
+    "relation": _read_relation,
+    "formula": _read_formula,
+    "rollup": _read_rollup,
+}
+
+
+def _fast_reader(name: str, kind: str) -> Optional[ColumnExtractor]:
+    """Column comprehension assuming every page has the property with its schema shape."""
+    if kind in ("title", "rich_text"):
+        return lambda props: [t[0]["plain_text"] if (t := p[name][kind]) else None for p in props]
+    if kind in ("select", "status"):
+        return lambda props: [s["name"] if (s := p[name][kind]) else None for p in props]
+    if kind == "date":
+        return lambda props: [d["start"] if (d := p[name]["date"]) else None for p in props]
+    if kind == "relation":
+        return lambda props: [r[0]["id"] if (r := p[name]["relation"]) else None for p in props]
+    if kind == "formula":
+        return lambda props: [f.get(f["type"]) for f in [p[name]["formula"] for p in props]]
+    if kind in ("number", "checkbox", "url", "email", "phone_number"):
+        return lambda props: [p[name][kind] for p in props]
+    return None
+
+
+def _property_type(prop: Dict) -> Optional[str]:
+    # Values without an explicit "type" are keyed by it ({"number": 5})
+    if prop.get("type"):
+        return prop["type"]
+    return next((key for key in prop if key not in ("id", "name", "description", "has_more")), None)
+
+
+def compile_property(name: str, kind: Optional[str]) -> ColumnExtractor:
+    """Extractor for one property of the given schema type."""
+    if kind is None:
+        # Not in the database: an empty column
+        return lambda props: [None] * len(props)
+
+    safe = SAFE_READERS.get(kind, _read_scalar(kind))
+    fast = _fast_reader(name, kind)
+
+    def extract(props: List[Dict]) -> list:
+        if fast is not None:
+            try:
+                return fast(props)
+            except (KeyError, TypeError, IndexError, AttributeError):
+                pass
+        return [safe(p.get(name)) for p in props]
+
+    return extract
+
+
+class PageFlattener:
+    """
+    Compiled from a schema of {property name: {"type": ...}} (the
+    `properties` of GET databases/{id}, or of any page of the database).
+    """
+
+    def __init__(self, schema: Dict[str, Dict]):
+        self.types = {name: _property_type(prop) for name, prop in schema.items()}
+        self._extractors: Dict[str, ColumnExtractor] = {}
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[Dict]) -> "PageFlattener":
+        """Schema taken from the first page, when the database schema is not at hand."""
+        for page in pages:
+            return cls(page.get("properties", {}))
+        return cls({})
+
+    def extractor(self, name: str) -> ColumnExtractor:
+        extract = self._extractors.get(name)
+        if extract is None:
+            extract = self._extractors[name] = compile_property(name, self.types.get(name))
+        return extract
+
+    def columns(self, pages: List[Dict], names: Iterable[str]) -> Dict[str, list]:
+        """Column buffers for the given properties, one value per page."""
+        props = [page.get("properties") or {} for page in pages]
+        return {name: self.extractor(name)(props) for name in names}
+
+    def flatten(self, pages: List[Dict], project_map: Optional[Dict[str, str]] = None) -> Dict[str, list]:
+        """
+        Column buffers with the export layout (EXPORT_COLUMNS): project
+        relations resolved to names through project_map, plus url and id.
+        """
+        props = [page.get("properties") or {} for page in pages]
+        columns = {}
+        for name in ("Nombre", "Fecha", "Cuenta", "Gasto", "Ingreso", "Transferencias",
+                     "Subcategoría", "Categoría"):
+            columns[name] = self.extractor(name)(props)
+        columns[PROJECT_PROPERTY] = self._project_names(props, project_map or {})
+        columns["Mes"] = self.extractor("Mes")(props)
+        columns["Script"] = self.extractor("Script")(props)
+        columns["url"] = [page.get("url") for page in pages]
+        columns["id"] = [page.get("id") for page in pages]
+        return columns
+
+    def _project_names(self, props: List[Dict], project_map: Dict[str, str]) -> list:
+        kind = self.types.get(PROJECT_PROPERTY)
+        if kind is None:
+            return [None] * len(props)
+
+        names = []
+        for p in props:
+            prop = p.get(PROJECT_PROPERTY) or {}
+            found = [project_map[r["id"]] for r in prop.get("relation") or () if r.get("id") in project_map]
+            if not found:
+                rollup = prop.get("rollup") or {}
+                if rollup.get("type") == "array":
+                    found = [project_map[item["relation"]["id"]] for item in rollup.get("array", [])
+                             if item.get("type") == "relation" and item["relation"]["id"] in project_map]
+            names.append(", ".join(found) if found else None)
+        return names
+
+    def transactions(self, pages: List[Dict], fingerprint_property: str) -> List[Transaction]:
+        """Pages as Transactions (same rules as page_to_transaction); pages without a date are skipped."""
+        cols = self.columns(pages, ("Fecha", "Cuenta", "Nombre", "Gasto", "Ingreso", "Transferencias",
+                                    "Subcategoría", fingerprint_property))
+        # Statements repeat a few hundred distinct dates: parse each once
+        dates = {start: date.fromisoformat(start[:10]) for start in set(cols["Fecha"]) if start}
+        result = []
+        for page, start, account, name, expense, income, transfer, subcategory, fingerprint in zip(
+            pages, cols["Fecha"], cols["Cuenta"], cols["Nombre"], cols["Gasto"], cols["Ingreso"],
+            cols["Transferencias"], cols["Subcategoría"], cols[fingerprint_property],
+        ):
+            if not start:
+                continue
+            if expense is not None:
+                amount, is_transfer = -float(expense), False  # Store as negative
+            elif income is not None:
+                amount, is_transfer = float(income), False
+            elif transfer is not None:
+                amount, is_transfer = float(transfer), True
+            else:
+                amount, is_transfer = 0.0, False
+            result.append(Transaction(
+                date=dates[start],
+                description=name if name is not None else "Sin Nombre",
+                amount=amount,
+                account=account or "Unknown",
+                subcategory=subcategory,
+                fingerprint=fingerprint,
+                page_id=page.get("id"),
+                is_transfer=is_transfer,
+            ))
+        return result
@@ -1,19 +1,32 @@
 import logging
-from typing import List, Dict, Optional
-from datetime import date
+from typing import List, Dict, Optional, Tuple
+from datetime import date, timedelta
+from pathlib import Path
 from collections import defaultdict
-import math
+
+import numpy as np
 
 from src.core.interfaces import BankParserStrategy
 from src.core.models import Transaction
-from src.services.notion_service import NotionClient
+from src.services.notion_service import NotionClient, RUN_PROPERTY, FINGERPRINT_PROPERTY
+from src.services.fingerprints import assign_fingerprints
+from src.services.transfers import match_transfers, counterpart_counts, DEFAULT_WINDOW_DAYS
+from src.services.suggestions import CategorySuggester, DEFAULT_MIN_CONFIDENCE, DEFAULT_INDEX_PATH
+from src.services.reporting import RollupStore, DEFAULT_ROLLUP_PATH
+from src.services.history_store import HistoryStore, FLAG_TRANSFER, DEFAULT_HISTORY_DIR
+from src.services.import_runs import ImportRunLog, new_run_id, DEFAULT_RUN_LOG_PATH
+from src.services.import_lock import ImportCoordinator, ImportLease, DEFAULT_LOCK_DIR, LOCAL_STATE_LEASE
+from src.services.profiling import profiled
 # Categorization logic will be imported here (keeping the old one for now or wrapping it)
 # For now, let's assume we reuse categorization.py but moved to src/services or similar.
 # Since categorization rules are simple, I'll assume a simple function or import.
-from src.services.categorization import load_categorization_rules, categorize_record
+from src.services.categorization import load_categorization_rules, categorize_records
 
 logger = logging.getLogger(__name__)
 
+def _local_path(state_dir: Optional[Path], name: str, default):
+    return Path(state_dir) / name if state_dir is not None else default
+
 class ProcessorResult:
     def __init__(self):
         self.total_read = 0
@@ -21,36 +34,300 @@ class ProcessorResult:
         self.duplicates = 0
         self.errors = []
         self.skipped = 0
+        self.run_id = None
+        self.transfers = 0
+        self.suggested = 0
+        self.marked_transfers: List[Transaction] = []  # Stored pages rewritten as transfers
+        self.upload_failures = 0  # Notion writes that failed; parse errors are not counted
 
     def to_string(self):
-        return (f"Leídos: {self.total_read} | Insertados: {self.successful_inserts} | "
+        text = (f"Leídos: {self.total_read} | Insertados: {self.successful_inserts} | "
                 f"Duplicados: {self.duplicates} | Errores: {len(self.errors)}")
+        if self.transfers:
+            text += f" | Transferencias: {self.transfers}"
+        if self.suggested:
+            text += f" | Categorías sugeridas: {self.suggested}"
+        if self.run_id and self.successful_inserts:
+            text += f" | Importación: {self.run_id}"
+        return text
+
+class ImportPlan:
+    """
+    What importing a file would do, computed without writing anything:
+    parsed rows split into new and duplicates, transfers and categories.
+    """
+    NEW = "Nuevo"
+    DUPLICATE = "Duplicado"
+    TRANSFER = "Transferencia"
+
+    def __init__(self, file_path: str, parser_name: str):
+        self.file_path = file_path
+        self.parser_name = parser_name
+        self.transactions: List[Transaction] = []  # File order
+        self.errors: List[str] = []
+        self.new: List[Transaction] = []
+        self.duplicates: List[Transaction] = []
+        self.transfer_pairs: List[Tuple[Transaction, Transaction]] = []
+        self.stored_transfers: List[Transaction] = []  # Pages already in Notion to mark as transfers
+        self.suggested: List[Transaction] = []  # Categorized by the suggester, not by a rule
+
+    def statuses(self) -> Dict[int, str]:
+        """id(transaction) -> NEW, DUPLICATE or TRANSFER."""
+        status = {id(tx): self.DUPLICATE for tx in self.duplicates}
+        status.update((id(tx), self.TRANSFER if tx.is_transfer else self.NEW) for tx in self.new)
+        return status
+
+    def to_string(self):
+        text = (f"Leídos: {len(self.transactions)} | Nuevos: {len(self.new)} | "
+                f"Duplicados: {len(self.duplicates)} | Errores: {len(self.errors)}")
+        if self.transfer_pairs:
+            text += f" | Transferencias: {len(self.transfer_pairs)}"
+        if self.new:
+            text += f" | Sin categoría: {sum(1 for tx in self.new if not tx.subcategory)}"
+        if self.suggested:
+            text += f" | Categorías sugeridas: {len(self.suggested)}"
+        return text
 
 class TransactionProcessor:
-    def __init__(self, notion_client: NotionClient):
+    def __init__(self, notion_client: NotionClient, run_log: Optional[ImportRunLog] = None,
+                 match_transfers: bool = True, transfer_window_days: int = DEFAULT_WINDOW_DAYS,
+                 suggester: Optional[CategorySuggester] = None,
+                 min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+                 rollups: Optional[RollupStore] = None,
+                 history: Optional[HistoryStore] = None,
+                 coordinator: Optional[ImportCoordinator] = None,
+                 state_dir: Optional[Path] = None, rules_path: Optional[Path] = None):
+        """
+        state_dir holds this database's local files (run log, rollups, history,
+        suggestion index, locks) when several databases are used; by default
+        they live at their usual paths.
+        """
         self.notion = notion_client
-        self.categorization_rules = load_categorization_rules() # Loading from existing module
+        self.categorization_rules = load_categorization_rules(rules_path) # Loading from existing module
+        self.run_log = run_log or ImportRunLog(_local_path(state_dir, "import_runs.jsonl", DEFAULT_RUN_LOG_PATH))
+        self.match_transfers = match_transfers
+        self.transfer_window_days = transfer_window_days
+        self.suggester = suggester if suggester is not None else CategorySuggester.load(
+            _local_path(state_dir, "category_index.npz", DEFAULT_INDEX_PATH))
+        self.min_confidence = min_confidence
+        self.rollups = rollups if rollups is not None else RollupStore.load(
+            _local_path(state_dir, "rollups.csv", DEFAULT_ROLLUP_PATH))
+        self.history = history if history is not None else HistoryStore.open_existing(
+            _local_path(state_dir, "history", DEFAULT_HISTORY_DIR))
+        self.coordinator = coordinator or ImportCoordinator(_local_path(state_dir, "locks", DEFAULT_LOCK_DIR))
 
+    @profiled
     def process_file(self, file_path: str, parser: BankParserStrategy) -> ProcessorResult:
+        plan = self._parse(file_path, parser)
+        return self._run(plan, planned=False)
+
+    @profiled
+    def plan_file(self, file_path: str, parser: BankParserStrategy) -> ImportPlan:
+        """
+        Dry run of process_file: parses, deduplicates, matches transfers and
+        categorizes, but writes nothing (not even the database schema).
+        """
+        plan = self._parse(file_path, parser)
+        if plan.transactions:
+            self._plan_transactions(plan)
+        return plan
+
+    @profiled
+    def execute(self, plan: ImportPlan) -> ProcessorResult:
+        """
+        Imports a plan built by plan_file. Its rows are checked again under the
+        import lease, so anything another import inserted meanwhile is skipped.
+        """
+        return self._run(plan, planned=True)
+
+    def _parse(self, file_path: str, parser: BankParserStrategy) -> ImportPlan:
+        plan = ImportPlan(file_path, type(parser).__name__)
+        plan.transactions, parse_errors = parser.parse(file_path)
+        plan.errors.extend(parse_errors)
+        return plan
+
+    def _run(self, plan: ImportPlan, planned: bool) -> ProcessorResult:
         result = ProcessorResult()
 
         # 1. Parse File
-        transactions, parse_errors = parser.parse(file_path)
-        result.errors.extend(parse_errors)
-        result.total_read = len(transactions)
+        result.errors.extend(plan.errors)
+        result.total_read = len(plan.transactions)
 
-        if not transactions:
+        if not plan.transactions:
             return result
 
-        # 2. Determine Date Range to Query Notion
-        min_date = min(t.date for t in transactions)
-        max_date = max(t.date for t in transactions)
+        # Every page of this run is tagged so the run can be rolled back
+        result.run_id = new_run_id()
+        self.notion.ensure_text_properties([RUN_PROPERTY, FINGERPRINT_PROPERTY])
+
+        # Parallel runs over the same account and dates wait here, so each one
+        # takes its dedup snapshot only after the other's inserts are done
+        with self.coordinator.lease(plan.transactions):
+            if planned:
+                self._recheck_plan(plan)
+            else:
+                self._plan_transactions(plan)
+            inserted = self._apply_plan(plan, result)
+
+        if (inserted or result.marked_transfers) and (self.history is not None or self.rollups is not None):
+            # Local stores are shared by every account: one writer at a time.
+            # Each store re-reads the disk first, as other processes may have written since.
+            with ImportLease(LOCAL_STATE_LEASE, date.min, date.max, self.coordinator.lock_dir):
+                if self.history is not None:
+                    self.history.append(inserted, run_id=result.run_id)
+                    self.history.mark_transfers([tx.page_id for tx in result.marked_transfers])
+                if self.rollups is not None:
+                    self.rollups.reload()
+                    self.rollups.add_transactions(inserted, run_id=result.run_id)
+                    self.rollups.mark_transfers(result.marked_transfers, run_id=result.run_id)
+                    self.rollups.save()
+
+        self.run_log.record_run(result.run_id, plan.file_path, plan.parser_name, result)
+        return result
+
+    def _plan_transactions(self, plan: ImportPlan):
+        """Dedup, transfer matching and categorization of plan.transactions. Read-only."""
+        transactions = plan.transactions
+
+        # 2. Exact dedup by fingerprint: batched lookups sized by the file, not its date span
+        assign_fingerprints(transactions)
+        # Without the property (first import into this database) nothing is fingerprinted yet
+        fingerprinted = FINGERPRINT_PROPERTY in self.notion.get_database_schema()
+        known_fingerprints = set()
+        if fingerprinted:
+            known_fingerprints = self.notion.find_existing_fingerprints([t.fingerprint for t in transactions])
+
+        # Pages created before fingerprints existed are still matched by (Date, Account, Amount),
+        # but only those pages are queried, and only over the span of unmatched rows
+        pending = [t for t in transactions if t.fingerprint not in known_fingerprints]
+        existing_transactions = []
+        if pending:
+            min_date = min(t.date for t in pending)
+            max_date = max(t.date for t in pending)
+
+            accounts = {t.account for t in pending}
+            account = accounts.pop() if len(accounts) == 1 else None
+
+            logger.info(f"Consultando Notion entre {min_date} y {max_date}")
+            existing_transactions = self.notion.get_transactions_in_range(
+                min_date, max_date, legacy_only=fingerprinted, account=account
+            )
 
-        # Buffer? Maybe not needed if date range is precise.
+        # 3. Process Transactions
+        plan.new, plan.duplicates = self._split_duplicates(transactions, known_fingerprints, existing_transactions)
+        for tx in plan.duplicates:
+            logger.info(f"Duplicado detectado: {tx}")
+
+        # 4. Internal transfers between our own accounts
+        if self.match_transfers and plan.new:
+            self._match_transfers(plan)
+
+        # Same result as categorize_record per row, one pass per rule
+        subcategories = categorize_records([tx.description for tx in plan.new], self.categorization_rules)
+        for tx, subcat_id in zip(plan.new, subcategories):
+            tx.subcategory = subcat_id
 
-        logger.info(f"Consultando Notion entre {min_date} y {max_date}")
-        existing_transactions = self.notion.get_transactions_in_range(min_date, max_date)
+        # 5. Rule misses: nearest categorized descriptions from the history, if confident enough
+        if self.suggester is not None:
+            self._suggest_categories(plan)
 
+    def _recheck_plan(self, plan: ImportPlan):
+        """Moves rows inserted since the plan was built (by another import) to the duplicates."""
+        if not plan.new:
+            return
+        stored = self.notion.find_existing_fingerprints([t.fingerprint for t in plan.new])
+        if not stored:
+            return
+        plan.duplicates.extend(t for t in plan.new if t.fingerprint in stored)
+        plan.new = [t for t in plan.new if t.fingerprint not in stored]
+        logger.info(f"{len(stored)} movimientos importados desde la simulación se omiten")
+
+    def _apply_plan(self, plan: ImportPlan, result: ProcessorResult) -> List[Transaction]:
+        """Writes a plan to Notion. Returns the inserted transactions."""
+        result.duplicates += len(plan.duplicates)
+        result.transfers += len(plan.transfer_pairs)
+        new_ids = {id(tx) for tx in plan.new}
+        result.suggested += sum(1 for tx in plan.suggested if id(tx) in new_ids)
+
+        for tx in plan.stored_transfers:
+            if self.notion.mark_as_transfer(tx):
+                tx.is_transfer = True
+                result.marked_transfers.append(tx)
+            else:
+                result.errors.append(f"Error marcando transferencia en Notion: {tx.description}")
+                result.upload_failures += 1
+
+        inserted = []
+        for tx in plan.new:
+            # Upload
+            if self.notion.create_transaction(tx, run_id=result.run_id):
+                result.successful_inserts += 1
+                inserted.append(tx)
+                logger.info(f"Insertado: {tx}")
+                # Do not add to existing_map here.
+                # We only want to deduplicate against what was ALREADY in DB before this run.
+                # If the file contains 2 identical transactions, and DB has 0, we want to insert both.
+                # (Unless the file has duplicates which are errors, but we assume file lines are valid distinct transactions)
+            else:
+                result.errors.append(f"Error subiendo a Notion: {tx.description}")
+                result.upload_failures += 1
+
+        return inserted
+
+    def _suggest_categories(self, plan: ImportPlan):
+        misses = [tx for tx in plan.new if not tx.subcategory]
+        if not misses:
+            return
+        suggested = self.suggester.best([tx.description for tx in misses], self.min_confidence)
+        for tx, subcat_id in zip(misses, suggested):
+            if subcat_id:
+                tx.subcategory = subcat_id
+                plan.suggested.append(tx)
+                logger.info(f"Subcategoría sugerida para '{tx.description}': {subcat_id}")
+
+    def _match_transfers(self, plan: ImportPlan):
+        """
+        Marks new transactions that are the other side of a movement in a
+        different account as transfers. Stored pages on the other side are
+        only collected in plan.stored_transfers; _apply_plan marks them.
+        """
+        new_transactions = plan.new
+        window = timedelta(days=self.transfer_window_days)
+        start = min(t.date for t in new_transactions) - window
+        end = max(t.date for t in new_transactions) + window
+        if self.history is not None:
+            # Local history: a date slice plus an amount mask, no API calls
+            rows = self.history.range(start, end)
+            wanted = np.unique(np.abs([t.cents for t in new_transactions]))
+            mask = ((np.asarray(rows.flags) & FLAG_TRANSFER) == 0) & np.isin(np.abs(rows.cents), wanted)
+            stored = [t for t in rows.select(mask).to_transactions() if t.page_id]
+        else:
+            stored = self.notion.get_transfer_candidates([t.amount for t in new_transactions], start, end)
+
+        new_ids = {id(t) for t in new_transactions}
+        pairs = match_transfers(new_transactions, stored, self.transfer_window_days)
+        counts = None
+        for pair in pairs:
+            if not all(id(tx) in new_ids for tx in pair):
+                # Rewriting a stored page needs an unambiguous match: round amounts
+                # (rent, 50.00) often have several candidates in the window
+                if counts is None:
+                    counts = counterpart_counts(new_transactions, stored, self.transfer_window_days)
+                if any(counts.get(id(tx)) != 1 for tx in pair):
+                    logger.info(f"Posible transferencia ambigua, no se marca: {pair[0]} -> {pair[1]}")
+                    continue
+            for tx in pair:
+                if id(tx) in new_ids:
+                    tx.is_transfer = True
+                else:
+                    plan.stored_transfers.append(tx)
+            plan.transfer_pairs.append(pair)
+            logger.info(f"Transferencia interna: {pair[0]} -> {pair[1]}")
+
+    @staticmethod
+    def _split_duplicates(transactions: List[Transaction], known_fingerprints,
+                          existing_transactions: List[Transaction]) -> Tuple[List[Transaction], List[Transaction]]:
+        """Splits parsed rows into (new, duplicates) against stored fingerprints and legacy pages."""
         # Build index for fast lookup (Date + Account + Amount)
         # Why not name? User said: "en Notion puedo cambiar el nombre del gasto, pero no la cantidad o el banco"
         # So key should be (Date, Account, Amount)
@@ -59,32 +336,17 @@ class TransactionProcessor:
             key = (t.date, t.account, t.amount) # Amount here is signed float
             existing_map[key].append(t)
 
-        # 3. Process Transactions
+        new_transactions = []
+        duplicates = []
         for tx in transactions:
-            if self._is_duplicate(tx, existing_map):
-                result.duplicates += 1
-                logger.info(f"Duplicado detectado: {tx}")
+            if tx.fingerprint in known_fingerprints or TransactionProcessor._is_duplicate(tx, existing_map):
+                duplicates.append(tx)
             else:
-                # Categorize
-                # The existing categorization uses 'Nombre' key in a dict.
-                # Let's adapt
-                subcat_id = categorize_record(tx.description, self.categorization_rules)
-                tx.subcategory = subcat_id
-
-                # Upload
-                if self.notion.create_transaction(tx):
-                    result.successful_inserts += 1
-                    logger.info(f"Insertado: {tx}")
-                    # Do not add to existing_map here.
-                    # We only want to deduplicate against what was ALREADY in DB before this run.
-                    # If the file contains 2 identical transactions, and DB has 0, we want to insert both.
-                    # (Unless the file has duplicates which are errors, but we assume file lines are valid distinct transactions)
-                else:
-                    result.errors.append(f"Error subiendo a Notion: {tx.description}")
-
-        return result
+                new_transactions.append(tx)
+        return new_transactions, duplicates
 
-    def _is_duplicate(self, tx: Transaction, existing_map: Dict) -> bool:
+    @staticmethod
+    def _is_duplicate(tx: Transaction, existing_map: Dict) -> bool:
         key = (tx.date, tx.account, tx.amount)
         if key in existing_map:
             # We found records with same date, account and amount.
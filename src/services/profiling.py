@@ -0,0 +1,134 @@
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import threading
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Set to 1 (or use `python src/main.py --perfil`) before the services are imported
+PROFILE_ENV = "GASTOS_PROFILE"
+DEFAULT_PROFILE_DIR = Path("logs/profiles")
+
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+_tracemalloc_lock = threading.Lock()
+# Only one cProfile can be active per process (Python 3.12+ refuses a second one)
+_cprofile_lock = threading.Lock()
+
+
+def profiling_enabled() -> bool:
+    return os.environ.get(PROFILE_ENV, "").strip().lower() in ("1", "true", "si", "sí")
+
+
+def profiled(func):
+    """
+    Wraps func in cProfile and tracemalloc when GASTOS_PROFILE is set. The
+    decision is taken once, when the module defining func is imported, so a
+    disabled run keeps the original function with no wrapper at all. A call
+    made while another one is being profiled only records time and memory.
+    """
+    if not profiling_enabled():
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        _start_tracemalloc()
+        before = tracemalloc.take_snapshot()
+        started = datetime.now()
+        profiler = _start_cprofile()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                _cprofile_lock.release()
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            _stop_tracemalloc()
+            try:
+                write_report(func.__qualname__, started, profiler, before, after, peak)
+            except Exception as e:
+                logger.error(f"Error guardando el perfil de {func.__qualname__}: {e}")
+
+    return wrapper
+
+
+def write_report(name: str, started: datetime, profiler: Optional[cProfile.Profile],
+                 before, after, peak: int, out_dir: Path = DEFAULT_PROFILE_DIR) -> Path:
+    """
+    Writes <timestamp>_<name>.prof (open with pstats or snakeviz) and a
+    readable <timestamp>_<name>.txt with the slowest functions and the lines
+    that allocated the most memory during the call. Without a profiler the
+    .prof file and the CPU section are left out.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stem = f"{started.strftime('%Y%m%d-%H%M%S-%f')}_{name.replace('.', '_')}"
+    cpu = io.StringIO()
+    if profiler is not None:
+        profiler.dump_stats(str(out_dir / f"{stem}.prof"))
+        pstats.Stats(profiler, stream=cpu).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    else:
+        cpu.write("(sin perfil de CPU: había otro perfil activo)\n")
+
+    lines = [
+        f"{name} - inicio {started.isoformat(timespec='seconds')} - "
+        f"duración {(datetime.now() - started).total_seconds():.2f}s - pico de memoria {peak / 2**20:.1f} MiB",
+        "",
+        "== CPU (acumulado) ==",
+        cpu.getvalue(),
+        "== Memoria: líneas que más han crecido durante la llamada ==",
+    ]
+    for stat in after.compare_to(before, "lineno")[:TOP_ALLOCATIONS]:
+        lines.append(str(stat))
+    lines += ["", "== Memoria: mayores reservas vivas al terminar =="]
+    for stat in after.statistics("lineno")[:TOP_ALLOCATIONS]:
+        lines.append(str(stat))
+
+    report = out_dir / f"{stem}.txt"
+    report.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    logger.info(f"Perfil guardado en {report}")
+    return report
+
+
+def _start_cprofile() -> Optional[cProfile.Profile]:
+    """An enabled profiler, or None when another one is already running."""
+    if not _cprofile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiling tool (a debugger, coverage) holds the hook
+        _cprofile_lock.release()
+        return None
+    return profiler
+
+
+def _start_tracemalloc():
+    # Shared between threads: the GUI may profile an import and an export at once
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0:
+            _tracemalloc_owned = not tracemalloc.is_tracing()
+            if _tracemalloc_owned:
+                tracemalloc.start()
+        tracemalloc.reset_peak()
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
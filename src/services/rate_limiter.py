@@ -0,0 +1,57 @@
+import asyncio
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket. Notion allows an average of ~3 requests per
+    second per integration, with short bursts tolerated.
+    """
+    def __init__(self, rate: float = 3.0, burst: int = 3):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AsyncRateLimiter:
+    """
+    asyncio version of RateLimiter: waiting coroutines sleep without holding
+    a thread, so many requests can be scheduled cheaply. Use it from a
+    single event loop.
+    """
+    def __init__(self, rate: float = 3.0, burst: int = 3):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = None
+
+    async def acquire(self):
+        """Waits until a request may be sent. Waiters are served in arrival order."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
@@ -0,0 +1,88 @@
+import logging
+from dataclasses import dataclass
+from typing import List, Dict, Optional, Callable
+
+import pandas as pd
+
+from src.services.notion_service import NotionClient
+from src.services.categorization import load_categorization_rules, categorize_records
+from src.services.bulk import run_concurrently, BulkResult
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CategoryChange:
+    page_id: str
+    description: str
+    old_subcategory: Optional[str]
+    new_subcategory: str
+
+
+class RecategorizationPlan:
+    def __init__(self):
+        self.scanned = 0
+        self.changes: List[CategoryChange] = []
+
+    def to_string(self):
+        return f"Revisados: {self.scanned} | Cambios de subcategoría: {len(self.changes)}"
+
+    def save_report(self, file_path: str):
+        """Writes the dry-run report as CSV."""
+        df = pd.DataFrame([c.__dict__ for c in self.changes],
+                          columns=["page_id", "description", "old_subcategory", "new_subcategory"])
+        df.to_csv(file_path, index=False, sep=";")
+
+
+class Recategorizer:
+    """
+    Re-runs the categorization rules over pages already in Notion and
+    updates only the pages whose Subcategoría would change.
+    """
+    def __init__(self, notion_client: NotionClient, rules_df: Optional[pd.DataFrame] = None):
+        self.notion = notion_client
+        self.rules_df = rules_df
+
+    def plan(self, only_script: bool = True) -> RecategorizationPlan:
+        """Dry run: computes the changes without writing anything."""
+        # Reload the rules so edits to the Excel file are picked up
+        rules_df = self.rules_df if self.rules_df is not None else load_categorization_rules()
+        page_filter = {"property": "Script", "checkbox": {"equals": True}} if only_script else None
+
+        page_ids, names, current = [], [], []
+        for batch in self.notion.iter_page_batches(filter=page_filter):
+            if not batch:
+                continue
+            cols = self.notion.page_flattener(batch).columns(batch, ("Nombre", "Subcategoría"))
+            page_ids.extend(page["id"] for page in batch)
+            names.extend(name or "" for name in cols["Nombre"])
+            current.extend(cols["Subcategoría"])
+
+        plan = RecategorizationPlan()
+        plan.scanned = len(page_ids)
+        for page_id, name, old, new in zip(page_ids, names, current, categorize_records(names, rules_df)):
+            # A rule miss never clears a category set by hand
+            if new and not _same_id(new, old):
+                plan.changes.append(CategoryChange(page_id, name, old, new))
+
+        logger.info(f"Recategorización (simulación): {plan.to_string()}")
+        return plan
+
+    def apply(self, plan: RecategorizationPlan, max_workers: int = 4,
+              progress: Optional[Callable[[int, int], None]] = None) -> BulkResult:
+        def update(change: CategoryChange) -> bool:
+            return self.notion.update_page(
+                change.page_id,
+                {"Subcategoría": {"relation": [{"id": change.new_subcategory}]}},
+            )
+
+        result = run_concurrently(update, plan.changes, max_workers=max_workers, progress=progress)
+        logger.info(f"Recategorización aplicada: {result.to_string()}")
+        return result
+
+
+def _same_id(a: Optional[str], b: Optional[str]) -> bool:
+    # Notion returns dashed UUIDs while the rules file may hold them without dashes
+    if a is None or b is None:
+        return a == b
+    return a.replace("-", "").lower() == b.replace("-", "").lower()
@@ -0,0 +1,214 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+import pandas as pd
+
+from src.core.models import Transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROLLUP_PATH = Path("rollups.csv")
+UNCATEGORIZED = "Sin categoría"
+
+ROLLUP_KEYS = ["Mes", "Categoría", "Cuenta"]
+ROLLUP_VALUES = ["Gasto", "Ingreso", "Transferencias", "Movimientos"]
+RUN_COLUMN = "Importación"
+GROUPINGS = {"mes": ["Mes"], "categoria": ["Categoría"], "cuenta": ["Cuenta"]}
+
+
+def _norm_id(page_id) -> str:
+    # Notion returns dashed UUIDs while the rules file may hold them without dashes
+    return str(page_id).replace("-", "").lower()
+
+
+def compute_rollups(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregates an export-like frame (Fecha, Cuenta, Categoría, Gasto,
+    Ingreso, Transferencias) into one row per month, category and account.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=ROLLUP_KEYS + ROLLUP_VALUES)
+
+    fechas = pd.to_datetime(df["Fecha"].astype(str).str[:10], errors="coerce")
+    frame = pd.DataFrame({
+        "Mes": fechas.dt.strftime("%Y-%m"),
+        "Categoría": df["Categoría"].astype(object).where(df["Categoría"].notna(), UNCATEGORIZED),
+        "Cuenta": df["Cuenta"].astype(object).where(df["Cuenta"].notna(), "Unknown"),
+        "Gasto": pd.to_numeric(df["Gasto"], errors="coerce").fillna(0.0),
+        "Ingreso": pd.to_numeric(df["Ingreso"], errors="coerce").fillna(0.0),
+        "Transferencias": pd.to_numeric(df["Transferencias"], errors="coerce").fillna(0.0),
+        "Movimientos": 1,
+    })
+    frame = frame[fechas.notna()]
+    return frame.groupby(ROLLUP_KEYS, as_index=False, sort=True)[ROLLUP_VALUES].sum()
+
+
+def read_export(file_path: str) -> pd.DataFrame:
+    """Reads a file written by ExporterService (CSV, Parquet or Feather)."""
+    suffix = Path(file_path).suffix.lower()
+    if suffix in (".parquet", ".pq"):
+        return pd.read_parquet(file_path)
+    if suffix in (".feather", ".arrow"):
+        return pd.read_feather(file_path)
+    return pd.read_csv(file_path, sep=";", decimal=",", dtype={"Subcategoría": str, "Categoría": str})
+
+
+class RollupStore:
+    """
+    Precomputed month x category x account totals, kept on disk and updated
+    incrementally as transactions are imported, so summaries never need to
+    rescan the history. Pages edited by hand in Notion are only picked up
+    when the store is rebuilt from a fresh export.
+    """
+    def __init__(self, path=DEFAULT_ROLLUP_PATH):
+        self.path = Path(path)
+        self.category_map_path = self.path.with_suffix(".categorias.json")
+        self.rollups = pd.DataFrame(columns=ROLLUP_KEYS + ROLLUP_VALUES)
+        self.category_map: Dict[str, str] = {}
+        # What each import run added, so a rollback can subtract it
+        self.runs_path = self.path.with_suffix(".importaciones.csv")
+        self._added_runs: List[pd.DataFrame] = []
+        self._removed_runs: Set[str] = set()
+
+    @classmethod
+    def load(cls, path=DEFAULT_ROLLUP_PATH) -> Optional["RollupStore"]:
+        store = cls(path)
+        if not store.path.exists():
+            return None
+        store.reload()
+        return store
+
+    def reload(self):
+        """
+        Re-reads the files, which another process may have saved since this
+        store was loaded. Call it before adding, under the local state lease.
+        """
+        if self.path.exists():
+            self.rollups = pd.read_csv(self.path, sep=";", dtype={"Mes": str})
+        if self.category_map_path.exists():
+            with open(self.category_map_path, encoding="utf-8") as f:
+                self.category_map = json.load(f)
+        self._added_runs, self._removed_runs = [], set()
+
+    def save(self):
+        tmp = self.path.with_suffix(".csv.tmp")
+        self.rollups.to_csv(tmp, sep=";", index=False)
+        os.replace(tmp, self.path)
+        tmp = self.category_map_path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.category_map, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.category_map_path)
+
+        if self._added_runs or self._removed_runs:
+            runs = self._read_runs()
+            runs = pd.concat([runs[~runs[RUN_COLUMN].isin(self._removed_runs)]] + self._added_runs,
+                             ignore_index=True)
+            tmp = self.runs_path.with_suffix(".csv.tmp")
+            runs.to_csv(tmp, sep=";", index=False)
+            os.replace(tmp, self.runs_path)
+            self._added_runs, self._removed_runs = [], set()
+
+    def _read_runs(self) -> pd.DataFrame:
+        if not self.runs_path.exists():
+            return pd.DataFrame(columns=[RUN_COLUMN] + ROLLUP_KEYS + ROLLUP_VALUES)
+        return pd.read_csv(self.runs_path, sep=";", dtype={"Mes": str, RUN_COLUMN: str})
+
+    def rebuild_from_export(self, file_path: str):
+        """Recomputes every rollup from an export and learns the subcategory -> category map."""
+        df = read_export(file_path)
+        self.rollups = compute_rollups(df)
+
+        known = df[df["Subcategoría"].notna() & df["Categoría"].notna()]
+        self.category_map = {
+            _norm_id(sub): str(cat)
+            for sub, cat in zip(known["Subcategoría"].astype(str), known["Categoría"].astype(str))
+        }
+        logger.info(f"Resúmenes reconstruidos: {len(df)} movimientos, {len(self.rollups)} agregados")
+
+    def rebuild_from_history(self, history):
+        """Recomputes every rollup from the local HistoryStore, using the known category map."""
+        df = history.range().to_dataframe()
+        df["Categoría"] = [self.category_map.get(_norm_id(s)) if s else None for s in df["Subcategoría"]]
+        self.rollups = compute_rollups(df)
+        logger.info(f"Resúmenes reconstruidos desde el historial: {len(df)} movimientos")
+
+    def add_transactions(self, transactions: Iterable[Transaction], run_id: Optional[str] = None):
+        """Folds newly imported transactions into the rollups. run_id allows remove_run."""
+        rows = [self._row(tx,
+                          gasto=tx.abs_amount if tx.is_expense and not tx.is_transfer else None,
+                          ingreso=tx.abs_amount if tx.is_income and not tx.is_transfer else None,
+                          transferencias=tx.amount if tx.is_transfer else None)
+                for tx in transactions]
+        self._add_delta(rows, run_id)
+
+    def mark_transfers(self, transactions: Iterable[Transaction], run_id: Optional[str] = None):
+        """
+        Moves already counted transactions that an import matched as transfers
+        from Gasto/Ingreso to Transferencias. run_id allows remove_run.
+        """
+        rows = [self._row(tx,
+                          gasto=-tx.abs_amount if tx.is_expense else None,
+                          ingreso=-tx.abs_amount if tx.is_income else None,
+                          transferencias=tx.amount)
+                for tx in transactions]
+        self._add_delta(rows, run_id, count=False)
+
+    def _row(self, tx: Transaction, gasto, ingreso, transferencias) -> Dict:
+        category = self.category_map.get(_norm_id(tx.subcategory)) if tx.subcategory else None
+        return {"Fecha": tx.date.isoformat(), "Cuenta": tx.account, "Categoría": category,
+                "Gasto": gasto, "Ingreso": ingreso, "Transferencias": transferencias}
+
+    def _add_delta(self, rows: List[Dict], run_id: Optional[str], count: bool = True):
+        if not rows:
+            return
+        delta = compute_rollups(pd.DataFrame(rows))
+        if not count:
+            # Same movements, only moved between columns
+            delta["Movimientos"] = 0
+        self._fold(delta)
+        if run_id:
+            self._added_runs.append(delta.assign(**{RUN_COLUMN: run_id}))
+
+    def remove_run(self, run_id: str) -> bool:
+        """Subtracts what an import run added (after a rollback). Takes effect on save()."""
+        runs = self._read_runs()
+        delta = runs[runs[RUN_COLUMN] == run_id]
+        if delta.empty:
+            return False
+        negated = delta[ROLLUP_KEYS + ROLLUP_VALUES].copy()
+        negated[ROLLUP_VALUES] = -negated[ROLLUP_VALUES]
+        self._fold(negated)
+        self._removed_runs.add(run_id)
+        return True
+
+    def _fold(self, delta: pd.DataFrame):
+        merged = pd.concat([self.rollups, delta], ignore_index=True)
+        merged = merged.groupby(ROLLUP_KEYS, as_index=False, sort=True)[ROLLUP_VALUES].sum()
+        # Groups emptied by remove_run go away; float sums may leave tiny residues
+        self.rollups = merged[(merged[ROLLUP_VALUES].abs() > 1e-9).any(axis=1)].reset_index(drop=True)
+
+    def summary(self, by: str = "categoria", start: Optional[str] = None,
+                end: Optional[str] = None) -> pd.DataFrame:
+        """
+        Totals grouped by 'mes', 'categoria' or 'cuenta' (or a list of
+        rollup keys) between months start and end ('YYYY-MM', inclusive).
+        """
+        keys = GROUPINGS.get(by, by) if isinstance(by, str) else list(by)
+        df = self.rollups
+        if start:
+            df = df[df["Mes"] >= start]
+        if end:
+            df = df[df["Mes"] <= end]
+        out = df.groupby(keys, as_index=False, sort=True)[ROLLUP_VALUES].sum()
+        out["Neto"] = out["Ingreso"] - out["Gasto"]
+        if by == "categoria":
+            out = out.sort_values("Gasto", ascending=False)
+        return out.reset_index(drop=True)
+
+    def monthly_by_category(self, start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        """Spend per category (rows) and month (columns)."""
+        table = self.summary(by=["Mes", "Categoría"], start=start, end=end)
+        return table.pivot(index="Categoría", columns="Mes", values="Gasto").fillna(0.0)
@@ -0,0 +1,238 @@
+import logging
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = Path("category_index.npz")
+DEFAULT_MIN_CONFIDENCE = 0.8
+NGRAM = 3
+# Queries scored per sparse product; bounds the (query, candidate) pair arrays
+QUERY_BATCH = 256
+
+
+def normalize_description(text) -> str:
+    """Lowercase, strip accents and collapse whitespace and digits."""
+    text = unicodedata.normalize("NFKD", str(text or "")).encode("ascii", "ignore").decode()
+    text = "".join("0" if c.isdigit() else c for c in text.lower())
+    return " ".join(text.split())
+
+
+def _ngrams(text: str) -> Counter:
+    padded = f" {text} "
+    return Counter(padded[i:i + NGRAM] for i in range(max(1, len(padded) - NGRAM + 1)))
+
+
+class CategorySuggester:
+    """
+    Nearest-neighbour subcategory suggestions from already categorized
+    history, using a TF-IDF character n-gram index (cosine similarity).
+
+    The sparse matrix is kept twice: gram-major (inverted index) to find
+    candidate documents through the query's rarest n-grams, and doc-major to
+    score those candidates exactly. Documents sharing only very common
+    n-grams with the query are skipped; their score would be low anyway.
+    Queries are scored in batches, all their candidates in one product, with
+    no shared scratch state, so one suggester can serve several threads.
+    """
+    def __init__(self, vocab: Dict[str, int], idf: np.ndarray, labels: np.ndarray,
+                 indptr: np.ndarray, doc_ids: np.ndarray,
+                 doc_indptr: np.ndarray, gram_ids: np.ndarray, weights: np.ndarray):
+        self.vocab = vocab
+        self.idf = idf
+        self.labels = labels
+        self.indptr = indptr          # documents containing gram g: doc_ids[indptr[g]:indptr[g + 1]]
+        self.doc_ids = doc_ids
+        self.doc_indptr = doc_indptr  # grams of document d: gram_ids/weights[doc_indptr[d]:doc_indptr[d + 1]]
+        self.gram_ids = gram_ids
+        self.weights = weights
+
+    @classmethod
+    def build(cls, descriptions: Iterable[str], subcategories: Iterable[Optional[str]]) -> "CategorySuggester":
+        # One document per distinct normalized description, labelled with its most common subcategory
+        votes: Dict[str, Counter] = defaultdict(Counter)
+        for desc, subcat in zip(descriptions, subcategories):
+            if not subcat or pd.isna(subcat):
+                continue
+            norm = normalize_description(desc)
+            if norm:
+                votes[norm][subcat] += 1
+
+        docs = list(votes)
+        labels = np.array([votes[d].most_common(1)[0][0] for d in docs], dtype=str)
+        doc_grams = [_ngrams(d) for d in docs]
+
+        vocab: Dict[str, int] = {}
+        df_counts: Counter = Counter()
+        for grams in doc_grams:
+            for g in grams:
+                vocab.setdefault(g, len(vocab))
+            df_counts.update(grams.keys())
+
+        n_docs = len(docs)
+        idf = np.zeros(len(vocab), dtype=np.float32)
+        for g, col in vocab.items():
+            idf[col] = np.log((1 + n_docs) / (1 + df_counts[g])) + 1
+
+        # Build doc-major triplets, then sort them gram-major (inverted index)
+        rows, cols, vals = [], [], []
+        for doc, grams in enumerate(doc_grams):
+            g_cols = np.fromiter((vocab[g] for g in grams), dtype=np.int64, count=len(grams))
+            w = (1 + np.log(np.fromiter(grams.values(), dtype=np.float32, count=len(grams)))) * idf[g_cols]
+            w /= np.linalg.norm(w) or 1.0
+            rows.append(np.full(len(grams), doc, dtype=np.int32))
+            cols.append(g_cols)
+            vals.append(w.astype(np.float32))
+
+        if n_docs:
+            rows_a, cols_a, vals_a = np.concatenate(rows), np.concatenate(cols), np.concatenate(vals)
+        else:
+            rows_a, cols_a, vals_a = (np.zeros(0, np.int32), np.zeros(0, np.int64), np.zeros(0, np.float32))
+
+        doc_indptr = np.zeros(n_docs + 1, dtype=np.int64)
+        np.cumsum([len(g) for g in doc_grams], out=doc_indptr[1:])
+
+        order = np.argsort(cols_a, kind="stable")
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cols_a, minlength=len(vocab)), out=indptr[1:])
+
+        logger.info(f"Índice de sugerencias: {n_docs} descripciones, {len(vocab)} n-gramas")
+        return cls(vocab, idf, labels, indptr, rows_a[order],
+                   doc_indptr, cols_a.astype(np.int32), vals_a)
+
+    @classmethod
+    def from_export(cls, file_path: str) -> "CategorySuggester":
+        """Builds the index from a file written by ExporterService (CSV, Parquet or Feather)."""
+        suffix = Path(file_path).suffix.lower()
+        if suffix in (".parquet", ".pq"):
+            df = pd.read_parquet(file_path, columns=["Nombre", "Subcategoría"])
+        elif suffix in (".feather", ".arrow"):
+            df = pd.read_feather(file_path, columns=["Nombre", "Subcategoría"])
+        else:
+            df = pd.read_csv(file_path, sep=";", usecols=["Nombre", "Subcategoría"], dtype=str)
+        return cls.build(df["Nombre"].tolist(), df["Subcategoría"].tolist())
+
+    def save(self, file_path=DEFAULT_INDEX_PATH):
+        grams = np.empty(len(self.vocab), dtype=f"<U{NGRAM}")
+        for g, col in self.vocab.items():
+            grams[col] = g
+        np.savez_compressed(file_path, grams=grams, idf=self.idf, labels=self.labels,
+                            indptr=self.indptr, doc_ids=self.doc_ids, doc_indptr=self.doc_indptr,
+                            gram_ids=self.gram_ids, weights=self.weights)
+
+    @classmethod
+    def load(cls, file_path=DEFAULT_INDEX_PATH) -> Optional["CategorySuggester"]:
+        if not Path(file_path).exists():
+            return None
+        with np.load(file_path) as data:
+            vocab = {g: i for i, g in enumerate(data["grams"].tolist())}
+            return cls(vocab, data["idf"], data["labels"], data["indptr"], data["doc_ids"],
+                       data["doc_indptr"], data["gram_ids"], data["weights"])
+
+    def suggest(self, descriptions: Iterable[str], k: int = 3, candidate_budget: int = 500,
+                batch_size: int = QUERY_BATCH) -> List[List[Tuple[str, float]]]:
+        """
+        For every description returns up to k (subcategory, cosine score)
+        pairs, best first, with one entry per subcategory. candidate_budget
+        caps the postings read to collect candidates for each query.
+        Descriptions are scored batch_size at a time.
+        """
+        descriptions = list(descriptions)
+        results: List[List[Tuple[str, float]]] = []
+        for start in range(0, len(descriptions), batch_size):
+            results.extend(self._suggest_batch(descriptions[start:start + batch_size], k, candidate_budget))
+        return results
+
+    def _query_matrix(self, descriptions: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """CSR rows (indptr, gram columns, weights) of the queries, known n-grams only."""
+        indptr = np.zeros(len(descriptions) + 1, dtype=np.int64)
+        cols_list, vals_list = [], []
+        max_idf = self.idf.max() if len(self.idf) else 0.0
+        for row, desc in enumerate(descriptions):
+            grams = _ngrams(normalize_description(desc))
+            cols = np.fromiter((self.vocab.get(g, -1) for g in grams), dtype=np.int64, count=len(grams))
+            known = cols >= 0
+            if known.any():
+                # Query weights use the full norm, so unknown n-grams lower the score
+                tf = np.fromiter(grams.values(), dtype=np.float32, count=len(grams))
+                q = (1 + np.log(tf)) * np.where(known, self.idf[np.maximum(cols, 0)], max_idf)
+                q /= np.linalg.norm(q)
+                cols_list.append(cols[known])
+                vals_list.append(q[known])
+            indptr[row + 1] = indptr[row] + int(known.sum())
+        if not cols_list:
+            return indptr, np.zeros(0, np.int64), np.zeros(0, np.float32)
+        return indptr, np.concatenate(cols_list), np.concatenate(vals_list)
+
+    def _candidates(self, cols: np.ndarray, candidate_budget: int) -> np.ndarray:
+        """Documents in the postings of the query's rarest grams, within the budget (at least one gram)."""
+        lengths = self.indptr[cols + 1] - self.indptr[cols]
+        order = np.argsort(lengths, kind="stable")
+        n_used = max(1, int(np.searchsorted(np.cumsum(lengths[order]), candidate_budget, side="right")))
+        used = cols[order[:n_used]]
+        return np.unique(np.concatenate([self.doc_ids[self.indptr[g]:self.indptr[g + 1]] for g in used]))
+
+    def _suggest_batch(self, descriptions: List[str], k: int,
+                       candidate_budget: int) -> List[List[Tuple[str, float]]]:
+        results: List[List[Tuple[str, float]]] = [[] for _ in descriptions]
+        q_indptr, q_cols, q_vals = self._query_matrix(descriptions)
+        if not len(self.labels) or not len(q_cols):
+            return results
+
+        # (query, candidate document) pairs, grouped by query
+        pair_query, pair_doc = [], []
+        for row in range(len(descriptions)):
+            cols = q_cols[q_indptr[row]:q_indptr[row + 1]]
+            if len(cols):
+                candidates = self._candidates(cols, candidate_budget)
+                pair_query.append(np.full(len(candidates), row, dtype=np.int64))
+                pair_doc.append(candidates)
+        pair_query, pair_doc = np.concatenate(pair_query), np.concatenate(pair_doc)
+
+        # Exact cosine of every pair in one product: the doc-major rows of the
+        # candidates against a dense block of the queries, whose columns are
+        # only the grams present in the batch (the last one stays zero)
+        starts = self.doc_indptr[pair_doc]
+        row_len = self.doc_indptr[pair_doc + 1] - starts
+        offsets = np.cumsum(row_len) - row_len
+        take = np.repeat(starts - offsets, row_len) + np.arange(row_len.sum())
+        batch_grams, q_block_cols = np.unique(q_cols, return_inverse=True)
+        block_col = np.full(len(self.vocab), len(batch_grams), dtype=np.int64)
+        block_col[batch_grams] = np.arange(len(batch_grams))
+        q_block = np.zeros((len(descriptions), len(batch_grams) + 1), dtype=np.float32)
+        q_block[np.repeat(np.arange(len(descriptions)), np.diff(q_indptr)), q_block_cols] = q_vals
+        flat = np.repeat(pair_query * q_block.shape[1], row_len) + block_col[self.gram_ids[take]]
+        products = self.weights[take] * q_block.ravel()[flat]
+        scores = np.add.reduceat(products, offsets)
+
+        bounds = np.searchsorted(pair_query, np.arange(len(descriptions) + 1))
+        for row in range(len(descriptions)):
+            lo, hi = bounds[row], bounds[row + 1]
+            if lo < hi:
+                results[row] = self._top_labels(pair_doc[lo:hi], scores[lo:hi], k)
+        return results
+
+    def _top_labels(self, candidates: np.ndarray, scores: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        width = min(k * 4, len(candidates))
+        top = np.argpartition(-scores, width - 1)[:width]
+        top = top[np.argsort(-scores[top])]
+
+        best: Dict[str, float] = {}
+        for i in top:
+            if scores[i] <= 0:
+                break
+            best.setdefault(str(self.labels[candidates[i]]), float(scores[i]))
+            if len(best) == k:
+                break
+        return list(best.items())
+
+    def best(self, descriptions: Iterable[str],
+             min_confidence: float = DEFAULT_MIN_CONFIDENCE) -> List[Optional[str]]:
+        """Subcategory to auto-assign per description, or None below the threshold."""
+        return [s[0][0] if s and s[0][1] >= min_confidence else None
+                for s in self.suggest(descriptions, k=1)]
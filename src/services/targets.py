@@ -0,0 +1,336 @@
+"""
+Several Notion databases (households, ledgers, workspaces) handled at once.
+
+Each target is a database plus the integration token that reaches it.
+ClientPool builds one NotionClient per target; targets on the same token
+share its RateLimiter and HTTP session (with NOTION_CLIENT=async, its
+AsyncRateLimiter and event loop), because Notion's request limit is
+per integration, while different tokens get independent budgets and
+connection pools. Imports, exports and syncs then run on every target in
+parallel and their results are reported per target.
+"""
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from src.extractors.detection import detect_parser
+from src.services.exporter import ExporterService, columnar_format_from_path
+from src.services.notion_service import NotionClient, create_session, use_async_client
+from src.services.processor import TransactionProcessor, ProcessorResult
+from src.services.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+TARGETS_ENV = "NOTION_TARGETS"
+DEFAULT_TARGETS_PATH = Path("notion_targets.json")
+# Local state (run log, rollups, history, locks) of each configured target
+DEFAULT_TARGETS_DIR = Path("targets")
+# Name of the single target built from NOTION_TOKEN / NOTION_DATABASE_ID
+ENV_TARGET_NAME = "principal"
+
+
+@dataclass
+class NotionTarget:
+    name: str
+    token: str
+    database_id: str
+    category_database_id: Optional[str] = None
+    project_database_id: Optional[str] = None
+    state_dir: Optional[Path] = None  # None: the default local files
+    rules_path: Optional[Path] = None  # None: categorization_rules.xlsx
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "NotionTarget":
+        """
+        Entry of the targets file. The token is given as "token" or, to keep
+        it out of the file, as the name of an environment variable in "token_env".
+        """
+        name = data.get("name")
+        token = data.get("token") or os.environ.get(data.get("token_env", ""))
+        if not name or not token or not data.get("database_id"):
+            raise ValueError(f"Destino incompleto (name, token/token_env, database_id): {data.get('name')}")
+        return cls(
+            name=name,
+            token=token,
+            database_id=data["database_id"],
+            category_database_id=data.get("category_database_id"),
+            project_database_id=data.get("project_database_id"),
+            state_dir=Path(data.get("state_dir") or DEFAULT_TARGETS_DIR / name),
+            rules_path=Path(data["rules"]) if data.get("rules") else None,
+        )
+
+    @classmethod
+    def from_env(cls) -> "NotionTarget":
+        token = os.environ.get("NOTION_TOKEN")
+        database_id = os.environ.get("NOTION_DATABASE_ID")
+        if not token or not database_id:
+            raise ValueError("Faltan credenciales de Notion (NOTION_TOKEN, NOTION_DATABASE_ID)")
+        return cls(ENV_TARGET_NAME, token, database_id,
+                   category_database_id=os.environ.get("NOTION_CATEGORY_DATABASE_ID"),
+                   project_database_id=os.environ.get("NOTION_PROJECT_DATABASE_ID"))
+
+
+def load_targets(path: Optional[str] = None) -> List[NotionTarget]:
+    """
+    Targets from the JSON file (path, NOTION_TARGETS or notion_targets.json):
+    a list of entries, or {"targets": [...]}. Without a file, the single
+    database configured in the environment.
+    """
+    path = Path(path or os.environ.get(TARGETS_ENV) or DEFAULT_TARGETS_PATH)
+    if not path.exists():
+        return [NotionTarget.from_env()]
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    entries = data.get("targets", []) if isinstance(data, dict) else data
+    targets = [NotionTarget.from_dict(entry) for entry in entries]
+    names = [t.name for t in targets]
+    duplicated = {name for name in names if names.count(name) > 1}
+    if duplicated:
+        raise ValueError(f"Destinos repetidos en {path}: {sorted(duplicated)}")
+    if not targets:
+        raise ValueError(f"No hay destinos en {path}")
+    return targets
+
+
+class TargetResult:
+    def __init__(self, name: str):
+        self.name = name
+        self.value: Any = None
+        self.error: Optional[str] = None
+        self.elapsed = 0.0
+
+    @property
+    def ok(self) -> bool:
+        # Services report failures as False or as a result with errors
+        if self.error is not None or self.value is False:
+            return False
+        return not (getattr(self.value, "errors", None) or getattr(self.value, "failed", None))
+
+    def to_string(self):
+        if self.error is not None:
+            summary = f"Error: {self.error}"
+        elif hasattr(self.value, "to_string"):
+            summary = self.value.to_string()
+        elif isinstance(self.value, bool):
+            summary = "Correcto" if self.value else "Fallido"
+        else:
+            summary = str(self.value)
+        return f"{self.name}: {summary} ({self.elapsed:.1f} s)"
+
+
+class FanOutResult:
+    def __init__(self):
+        self.results: Dict[str, TargetResult] = {}
+        self.elapsed = 0.0
+
+    @property
+    def failed(self) -> List[str]:
+        return [name for name, result in self.results.items() if not result.ok]
+
+    def to_string(self):
+        lines = [result.to_string() for result in self.results.values()]
+        lines.append(f"Destinos: {len(self.results)} | Con errores: {len(self.failed)} | {self.elapsed:.1f} s")
+        return "\n".join(lines)
+
+
+class ClientPool:
+    """
+    One NotionClient per target, with a RateLimiter and a session per token.
+    With NOTION_CLIENT=async they are SyncNotionClients instead, one event
+    loop and AsyncRateLimiter per token.
+    Processors and exporters are built on first use and kept, so their
+    caches (schema, fingerprints, date ranges) last for the whole session.
+    """
+    def __init__(self, targets: Iterable[NotionTarget], rate: float = 3.0, burst: int = 3,
+                 pool_size: int = 10):
+        self.targets: Dict[str, NotionTarget] = {t.name: t for t in targets}
+        self.limiters: Dict[str, RateLimiter] = {}
+        self._sessions = {}
+        self.clients: Dict[str, NotionClient] = {}
+        if use_async_client():
+            self._build_async_clients(rate, burst, pool_size)
+        else:
+            for target in self.targets.values():
+                if target.token not in self.limiters:
+                    self.limiters[target.token] = RateLimiter(rate, burst)
+                    self._sessions[target.token] = create_session(pool_size)
+                self.clients[target.name] = NotionClient(
+                    target.token, target.database_id,
+                    rate_limiter=self.limiters[target.token], session=self._sessions[target.token],
+                )
+        self._processors = {}
+        self._exporters = {}
+
+    def _build_async_clients(self, rate: float, burst: int, pool_size: int):
+        from src.services.async_notion import AsyncNotionClient, SyncNotionClient
+        from src.services.rate_limiter import AsyncRateLimiter
+
+        # The first client of a token runs the event loop its limiter belongs to
+        loop_owners: Dict[str, SyncNotionClient] = {}
+        for target in self.targets.values():
+            if target.token not in self.limiters:
+                self.limiters[target.token] = AsyncRateLimiter(rate, burst)
+            client = SyncNotionClient(
+                AsyncNotionClient(target.token, target.database_id, rate_limiter=self.limiters[target.token],
+                                  max_connections=pool_size),
+                share_loop_with=loop_owners.get(target.token),
+            )
+            loop_owners.setdefault(target.token, client)
+            self.clients[target.name] = client
+        self._loop_owners = list(loop_owners.values())
+
+    @classmethod
+    def from_config(cls, path: Optional[str] = None, **kwargs) -> "ClientPool":
+        return cls(load_targets(path), **kwargs)
+
+    def processor(self, name: str) -> TransactionProcessor:
+        if name not in self._processors:
+            target = self.targets[name]
+            self._processors[name] = TransactionProcessor(
+                self.clients[name], state_dir=target.state_dir, rules_path=target.rules_path
+            )
+        return self._processors[name]
+
+    def exporter(self, name: str) -> ExporterService:
+        if name not in self._exporters:
+            # "" rather than None: a target without projects must not use the environment's
+            project_db = self.targets[name].project_database_id or ""
+            self._exporters[name] = ExporterService(self.clients[name], project_database_id=project_db)
+        return self._exporters[name]
+
+    def run(self, jobs: Dict[str, Callable[[], Any]]) -> FanOutResult:
+        """
+        Runs one job per target name, all at the same time. Jobs on targets
+        that share a token are still paced together by its rate limiter.
+        An exception only fails its own target.
+        """
+        fan_out = FanOutResult()
+        start = time.monotonic()
+
+        def run_one(name, job):
+            result = TargetResult(name)
+            job_start = time.monotonic()
+            try:
+                result.value = job()
+            except Exception as e:
+                logger.error(f"Error en el destino {name}: {e}", exc_info=True)
+                result.error = str(e)
+            result.elapsed = time.monotonic() - job_start
+            return result
+
+        if jobs:
+            with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+                futures = [executor.submit(run_one, name, job) for name, job in jobs.items()]
+                for future in futures:
+                    result = future.result()
+                    fan_out.results[result.name] = result
+
+        fan_out.elapsed = time.monotonic() - start
+        return fan_out
+
+    def run_all(self, job: Callable[[str], Any], names: Optional[Iterable[str]] = None) -> FanOutResult:
+        """Runs job(target name) on every target (or the given ones) in parallel."""
+        names = list(names) if names is not None else list(self.targets)
+        unknown = [name for name in names if name not in self.targets]
+        if unknown:
+            raise ValueError(f"Destinos desconocidos: {unknown}")
+        return self.run({name: (lambda name=name: job(name)) for name in names})
+
+    # Common fan-outs
+
+    def import_files(self, files: Dict[str, List[str]], names: Optional[Iterable[str]] = None) -> FanOutResult:
+        """
+        Imports each target's statements (target name -> files), detecting the
+        bank of each file. With names, only those targets' files are imported.
+        """
+        def import_target(name):
+            results = []
+            for file_path in files[name]:
+                parser = detect_parser(file_path)
+                if parser is None:
+                    raise ValueError(f"Formato no reconocido: {file_path}")
+                results.append(self.processor(name).process_file(file_path, parser))
+            return _merge_results(results)
+
+        selected = list(files)
+        if names is not None:
+            names = list(names)
+            unknown = [name for name in names if name not in self.targets]
+            if unknown:
+                raise ValueError(f"Destinos desconocidos: {unknown}")
+            selected = [name for name in selected if name in names]
+        return self.run_all(import_target, selected)
+
+    def export_all(self, folder: str, extension: str = ".csv",
+                   names: Optional[Iterable[str]] = None) -> FanOutResult:
+        """Full export of every target to <folder>/<target><extension>."""
+        os.makedirs(folder, exist_ok=True)
+
+        def export_target(name):
+            file_path = os.path.join(folder, f"{name}{extension}")
+            fmt = columnar_format_from_path(file_path)
+            if fmt:
+                return self.exporter(name).export_all_to_columnar(file_path, fmt)
+            return self.exporter(name).export_all_to_csv(file_path)
+
+        return self.run_all(export_target, names)
+
+    def sync_exports(self, folder: str, extension: str = ".csv",
+                     names: Optional[Iterable[str]] = None,
+                     detect_deletions: Optional[bool] = None) -> FanOutResult:
+        """Incremental export of every target into its file in folder."""
+        os.makedirs(folder, exist_ok=True)
+        return self.run_all(
+            lambda name: self.exporter(name).export_incremental(
+                os.path.join(folder, f"{name}{extension}"), detect_deletions=detect_deletions),
+            names,
+        )
+
+    def export_categories(self, folder: str, names: Optional[Iterable[str]] = None) -> FanOutResult:
+        """
+        Subcategory list of every target to <folder>/<target>_subcategorias.csv.
+        Without names, targets with no category_database_id are left out.
+        """
+        os.makedirs(folder, exist_ok=True)
+        if names is None:
+            names = [name for name, target in self.targets.items() if target.category_database_id]
+
+        def export_target(name):
+            category_db = self.targets[name].category_database_id
+            if not category_db:
+                raise ValueError("Sin category_database_id")
+            file_path = os.path.join(folder, f"{name}_subcategorias.csv")
+            return self.exporter(name).export_categories_to_csv(file_path, category_db)
+
+        return self.run_all(export_target, names)
+
+    def close(self):
+        for session in self._sessions.values():
+            session.close()
+        owners = getattr(self, "_loop_owners", [])
+        # Clients sharing a loop close before the client that stops it
+        for client in self.clients.values():
+            if hasattr(client, "_loop") and client not in owners:
+                client.close()
+        for client in owners:
+            client.close()
+
+
+def _merge_results(results: List[ProcessorResult]) -> ProcessorResult:
+    """Sum of several ProcessorResults of one target."""
+    merged = ProcessorResult()
+    for result in results:
+        merged.total_read += result.total_read
+        merged.successful_inserts += result.successful_inserts
+        merged.duplicates += result.duplicates
+        merged.errors.extend(result.errors)
+        merged.transfers += result.transfers
+        merged.suggested += result.suggested
+        merged.upload_failures += result.upload_failures
+    return merged
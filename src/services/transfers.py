@@ -0,0 +1,80 @@
+import logging
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.core.models import Transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_DAYS = 3
+
+
+def match_transfers(new: List[Transaction], stored: List[Transaction],
+                    window_days: int = DEFAULT_WINDOW_DAYS) -> List[Tuple[Transaction, Transaction]]:
+    """
+    Pairs movements between our own accounts: an outgoing amount in one
+    account and the same incoming amount in another, at most window_days
+    apart. At least one side of every pair comes from `new`; pairs already
+    stored on both sides are left alone. Returns (outgoing, incoming) pairs.
+
+    The candidate search is a join on the absolute amount in cents over the
+    whole batch; each movement is then used once, closest dates first.
+    """
+    new = [t for t in new if not t.is_transfer]
+    txs = new + [t for t in stored if not t.is_transfer]
+    if not new or len(txs) < 2:
+        return []
+
+    pairs = _candidate_pairs(txs, len(new), window_days)
+    pairs = pairs[pairs["is_new_out"] | pairs["is_new_in"]].sort_values(
+        ["gap", "day_out", "idx_out", "idx_in"], kind="stable")
+
+    matched = []
+    used = set()
+    for out_idx, in_idx in zip(pairs["idx_out"].to_numpy(), pairs["idx_in"].to_numpy()):
+        if out_idx in used or in_idx in used:
+            continue
+        used.add(out_idx)
+        used.add(in_idx)
+        matched.append((txs[out_idx], txs[in_idx]))
+
+    logger.info(f"Transferencias internas emparejadas: {len(matched)}")
+    return matched
+
+
+def counterpart_counts(new: List[Transaction], stored: List[Transaction],
+                       window_days: int = DEFAULT_WINDOW_DAYS) -> Dict[int, int]:
+    """
+    id(transaction) -> how many movements (new or stored) could be the other
+    side of its transfer. A pair is unambiguous when both sides have exactly one.
+    """
+    new = [t for t in new if not t.is_transfer]
+    txs = new + [t for t in stored if not t.is_transfer]
+    counts = {id(t): 0 for t in txs}
+    if len(txs) < 2:
+        return counts
+    pairs = _candidate_pairs(txs, len(new), window_days)
+    for column in ("idx_out", "idx_in"):
+        for idx, n in pairs[column].value_counts().items():
+            counts[id(txs[idx])] += int(n)
+    return counts
+
+
+def _candidate_pairs(txs: List[Transaction], n_new: int, window_days: int) -> pd.DataFrame:
+    """Every (outgoing, incoming) pair of equal amount, different account and close dates."""
+    df = pd.DataFrame({
+        "idx": np.arange(len(txs)),
+        "day": np.array([t.date.toordinal() for t in txs], dtype=np.int64),
+        "cents": np.array([t.cents for t in txs], dtype=np.int64),
+        "account": [t.account for t in txs],
+        "is_new": np.arange(len(txs)) < n_new,
+    })
+    df["abs_cents"] = df["cents"].abs()
+
+    outs = df[df["cents"] < 0]
+    ins = df[df["cents"] > 0]
+    pairs = outs.merge(ins, on="abs_cents", suffixes=("_out", "_in"))
+    pairs["gap"] = (pairs["day_out"] - pairs["day_in"]).abs()
+    return pairs[(pairs["account_out"] != pairs["account_in"]) & (pairs["gap"] <= window_days)]
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from src.extractors.detection import detect_parser, SUPPORTED_EXTENSIONS
+from src.services.processor import TransactionProcessor
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = ".gastos_watch.json"
+# Partial downloads and Office lock files
+IGNORED_PREFIXES = ("~$", ".")
+IGNORED_SUFFIXES = (".crdownload", ".part", ".tmp", ".download")
+
+# Outcomes of importing one file
+IMPORTED, SKIPPED, FAILED = "importado", "omitido", "fallido"
+
+
+def file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FolderWatcher:
+    """
+    Polls a folder for new or changed statements and imports them through
+    the normal TransactionProcessor path. A file is imported once its size
+    and modification time have not changed for `settle_seconds` (so it is
+    no longer being written), and never twice with the same content: the
+    SHA-256 of every imported file is kept in a state file in the folder.
+    A file is only recorded when every row reached Notion; otherwise it is
+    retried after `retry_seconds` (rows already uploaded are then found by
+    fingerprint and skipped as duplicates).
+    The processor (Notion session, rules, indexes) is created once.
+    """
+    def __init__(self, folder: str, processor: TransactionProcessor,
+                 settle_seconds: float = 3.0, poll_interval: float = 1.0, retry_seconds: float = 300.0):
+        self.folder = Path(folder)
+        self.processor = processor
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.retry_seconds = retry_seconds
+        self.state_path = self.folder / STATE_FILE
+        self.state = self._load_state()
+        # path -> (size, mtime_ns, monotonic time the signature was first seen)
+        self._pending: Dict[str, Tuple[int, int, float]] = {}
+        # path -> (size, mtime_ns, monotonic time to look at it again) for files already
+        # handled in this session; the time is infinite unless the import failed
+        self._handled: Dict[str, Tuple[int, int, float]] = {}
+
+    def _load_state(self) -> Dict:
+        if self.state_path.exists():
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        return {"processed": {}}
+
+    def _save_state(self):
+        tmp = self.state_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.state_path)
+
+    def _candidates(self):
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                name = entry.name
+                if not entry.is_file() or name == STATE_FILE:
+                    continue
+                if name.startswith(IGNORED_PREFIXES) or name.lower().endswith(IGNORED_SUFFIXES):
+                    continue
+                if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                    yield entry
+
+    def poll_once(self) -> int:
+        """Checks the folder once. Returns the number of files imported."""
+        now = time.monotonic()
+        imported = 0
+        for entry in self._candidates():
+            stat = entry.stat()
+            signature = (stat.st_size, stat.st_mtime_ns)
+            handled = self._handled.get(entry.path)
+            if handled is not None and handled[:2] == signature and now < handled[2]:
+                continue
+
+            pending = self._pending.get(entry.path)
+            if pending is None or pending[:2] != signature:
+                # New or still being written: (re)start the debounce timer
+                self._pending[entry.path] = (*signature, now)
+                continue
+            if now - pending[2] < self.settle_seconds:
+                continue
+
+            del self._pending[entry.path]
+            status = self._import(entry.path)
+            retry_at = now + self.retry_seconds if status == FAILED else float("inf")
+            self._handled[entry.path] = (*signature, retry_at)
+            if status == IMPORTED:
+                imported += 1
+        return imported
+
+    def _import(self, file_path: str) -> str:
+        """Imports one file. Returns IMPORTED, SKIPPED or FAILED (to be retried)."""
+        content_hash = file_sha256(file_path)
+        if content_hash in self.state["processed"]:
+            logger.info(f"Sin cambios, se omite: {file_path}")
+            return SKIPPED
+
+        parser = detect_parser(file_path)
+        if parser is None:
+            logger.warning(f"Formato de extracto no reconocido: {file_path}")
+            return SKIPPED
+
+        logger.info(f"Importando {file_path} con {type(parser).__name__}")
+        try:
+            result = self.processor.process_file(file_path, parser)
+        except Exception as e:
+            logger.error(f"Error importando {file_path}: {e}", exc_info=True)
+            return FAILED
+
+        logger.info(f"{os.path.basename(file_path)}: {result.to_string()}")
+        if result.upload_failures:
+            # Not recorded, or the rows that failed would never be uploaded
+            logger.warning(f"{os.path.basename(file_path)}: {result.upload_failures} escrituras fallidas, "
+                           f"se reintentará en {self.retry_seconds:.0f} s")
+            return FAILED
+        self.state["processed"][content_hash] = {
+            "file": os.path.basename(file_path),
+            "run_id": result.run_id,
+            "inserted": result.successful_inserts,
+            "imported_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        self._save_state()
+        return IMPORTED
+
+    def run(self, stop_event: Optional[threading.Event] = None):
+        """Polls until stop_event is set (or forever)."""
+        stop_event = stop_event or threading.Event()
+        logger.info(f"Vigilando {self.folder} (espera {self.settle_seconds:.0f} s)")
+        while not stop_event.is_set():
+            try:
+                self.poll_once()
+            except OSError as e:
+                logger.error(f"Error leyendo {self.folder}: {e}")
+            stop_event.wait(self.poll_interval)
@@ -1,15 +1,21 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox, scrolledtext
+from tkinter import filedialog, messagebox, scrolledtext, simpledialog
 import logging
 import threading
 import queue
 import os
 from src.services.processor import TransactionProcessor, ProcessorResult
-from src.services.exporter import ExporterService
-from src.services.notion_service import NotionClient
+from src.services.exporter import ExporterService, columnar_format_from_path
+from src.services.notion_service import create_client
+from src.services.recategorizer import Recategorizer
+from src.services.import_runs import ImportRunLog, rollback_run
+from src.services.suggestions import CategorySuggester, DEFAULT_INDEX_PATH
+from src.services.reporting import RollupStore
+from src.services.history_store import HistoryStore
 from src.extractors.laboral_kutxa import LaboralKutxaParser
 from src.extractors.revolut import RevolutParser
 from src.extractors.bbva import BBVAParser
+from src.ui.preview import ImportPreview, PREVIEW_ROWS
 
 logger = logging.getLogger(__name__)
 
@@ -24,9 +30,11 @@ class AppGUI:
 
         # Initialize Services
         try:
-            self.notion_client = NotionClient()
-            self.processor = TransactionProcessor(self.notion_client)
+            self.notion_client = create_client()
+            self.run_log = ImportRunLog()
+            self.processor = TransactionProcessor(self.notion_client, self.run_log)
             self.exporter = ExporterService(self.notion_client)
+            self.recategorizer = Recategorizer(self.notion_client)
         except Exception as e:
             messagebox.showerror("Error de Configuración", f"No se pudo iniciar el cliente de Notion: {e}\nRevisa tu archivo .env")
             self.notion_client = None
@@ -79,9 +87,28 @@ class AppGUI:
         btn_export = tk.Button(export_frame, text="Exportar Notion a CSV", command=self.on_export)
         btn_export.pack(side=tk.LEFT, padx=5)
 
+        btn_inc = tk.Button(export_frame, text="Exportar incremental", command=self.on_export_incremental)
+        btn_inc.pack(side=tk.LEFT, padx=5)
+
+        btn_summary = tk.Button(export_frame, text="Resumen", command=self.on_summary)
+        btn_summary.pack(side=tk.LEFT, padx=5)
+
         btn_cat = tk.Button(export_frame, text="Exportar Categorías", command=self.on_export_categories)
         btn_cat.pack(side=tk.LEFT, padx=5)
 
+        # Maintenance Buttons
+        maint_frame = tk.Frame(main_frame)
+        maint_frame.pack(pady=10)
+
+        btn_recat = tk.Button(maint_frame, text="Recategorizar", command=self.on_recategorize)
+        btn_recat.pack(side=tk.LEFT, padx=5)
+
+        btn_index = tk.Button(maint_frame, text="Índice de sugerencias", command=self.on_build_suggestions)
+        btn_index.pack(side=tk.LEFT, padx=5)
+
+        btn_undo = tk.Button(maint_frame, text="Deshacer importación", command=self.on_rollback)
+        btn_undo.pack(side=tk.LEFT, padx=5)
+
         # Status / Log Area
         self.status_label = tk.Label(main_frame, text="Listo.", fg="blue")
         self.status_label.pack(pady=(10, 5))
@@ -128,17 +155,32 @@ class AppGUI:
         if not file_path:
             return
 
-        threading.Thread(target=self.process_thread, args=(bank_name, file_path)).start()
+        preview = ImportPreview(self.root, f"Vista previa: {bank_name}",
+                                on_confirm=lambda plan: self._start_import(bank_name, plan))
+        threading.Thread(target=self.preview_thread, args=(preview, bank_name, file_path), daemon=True).start()
+
+    def preview_thread(self, preview, bank_name, file_path):
+        """Head of the file first, then the full dry-run plan; nothing is written."""
+        parser_cls = self.banks[bank_name]
+        try:
+            head, head_errors = parser_cls(limit=PREVIEW_ROWS).parse(file_path)
+            self.queue.put((preview.show_head, head, head_errors))
+
+            plan = self.processor.plan_file(file_path, parser_cls())
+            self.queue.put((preview.show_plan, plan))
+        except Exception as e:
+            self.log(f"Error crítico: {e}")
+            self.queue.put((preview.show_error, f"Error: {e}"))
+
+    def _start_import(self, bank_name, plan):
+        threading.Thread(target=self.process_thread, args=(bank_name, plan)).start()
 
-    def process_thread(self, bank_name, file_path):
+    def process_thread(self, bank_name, plan):
         self.update_status(f"Procesando {bank_name}...", "orange")
         self.log(f"--- Iniciando proceso para {bank_name} ---")
 
         try:
-            parser_cls = self.banks[bank_name]
-            parser = parser_cls()
-
-            result = self.processor.process_file(file_path, parser)
+            result = self.processor.execute(plan)
 
             self.log(f"Resultados: {result.to_string()}")
             if result.errors:
@@ -156,7 +198,10 @@ class AppGUI:
 
     def on_export(self):
         if not self.notion_client: return
-        file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV", "*.csv")])
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("Parquet", "*.parquet"), ("Feather", "*.feather")],
+        )
         if not file_path: return
 
         threading.Thread(target=self.export_thread, args=(file_path,)).start()
@@ -164,13 +209,38 @@ class AppGUI:
     def export_thread(self, file_path):
         self.update_status("Exportando...", "orange")
         self.log("Iniciando exportación...")
-        if self.exporter.export_all_to_csv(file_path):
+        if columnar_format_from_path(file_path):
+            ok = self.exporter.export_all_to_columnar(file_path)
+        else:
+            ok = self.exporter.export_all_to_csv(file_path)
+        if ok:
             self.log(f"Exportación exitosa en {file_path}")
             self.update_status("Exportación OK", "green")
         else:
             self.log("Falló la exportación.")
             self.update_status("Error exportación", "red")
 
+    def on_export_incremental(self):
+        if not self.notion_client: return
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("Parquet", "*.parquet"), ("Feather", "*.feather")],
+            confirmoverwrite=False,
+        )
+        if not file_path: return
+
+        threading.Thread(target=self.export_incremental_thread, args=(file_path,)).start()
+
+    def export_incremental_thread(self, file_path):
+        self.update_status("Exportando cambios...", "orange")
+        self.log("Iniciando exportación incremental...")
+        if self.exporter.export_incremental(file_path):
+            self.log(f"Exportación incremental actualizada en {file_path}")
+            self.update_status("Exportación OK", "green")
+        else:
+            self.log("Falló la exportación incremental.")
+            self.update_status("Error exportación", "red")
+
     def on_export_categories(self):
         if not self.notion_client: return
         cat_db_id = os.environ.get("NOTION_CATEGORY_DATABASE_ID")
@@ -192,6 +262,121 @@ class AppGUI:
             self.log("Falló la exportación de categorías.")
             self.update_status("Error exportación", "red")
 
+    def on_recategorize(self):
+        if not self.notion_client: return
+        threading.Thread(target=self.recategorize_plan_thread).start()
+
+    def recategorize_plan_thread(self):
+        self.update_status("Calculando recategorización...", "orange")
+        self.log("--- Recategorización (simulación) ---")
+        try:
+            plan = self.recategorizer.plan(only_script=True)
+        except Exception as e:
+            self.log(f"Error crítico: {e}")
+            self.update_status("Error.", "red")
+            return
+
+        self.log(plan.to_string())
+        for change in plan.changes[:50]:
+            self.log(f" - {change.description}: {change.old_subcategory} -> {change.new_subcategory}")
+        if len(plan.changes) > 50:
+            self.log(f" ... y {len(plan.changes) - 50} más")
+        self.update_status("Simulación lista.", "green")
+
+        if plan.changes:
+            self.queue.put((self._confirm_recategorization, plan))
+
+    def _confirm_recategorization(self, plan):
+        if messagebox.askyesno("Recategorizar", f"{plan.to_string()}\n¿Aplicar los cambios en Notion?"):
+            threading.Thread(target=self.recategorize_apply_thread, args=(plan,)).start()
+
+    def recategorize_apply_thread(self, plan):
+        self.update_status("Aplicando recategorización...", "orange")
+        result = self.recategorizer.apply(
+            plan, progress=lambda done, total: self.update_status(f"Actualizando {done}/{total}...", "orange")
+        )
+        self.log(f"Recategorización: {result.to_string()}")
+        self.update_status("Recategorización finalizada.", "green")
+
+    def on_summary(self):
+        store = RollupStore.load()
+        export_path = None
+        if store is None:
+            export_path = filedialog.askopenfilename(
+                title="No hay resúmenes: selecciona una exportación de Notion",
+                filetypes=[("Exportaciones", "*.csv *.parquet *.feather"), ("Todos", "*.*")],
+            )
+            if not export_path: return
+
+        threading.Thread(target=self.summary_thread, args=(store, export_path)).start()
+
+    def summary_thread(self, store, export_path):
+        try:
+            if store is None:
+                store = RollupStore()
+                store.rebuild_from_export(export_path)
+                store.save()
+                if self.notion_client:
+                    self.processor.rollups = store
+
+            months = sorted(store.rollups["Mes"].unique())
+            start = months[-12] if len(months) >= 12 else None
+            table = store.summary(by="categoria", start=start)
+            self.log(f"--- Resumen por categoría (desde {start or 'el inicio'}) ---")
+            for row in table.itertuples(index=False):
+                self.log(f"{row.Categoría}: gasto {row.Gasto:.2f} | ingreso {row.Ingreso:.2f} | {row.Movimientos} mov.")
+        except Exception as e:
+            self.log(f"Error calculando el resumen: {e}")
+
+    def on_build_suggestions(self):
+        file_path = filedialog.askopenfilename(
+            title="Selecciona una exportación de Notion",
+            filetypes=[("Exportaciones", "*.csv *.parquet *.feather"), ("Todos", "*.*")],
+        )
+        if not file_path: return
+
+        threading.Thread(target=self.build_suggestions_thread, args=(file_path,)).start()
+
+    def build_suggestions_thread(self, file_path):
+        self.update_status("Construyendo índice de sugerencias...", "orange")
+        try:
+            suggester = CategorySuggester.from_export(file_path)
+            suggester.save(DEFAULT_INDEX_PATH)
+            if self.notion_client:
+                self.processor.suggester = suggester
+            self.log(f"Índice de sugerencias guardado en {DEFAULT_INDEX_PATH} ({len(suggester.labels)} descripciones)")
+            self.update_status("Índice listo.", "green")
+        except Exception as e:
+            self.log(f"Error construyendo el índice: {e}")
+            self.update_status("Error.", "red")
+
+    def on_rollback(self):
+        if not self.notion_client: return
+        last = self.run_log.last_run()
+        run_id = simpledialog.askstring(
+            "Deshacer importación",
+            "Id de la importación a deshacer:",
+            initialvalue=last["run_id"] if last else "",
+        )
+        if not run_id: return
+
+        threading.Thread(target=self.rollback_thread, args=(run_id.strip(),)).start()
+
+    def rollback_thread(self, run_id):
+        self.update_status(f"Deshaciendo {run_id}...", "orange")
+        self.log(f"--- Deshaciendo importación {run_id} ---")
+        try:
+            result = rollback_run(
+                self.notion_client, run_id, self.run_log,
+                progress=lambda done, total: self.update_status(f"Archivando {done}/{total}...", "orange"),
+                history=HistoryStore.open_existing(), rollups=RollupStore.load(),
+            )
+            self.log(f"Importación {run_id}: {result.to_string()}")
+            self.update_status("Importación deshecha.", "green")
+        except Exception as e:
+            self.log(f"Error crítico: {e}")
+            self.update_status("Error.", "red")
+
 def create_main_window():
     root = tk.Tk()
     app = AppGUI(root)
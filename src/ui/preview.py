@@ -0,0 +1,155 @@
+import tkinter as tk
+from tkinter import ttk, scrolledtext
+from typing import Callable, List, Optional, Sequence
+
+from src.core.models import Transaction
+from src.services.processor import ImportPlan
+
+# Rows parsed for the instant preview, before the full plan is ready
+PREVIEW_ROWS = 200
+# Error lines listed in the window; the rest are only counted
+MAX_LISTED_ERRORS = 200
+
+COLUMNS = ("Estado", "Fecha", "Cuenta", "Descripción", "Importe", "Subcategoría")
+STATUS_FILTERS = ("Todos", ImportPlan.NEW, ImportPlan.DUPLICATE, ImportPlan.TRANSFER)
+
+
+class VirtualTable(tk.Frame):
+    """
+    Treeview that only ever holds the visible rows. Scrolling re-fills that
+    fixed set of items from `rows`, so a million-row statement costs the
+    same to show as a hundred-row one.
+    """
+    def __init__(self, master, columns: Sequence[str], height: int = 20):
+        super().__init__(master)
+        self.height = height
+        self.rows: Sequence = []
+        self.formatter: Callable[[object], tuple] = tuple
+        self.offset = 0
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=height, selectmode="none")
+        for column in columns:
+            self.tree.heading(column, text=column)
+            self.tree.column(column, width=260 if column == "Descripción" else 90, stretch=column == "Descripción")
+        self.scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scroll)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.items = [self.tree.insert("", tk.END, values=()) for _ in range(height)]
+        for widget in (self.tree, self.scrollbar):
+            widget.bind("<MouseWheel>", lambda e: self.scroll_to(self.offset - e.delta // 40))
+            widget.bind("<Button-4>", lambda e: self.scroll_to(self.offset - 3))
+            widget.bind("<Button-5>", lambda e: self.scroll_to(self.offset + 3))
+
+    def set_rows(self, rows: Sequence, formatter: Optional[Callable[[object], tuple]] = None):
+        """Shows `rows`; `formatter` turns one of them into the column values, only when visible."""
+        self.rows = rows
+        self.formatter = formatter or tuple
+        self.scroll_to(0)
+
+    def scroll_to(self, offset: int):
+        self.offset = max(0, min(offset, len(self.rows) - self.height))
+        visible = self.rows[self.offset:self.offset + self.height]
+        for i, item in enumerate(self.items):
+            self.tree.item(item, values=self.formatter(visible[i]) if i < len(visible) else ())
+        total = max(len(self.rows), 1)
+        self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.height) / total))
+
+    def _on_scroll(self, action, amount, unit=None):
+        if action == tk.MOVETO:
+            self.scroll_to(int(float(amount) * len(self.rows)))
+        elif unit == tk.PAGES:
+            self.scroll_to(self.offset + int(amount) * self.height)
+        else:
+            self.scroll_to(self.offset + int(amount))
+
+
+class ImportPreview(tk.Toplevel):
+    """
+    Preview of an import: first the head of the file, then the full plan
+    (new rows, duplicates, transfers, categories and errors). Nothing is
+    written until the user confirms, which calls on_confirm(plan).
+    """
+    def __init__(self, master, title: str, on_confirm: Callable[[ImportPlan], None]):
+        super().__init__(master)
+        self.title(title)
+        self.geometry("900x600")
+        self.on_confirm = on_confirm
+        self.plan: Optional[ImportPlan] = None
+        self.statuses = {}
+
+        self.summary = tk.Label(self, text="Leyendo el archivo...", fg="orange")
+        self.summary.pack(pady=(10, 5))
+
+        filter_frame = tk.Frame(self)
+        filter_frame.pack(fill=tk.X, padx=10)
+        tk.Label(filter_frame, text="Mostrar:").pack(side=tk.LEFT)
+        self.status_filter = ttk.Combobox(filter_frame, values=STATUS_FILTERS, state="disabled", width=15)
+        self.status_filter.set(STATUS_FILTERS[0])
+        self.status_filter.bind("<<ComboboxSelected>>", lambda e: self._show_plan_rows())
+        self.status_filter.pack(side=tk.LEFT, padx=5)
+
+        self.table = VirtualTable(self, COLUMNS)
+        self.table.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        self.errors = scrolledtext.ScrolledText(self, height=5, state="disabled")
+        self.errors.pack(fill=tk.X, padx=10)
+
+        btn_frame = tk.Frame(self)
+        btn_frame.pack(pady=10)
+        self.btn_confirm = tk.Button(btn_frame, text="Confirmar importación", state="disabled", command=self._confirm)
+        self.btn_confirm.pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Cancelar", command=self.destroy).pack(side=tk.LEFT, padx=5)
+
+    def show_head(self, transactions: List[Transaction], errors: List[str]):
+        """First rows of the file, before dedup and categorization."""
+        if not self.winfo_exists() or self.plan is not None:
+            return
+        self.table.set_rows(transactions, lambda tx: self._row(tx, "..."))
+        self.summary.config(text=f"Primeras {len(transactions)} filas. Calculando el plan completo...")
+        self._show_errors(errors)
+
+    def show_plan(self, plan: ImportPlan):
+        if not self.winfo_exists():
+            return
+        self.plan = plan
+        self.statuses = plan.statuses()
+        self.summary.config(text=plan.to_string(), fg="green" if plan.new else "black")
+        self.status_filter.config(state="readonly")
+        self._show_plan_rows()
+        self._show_errors(plan.errors)
+        if plan.new:
+            self.btn_confirm.config(state="normal")
+
+    def show_error(self, message: str):
+        if self.winfo_exists():
+            self.summary.config(text=message, fg="red")
+
+    def _show_plan_rows(self):
+        wanted = self.status_filter.get()
+        rows = self.plan.transactions
+        if wanted != STATUS_FILTERS[0]:
+            rows = [tx for tx in rows if self.statuses.get(id(tx)) == wanted]
+        suggested = {id(tx) for tx in self.plan.suggested}
+        self.table.set_rows(rows, lambda tx: self._row(
+            tx, self.statuses.get(id(tx), ""), " (sugerida)" if id(tx) in suggested else ""
+        ))
+
+    @staticmethod
+    def _row(tx: Transaction, status: str, suffix: str = "") -> tuple:
+        subcategory = f"{tx.subcategory}{suffix}" if tx.subcategory else ""
+        return (status, tx.date.isoformat(), tx.account, tx.description, f"{tx.amount:.2f}", subcategory)
+
+    def _show_errors(self, errors: List[str]):
+        lines = errors[:MAX_LISTED_ERRORS]
+        if len(errors) > MAX_LISTED_ERRORS:
+            lines.append(f" ... y {len(errors) - MAX_LISTED_ERRORS} más")
+        self.errors.config(state="normal")
+        self.errors.delete("1.0", tk.END)
+        self.errors.insert(tk.END, "\n".join(lines) if lines else "Sin errores.")
+        self.errors.config(state="disabled")
+
+    def _confirm(self):
+        plan = self.plan
+        self.destroy()
+        self.on_confirm(plan)
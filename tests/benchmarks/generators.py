@@ -0,0 +1,139 @@
+"""
+Synthetic bank statements for the benchmarks.
+
+Each writer produces a file in the exact layout the parser expects, with a
+small share of malformed rows, and returns how many malformed rows it wrote.
+
+    python -m tests.benchmarks.generators --size 100k --out /tmp/extractos
+"""
+import argparse
+import csv
+import os
+import random
+from datetime import date, datetime, timedelta
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+# One malformed row every MALFORMED_EVERY rows
+MALFORMED_EVERY = 500
+
+MERCHANTS = [
+    "MERCADONA", "CARREFOUR", "EROSKI", "LIDL", "REPSOL", "AMAZON", "NETFLIX",
+    "SPOTIFY", "IBERDROLA", "MOVISTAR", "RENFE", "FARMACIA", "RESTAURANTE", "GIMNASIO",
+]
+START_DATE = date(2020, 1, 1)
+
+
+def _description(rng: random.Random) -> str:
+    kind = rng.random()
+    if kind < 0.1:
+        return "Transferencia recibida"
+    if kind < 0.2:
+        return "Bizum enviado"
+    return f"Pago con tarjeta {rng.choice(MERCHANTS)} {rng.randint(1, 999):03d}"
+
+
+def _spanish_amount(value: float) -> str:
+    """-1234.5 -> '-1.234,50'"""
+    text = f"{value:,.2f}"
+    return text.replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def _rows(rows: int, seed: int):
+    rng = random.Random(seed)
+    for i in range(rows):
+        day = START_DATE + timedelta(days=i * 1500 // max(rows, 1))
+        amount = round(rng.uniform(-800, 300) if rng.random() < 0.9 else rng.uniform(500, 3000), 2)
+        yield i, rng, day, _description(rng), amount, (i + 1) % MALFORMED_EVERY == 0
+
+
+def write_laboral_kutxa_csv(path: str, rows: int, seed: int = 0) -> int:
+    malformed = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(["Fecha operación", "Fecha valor", "Concepto", "Importe", "Saldo"])
+        for i, rng, day, desc, amount, bad in _rows(rows, seed):
+            fecha = day.strftime("%d/%m/%Y")
+            importe = _spanish_amount(amount)
+            if bad:
+                malformed += 1
+                if i % 2:
+                    fecha = "32/13/2024"
+                else:
+                    importe = "n/a"
+            writer.writerow([fecha, f"{fecha} 00:00", desc, importe, _spanish_amount(1000 + i % 5000)])
+    return malformed
+
+
+def write_revolut_csv(path: str, rows: int, seed: int = 0) -> int:
+    malformed = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter=",")
+        writer.writerow(["Tipo", "Producto", "Fecha de inicio", "Fecha de finalización", "Descripción",
+                         "Importe", "Comisión", "Divisa", "State", "Saldo"])
+        for i, rng, day, desc, amount, bad in _rows(rows, seed):
+            started = datetime.combine(day, datetime.min.time()) + timedelta(seconds=rng.randint(0, 86399))
+            fecha = started.strftime("%Y-%m-%d %H:%M:%S")
+            comision = "0.00" if rng.random() < 0.95 else "0.50"
+            if bad:
+                malformed += 1
+                fecha = ""
+            writer.writerow(["PAGO CON TARJETA", "Actual", fecha, fecha, desc, f"{amount:.2f}",
+                             comision, "EUR", "COMPLETADO", f"{1000 + i % 5000:.2f}"])
+    return malformed
+
+
+def write_bbva_xlsx(path: str, rows: int, seed: int = 0) -> int:
+    from openpyxl import Workbook
+
+    malformed = 0
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Movimientos")
+    sheet.append(["Últimos movimientos"])
+    sheet.append([])
+    sheet.append(["Cuenta", "ES00 0182 0000 0000 0000 0000"])
+    sheet.append([])
+    sheet.append(["F.Valor", "Fecha", "Concepto", "Movimiento", "Importe", "Divisa",
+                  "Disponible", "Divisa", "Observaciones"])
+    for i, rng, day, desc, amount, bad in _rows(rows, seed):
+        fecha = day.strftime("%d/%m/%Y")
+        if bad:
+            malformed += 1
+            fecha = "sin fecha"
+        sheet.append([fecha, fecha, desc, "Movimiento", _spanish_amount(amount), "EUR",
+                      _spanish_amount(1000 + i % 5000), "EUR", f"Referencia {i}"])
+    workbook.save(path)
+    return malformed
+
+
+WRITERS = {
+    "laboral_kutxa": ("laboral_kutxa_{size}.csv", write_laboral_kutxa_csv),
+    "revolut": ("revolut_{size}.csv", write_revolut_csv),
+    "bbva": ("bbva_{size}.xlsx", write_bbva_xlsx),
+}
+
+
+def generate(out_dir: str, size: str, banks=None) -> dict:
+    """Writes one statement per bank; returns {bank: (path, malformed_rows)}."""
+    os.makedirs(out_dir, exist_ok=True)
+    files = {}
+    for bank, (pattern, writer) in WRITERS.items():
+        if banks and bank not in banks:
+            continue
+        path = os.path.join(out_dir, pattern.format(size=size))
+        files[bank] = (path, writer(path, SIZES[size]))
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera extractos sintéticos para los benchmarks")
+    parser.add_argument("--size", choices=sorted(SIZES), default="1k")
+    parser.add_argument("--out", default="bench_data")
+    parser.add_argument("--bank", action="append", choices=sorted(WRITERS))
+    args = parser.parse_args()
+    for bank, (path, malformed) in generate(args.out, args.size, args.bank).items():
+        print(f"{bank}: {path} ({malformed} filas erróneas)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Shared pieces of the benchmark suite.
+
+Skipped unless GASTOS_BENCH=1. Other knobs:
+  GASTOS_BENCH_SIZES       comma separated sizes (1k, 100k, 1m). Default: 1k
+  GASTOS_BENCH_UPDATE=1    store the measured numbers as the new baseline
+  GASTOS_BENCH_TOLERANCE   allowed regression ratio. Default: 0.5 (timings on
+                           shared or laptop CPUs easily vary by a third)
+
+The baseline is only meaningful on the machine that recorded it.
+"""
+import json
+import os
+import time
+import tracemalloc
+import unittest
+from pathlib import Path
+
+ENABLED = os.environ.get("GASTOS_BENCH") == "1"
+SIZES = [s.strip().lower() for s in os.environ.get("GASTOS_BENCH_SIZES", "1k").split(",") if s.strip()]
+UPDATE = os.environ.get("GASTOS_BENCH_UPDATE") == "1"
+TOLERANCE = float(os.environ.get("GASTOS_BENCH_TOLERANCE", "0.5"))
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+# Short workloads are repeated until they add up to this, keeping the best run
+MIN_SECONDS = 0.5
+
+
+def measure(func, rows: int) -> dict:
+    """Best time over runs adding up to MIN_SECONDS, then one run under tracemalloc for the peak."""
+    elapsed = float("inf")
+    total = 0.0
+    while total < MIN_SECONDS:
+        start = time.perf_counter()
+        func()
+        run = time.perf_counter() - start
+        elapsed = min(elapsed, run)
+        total += run
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "rows": rows,
+        "seconds": round(elapsed, 4),
+        "rows_per_s": round(rows / elapsed, 1) if elapsed else float("inf"),
+        "peak_mib": round(peak / 2**20, 2),
+    }
+
+
+class BenchmarkCase(unittest.TestCase):
+    """Compares each recorded measurement with baseline.json (or updates it)."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.results = {}
+        cls.baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if UPDATE and cls.results:
+            # Re-read: another benchmark module may have updated it in this run
+            baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+            baseline.update(cls.results)
+            BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+
+    def record(self, name: str, size: str, numbers: dict):
+        key = f"{name}@{size}"
+        self.results[key] = numbers
+        print(f"\n{key}: {numbers['rows_per_s']:.0f} filas/s, pico {numbers['peak_mib']} MiB")
+
+        reference = self.baseline.get(key)
+        if UPDATE or reference is None:
+            return
+        self.assertGreaterEqual(numbers["rows_per_s"], reference["rows_per_s"] * (1 - TOLERANCE),
+                                f"{key}: rendimiento por debajo de la referencia {reference['rows_per_s']} filas/s")
+        self.assertLessEqual(numbers["peak_mib"], reference["peak_mib"] * (1 + TOLERANCE) + 1,
+                             f"{key}: memoria por encima de la referencia {reference['peak_mib']} MiB")
@@ -0,0 +1,108 @@
+"""
+Throughput and peak-memory benchmarks for the import hot paths.
+
+Skipped unless GASTOS_BENCH=1 (other knobs in harness.py).
+
+    GASTOS_BENCH=1 GASTOS_BENCH_SIZES=1k,100k python -m pytest -q tests/benchmarks
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.getcwd())
+
+import pandas as pd
+
+from src.extractors.bbva import BBVAParser
+from src.extractors.laboral_kutxa import LaboralKutxaParser
+from src.extractors.revolut import RevolutParser
+from src.services.categorization import categorize_record, categorize_records
+from src.services.fingerprints import assign_fingerprints
+from src.services.processor import TransactionProcessor
+from tests.benchmarks.generators import generate, MERCHANTS
+from tests.benchmarks.harness import BenchmarkCase, ENABLED, SIZES, measure
+
+# categorize_record walks the rules per row: cap the rows so 1m stays practical
+CATEGORIZE_MAX_ROWS = 20_000
+
+PARSERS = {
+    "laboral_kutxa": LaboralKutxaParser,
+    "revolut": RevolutParser,
+    "bbva": BBVAParser,
+}
+
+
+def synthetic_rules() -> pd.DataFrame:
+    rules = [{"Concepto_Contiene": m, "Concepto_Exacto": "", "Subcategoria_UUID": f"sub-{i}", "Prioridad": 0}
+             for i, m in enumerate(MERCHANTS)]
+    rules.append({"Concepto_Contiene": "", "Concepto_Exacto": "Bizum enviado",
+                  "Subcategoria_UUID": "sub-bizum", "Prioridad": 1})
+    return pd.DataFrame(rules).sort_values(by="Prioridad", ascending=False).reset_index(drop=True)
+
+
+@unittest.skipUnless(ENABLED, "Benchmarks desactivados (GASTOS_BENCH=1 para ejecutarlos)")
+class TestBenchmarks(BenchmarkCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.files = {size: generate(os.path.join(cls.tmp.name, size), size) for size in SIZES}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+        super().tearDownClass()
+
+    def parsed(self, size: str):
+        path, _ = self.files[size]["laboral_kutxa"]
+        transactions, _ = LaboralKutxaParser().parse(path)
+        return transactions
+
+    def test_parsers(self):
+        for size in SIZES:
+            for bank, parser_class in PARSERS.items():
+                with self.subTest(bank=bank, size=size):
+                    path, malformed = self.files[size][bank]
+                    parser = parser_class()
+                    transactions, errors = parser.parse(path)
+                    # Malformed rows are reported, never dropped silently
+                    self.assertEqual(len(errors), malformed)
+                    rows = len(transactions) + len(errors)
+                    self.record(f"parse_{bank}", size, measure(lambda: parser.parse(path), rows))
+
+    def test_categorize_record(self):
+        rules = synthetic_rules()
+        for size in SIZES:
+            with self.subTest(size=size):
+                names = [t.description for t in self.parsed(size)][:CATEGORIZE_MAX_ROWS]
+                self.record("categorize_record", size,
+                            measure(lambda: [categorize_record(n, rules) for n in names], len(names)))
+
+    def test_categorize_records(self):
+        rules = synthetic_rules()
+        for size in SIZES:
+            with self.subTest(size=size):
+                names = [t.description for t in self.parsed(size)]
+                self.record("categorize_records", size, measure(lambda: categorize_records(names, rules), len(names)))
+
+    def test_dedup(self):
+        for size in SIZES:
+            with self.subTest(size=size):
+                transactions = self.parsed(size)
+                assign_fingerprints(transactions)
+                # A re-import: a quarter known by fingerprint, a quarter stored as legacy pages
+                known = {t.fingerprint for t in transactions[::4]}
+                legacy = transactions[1::4]
+
+                def dedup():
+                    assign_fingerprints(transactions)
+                    return TransactionProcessor._split_duplicates(transactions, known, legacy)
+
+                new, duplicates = dedup()
+                self.assertEqual(len(duplicates), len(known) + len(legacy))
+                self.record("dedup", size, measure(dedup, len(transactions)))
+
+
+if __name__ == "__main__":
+    unittest.main()
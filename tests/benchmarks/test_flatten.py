@@ -0,0 +1,124 @@
+"""
+Flattening of Notion query results: the schema-compiled column extractors
+against the per-record walk the exporter used before, on pages taken from
+ejemplo_record_notion.json.
+
+    GASTOS_BENCH=1 GASTOS_BENCH_SIZES=100k python -m pytest -q tests/benchmarks/test_flatten.py
+"""
+import json
+import os
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.append(os.getcwd())
+
+import pandas as pd
+
+from src.services.exporter import EXPORT_COLUMNS
+from src.services.notion_service import FINGERPRINT_PROPERTY
+from src.services.page_schema import PageFlattener
+from tests.benchmarks.generators import SIZES as ROWS
+from tests.benchmarks.harness import BenchmarkCase, ENABLED, SIZES, measure
+
+SAMPLE_PATH = Path(__file__).resolve().parents[2] / "ejemplo_record_notion.json"
+# The compiled path must be at least this many times faster than the reference
+MIN_SPEEDUP = float(os.environ.get("GASTOS_BENCH_MIN_SPEEDUP", "2"))
+
+
+def reference_flatten(record, project_map):
+    """Per-record walk with closures rebuilt on every page (the previous exporter code)."""
+    props = record.get("properties", {})
+
+    def get_number(prop_name):
+        return props.get(prop_name, {}).get("number")
+
+    def get_select(prop_name):
+        return (props.get(prop_name, {}).get("select") or {}).get("name")
+
+    def get_date(prop_name):
+        return (props.get(prop_name, {}).get("date") or {}).get("start")
+
+    def get_title(prop_name):
+        t = props.get(prop_name, {}).get("title", [])
+        return t[0].get("plain_text") if t else None
+
+    def get_relation_id(prop_name):
+        r = props.get(prop_name, {}).get("relation", [])
+        return r[0].get("id") if r else None
+
+    def get_rollup_value(prop_name):
+        rollup = props.get(prop_name, {}).get("rollup", {})
+        if rollup.get("type") == "array":
+            array = rollup.get("array", [])
+            if array:
+                first = array[0]
+                if first.get("type") == "select":
+                    return first["select"]["name"]
+                if first.get("type") == "rich_text":
+                    return first["rich_text"][0].get("plain_text") if first["rich_text"] else None
+        return None
+
+    project_names = []
+    for r in props.get("Proyecto/Viaje", {}).get("relation", []):
+        name = project_map.get(r["id"])
+        if name:
+            project_names.append(name)
+
+    return {
+        "Nombre": get_title("Nombre"),
+        "Fecha": get_date("Fecha"),
+        "Cuenta": get_select("Cuenta"),
+        "Gasto": get_number("Gasto"),
+        "Ingreso": get_number("Ingreso"),
+        "Transferencias": get_number("Transferencias"),
+        "Subcategoría": get_relation_id("Subcategoría"),
+        "Categoría": get_rollup_value("Categoría"),
+        "Proyecto/Viaje": ", ".join(project_names) if project_names else None,
+        "Mes": props.get("Mes", {}).get("formula", {}).get("string"),
+        "Script": props.get("Script", {}).get("checkbox"),
+        "url": record.get("url"),
+        "id": record.get("id"),
+    }
+
+
+@unittest.skipUnless(ENABLED, "Benchmarks desactivados (GASTOS_BENCH=1 para ejecutarlos)")
+class TestFlattenBenchmark(BenchmarkCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.sample = json.loads(SAMPLE_PATH.read_text(encoding="utf-8"))
+
+    def pages(self, size):
+        # Same page objects repeated: measures CPU, not the cost of loading JSON
+        return [self.sample[i % len(self.sample)] for i in range(ROWS[size])]
+
+    def test_flatten(self):
+        for size in SIZES:
+            with self.subTest(size=size):
+                pages = self.pages(size)
+                flattener = PageFlattener.from_pages(pages)
+
+                compiled = pd.DataFrame(flattener.flatten(pages, {}), columns=list(EXPORT_COLUMNS))
+                reference = pd.DataFrame([reference_flatten(p, {}) for p in pages], columns=list(EXPORT_COLUMNS))
+                pd.testing.assert_frame_equal(compiled, reference)
+
+                fast = measure(lambda: flattener.flatten(pages, {}), len(pages))
+                slow = measure(lambda: [reference_flatten(p, {}) for p in pages], len(pages))
+                self.record("flatten_pages", size, fast)
+                self.record("flatten_pages_reference", size, slow)
+                if len(pages) >= 100_000:
+                    # Smaller runs last a few milliseconds: too noisy for a ratio
+                    self.assertGreaterEqual(fast["rows_per_s"], slow["rows_per_s"] * MIN_SPEEDUP)
+
+    def test_transactions(self):
+        for size in SIZES:
+            with self.subTest(size=size):
+                pages = self.pages(size)
+                flattener = PageFlattener.from_pages(pages)
+                self.record("pages_to_transactions", size,
+                            measure(lambda: flattener.transactions(pages, FINGERPRINT_PROPERTY), len(pages)))
+
+
+if __name__ == "__main__":
+    unittest.main()
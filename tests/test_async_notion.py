@@ -0,0 +1,212 @@
+import asyncio
+import os
+import sys
+import unittest
+from datetime import date
+from unittest import mock
+
+# Add repo root
+sys.path.append(os.getcwd())
+
+from src.core.models import Transaction
+from src.services.notion_service import CLIENT_ENV, NotionClient, create_client
+from src.services.targets import ClientPool, NotionTarget
+
+try:
+    import aiohttp
+    from aiohttp import web
+    from src.services import async_notion
+    from src.services.async_notion import AsyncNotionClient, SyncNotionClient
+    from src.services.rate_limiter import AsyncRateLimiter
+except ImportError:
+    web = None
+
+
+def page(i, fingerprint=None):
+    props = {
+        "Fecha": {"date": {"start": f"2024-01-{i % 28 + 1:02d}"}},
+        "Cuenta": {"select": {"name": "BBVA"}},
+        "Nombre": {"title": [{"plain_text": f"Pago {i}"}]},
+        "Gasto": {"number": float(i)},
+    }
+    if fingerprint:
+        props["Huella"] = {"rich_text": [{"plain_text": fingerprint}]}
+    return {"id": f"page-{i}", "properties": props}
+
+
+class FakeNotion:
+    """Minimal Notion API: paginated queries and page creation, with one 429 (and optional stalls)."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.created = []
+        self.throttled = False
+        self.queries = 0
+        self.stalled_queries = 0  # Queries answered after the client's timeout
+        self.stalled_creates = 0
+        self.app = web.Application()
+        self.app.router.add_post("/databases/{db}/query", self.query)
+        self.app.router.add_post("/pages", self.create)
+
+    async def query(self, request):
+        self.queries += 1
+        if self.stalled_queries:
+            self.stalled_queries -= 1
+            await asyncio.sleep(1)
+        body = await request.json()
+        start = int(body.get("start_cursor") or 0)
+        end = min(start + 3, len(self.pages))
+        return web.json_response({
+            "results": self.pages[start:end],
+            "has_more": end < len(self.pages),
+            "next_cursor": str(end) if end < len(self.pages) else None,
+        })
+
+    async def create(self, request):
+        body = await request.json()
+        if self.stalled_creates:
+            # Stored, but the answer comes too late
+            self.stalled_creates -= 1
+            self.created.append(body)
+            await asyncio.sleep(1)
+            return web.json_response({"id": f"new-{len(self.created)}"})
+        if not self.throttled:
+            self.throttled = True
+            return web.json_response({}, status=429, headers={"Retry-After": "0"})
+        self.created.append(body)
+        return web.json_response({"id": f"new-{len(self.created)}"})
+
+
+@unittest.skipIf(web is None, "aiohttp no está instalado")
+class TestAsyncNotionClient(unittest.TestCase):
+    def serve(self, fake):
+        async def start():
+            runner = web.AppRunner(fake.app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            return runner, runner.addresses[0][1]
+        return start
+
+    def test_async_paginates_and_retries(self):
+        fake = FakeNotion([page(i) for i in range(7)])
+
+        async def scenario():
+            runner, port = await self.serve(fake)()
+            client = AsyncNotionClient(token="t", database_id="db", rate_limiter=AsyncRateLimiter(rate=1000, burst=100))
+            client.api_url = f"http://127.0.0.1:{port}/"
+            try:
+                pages = await client.fetch_all_pages()
+                txs = [Transaction(date(2024, 1, 1), f"Nuevo {i}", -1.0 * i - 1, "BBVA") for i in range(20)]
+                created = await client.create_transactions(txs, run_id="run-1")
+            finally:
+                await client.close()
+                await runner.cleanup()
+            return pages, txs, created
+
+        pages, txs, created = asyncio.run(scenario())
+        self.assertEqual([p["id"] for p in pages], [f"page-{i}" for i in range(7)])
+        self.assertTrue(all(created))
+        self.assertEqual(len(fake.created), 20)
+        self.assertTrue(all(tx.page_id for tx in txs))
+
+    def test_retries_timeouts_and_dropped_connections(self):
+        fake = FakeNotion([page(i) for i in range(2)])
+        fake.stalled_queries = 1
+
+        async def scenario():
+            runner, port = await self.serve(fake)()
+            client = AsyncNotionClient(token="t", database_id="db", timeout=0.2,
+                                       rate_limiter=AsyncRateLimiter(rate=1000, burst=100))
+            client.api_url = f"http://127.0.0.1:{port}/"
+            try:
+                pages = await client.fetch_all_pages()
+            finally:
+                await client.close()
+                await runner.cleanup()
+
+            # Nothing listens on the port any more: every attempt is refused
+            client = AsyncNotionClient(token="t", database_id="db", rate_limiter=AsyncRateLimiter(rate=1000, burst=100))
+            client.api_url = f"http://127.0.0.1:{port}/"
+            try:
+                with self.assertRaises(aiohttp.ClientConnectionError):
+                    await client.fetch_all_pages()
+            finally:
+                await client.close()
+            return pages
+
+        with mock.patch.object(async_notion, "MAX_BACKOFF", 0.0):
+            pages = asyncio.run(scenario())
+        self.assertEqual([p["id"] for p in pages], ["page-0", "page-1"])
+        self.assertEqual(fake.queries, 2)
+
+    def test_timed_out_create_is_not_resent(self):
+        fake = FakeNotion([])
+        fake.throttled = True
+        fake.stalled_creates = 1
+
+        async def scenario():
+            runner, port = await self.serve(fake)()
+            client = AsyncNotionClient(token="t", database_id="db", timeout=0.2,
+                                       rate_limiter=AsyncRateLimiter(rate=1000, burst=100))
+            client.api_url = f"http://127.0.0.1:{port}/"
+            try:
+                tx = Transaction(date(2024, 1, 1), "Nuevo", -1.0, "BBVA")
+                return await client.create_transaction(tx, run_id="run-1")
+            finally:
+                await client.close()
+                await runner.cleanup()
+
+        with mock.patch.object(async_notion, "MAX_BACKOFF", 0.0):
+            created = asyncio.run(scenario())
+        # Reported as failed rather than duplicated
+        self.assertFalse(created)
+        self.assertEqual(len(fake.created), 1)
+
+    def test_client_selection(self):
+        env = {CLIENT_ENV: "async", "NOTION_TOKEN": "t", "NOTION_DATABASE_ID": "db"}
+        with mock.patch.dict(os.environ, env):
+            client = create_client()
+            try:
+                self.assertIsInstance(client, SyncNotionClient)
+            finally:
+                client.close()
+
+            pool = ClientPool([NotionTarget("casa", "token_a", "db1"), NotionTarget("piso", "token_a", "db2"),
+                               NotionTarget("empresa", "token_b", "db3")])
+            try:
+                casa, piso, empresa = (pool.clients[name] for name in ("casa", "piso", "empresa"))
+                # Targets on one token share its event loop and limiter
+                self.assertIs(casa._loop, piso._loop)
+                self.assertIsNot(casa._loop, empresa._loop)
+                self.assertIs(casa.rate_limiter, piso.rate_limiter)
+            finally:
+                pool.close()
+            self.assertTrue(casa._loop.is_closed() and empresa._loop.is_closed())
+
+        with mock.patch.dict(os.environ, {CLIENT_ENV: "", "NOTION_TOKEN": "t", "NOTION_DATABASE_ID": "db"}):
+            self.assertIsInstance(create_client(), NotionClient)
+
+    def test_sync_facade(self):
+        fake = FakeNotion([page(i, fingerprint=f"fp{i}") for i in range(5)])
+        loop = asyncio.new_event_loop()
+        runner, port = loop.run_until_complete(self.serve(fake)())
+        client = SyncNotionClient(token="t", database_id="db", rate_limiter=AsyncRateLimiter(rate=1000, burst=100))
+        client.api_url = f"http://127.0.0.1:{port}/"
+        server = __import__("threading").Thread(target=loop.run_forever, daemon=True)
+        server.start()
+        try:
+            self.assertEqual(client.find_existing_fingerprints(["fp1", "fp9"]), {"fp1"})
+            batches = list(client.iter_page_batches())
+            self.assertEqual([len(b) for b in batches], [3, 2])
+            self.assertEqual(len(client.get_transactions_in_range(date(2024, 1, 1), date(2024, 1, 31))), 5)
+        finally:
+            client.close()
+            asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            server.join()
+            loop.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
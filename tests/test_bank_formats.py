@@ -0,0 +1,77 @@
+import os
+import sys
+import tempfile
+import unittest
+from datetime import date
+
+# Add repo root
+sys.path.append(os.getcwd())
+
+from src.extractors.laboral_kutxa import LaboralKutxaParser
+from src.extractors.revolut import RevolutParser
+from src.extractors.spec import BankFormat, DescriptionRule, SpecParser
+
+
+class TestBankFormats(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_laboral_kutxa(self):
+        path = self.write("lk.csv", "Fecha valor;Concepto;Importe\n"
+                                    "05/01/2024 00:00;Compra;-1.000,25\n"
+                                    "32/13/2024;Mala;1,00\n"
+                                    "06/01/2024;Nómina;2.500,00\n")
+        transactions, errors = LaboralKutxaParser().parse(path)
+        self.assertEqual([(t.date, t.amount) for t in transactions],
+                         [(date(2024, 1, 5), -1000.25), (date(2024, 1, 6), 2500.0)])
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith("Fila 3: Error procesando: Fecha inválida"))
+
+    def test_revolut_amounts_and_commission(self):
+        path = self.write("revolut.csv", "Fecha de inicio,Descripción,Importe,Comisión\n"
+                                         '2024-01-02 10:00:00,Compra,"1.234,50",\n'
+                                         "2024-01-03 10:00:00,Cambio,-12.5 €,0.10\n"
+                                         "2024-01-04 10:00:00,Malo,abc,\n")
+        transactions, errors = RevolutParser().parse(path)
+        self.assertEqual([t.amount for t in transactions], [1234.5, -12.6])
+        self.assertEqual(transactions[0].account, "Revolut")
+        self.assertTrue(errors[0].startswith("Fila 4: Error procesando: Importe inválido"))
+
+    def test_missing_columns(self):
+        path = self.write("revolut.csv", "Fecha de inicio,Descripción,Importe\n")
+        transactions, errors = RevolutParser().parse(path)
+        self.assertEqual(transactions, [])
+        self.assertIn("columnas requeridas", errors[0])
+
+    def test_custom_format_with_rules_and_limit(self):
+        class ExampleParser(SpecParser):
+            bank_format = BankFormat(
+                account="Ejemplo", date_column="Día", description_column="Texto",
+                amount_column="Cargo", date_format="%Y%m%d", delimiter="|", decimal=".",
+                invert_sign=True,
+                description_rules=(DescriptionRule("bizum", "Bizum a {Destino}"),),
+            )
+
+        path = self.write("ejemplo.csv", "Día|Texto|Cargo|Destino\n"
+                                         "20240101|BIZUM ENVIADO|10.5|Ana\n"
+                                         "20240102|Café|1.2|\n"
+                                         "20240103|Cine|8|\n")
+        transactions, errors = ExampleParser().parse(path)
+        self.assertEqual(errors, [])
+        self.assertEqual([(t.description, t.amount) for t in transactions],
+                         [("Bizum a Ana", -10.5), ("Café", -1.2), ("Cine", -8.0)])
+
+        self.assertEqual(len(ExampleParser(limit=2).parse(path)[0]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import tempfile
+import unittest
+from datetime import date, datetime
+
+sys.path.append(os.getcwd())
+
+from openpyxl import Workbook
+
+from src.extractors.bbva import BBVAParser
+
+
+class TestBBVAParser(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "bbva.xlsx")
+        wb = Workbook()
+        ws = wb.active
+        ws.append(["Últimos movimientos"])
+        ws.append([])
+        ws.append(["Cuenta", "ES00"])
+        ws.append([])
+        ws.append(["F.Valor", "Fecha", "Concepto", "Movimiento", "Importe", "Divisa", "Observaciones"])
+        ws.append(["02/01/2024", "02/01/2024", "Transferencia recibida", "", "1.250,50", "EUR", "Nómina"])
+        ws.append([datetime(2024, 1, 3), None, "Pago MERCADONA", "", -42.1, "EUR", None])
+        ws.append([])
+        ws.append(["no es fecha", None, "Bizum enviado", "", "-5,00", "EUR", "Cena"])
+        wb.save(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_streams_rows_after_preamble(self):
+        transactions, errors = BBVAParser().parse(self.path)
+
+        self.assertEqual(len(transactions), 2)
+        self.assertEqual(transactions[0].date, date(2024, 1, 2))
+        self.assertEqual(transactions[0].amount, 1250.5)
+        self.assertEqual(transactions[0].description, "Transferencia: Nómina")
+        self.assertEqual(transactions[1].date, date(2024, 1, 3))
+        self.assertEqual(transactions[1].amount, -42.1)
+        self.assertEqual(transactions[1].description, "Pago MERCADONA")
+
+        # Errors point at the real spreadsheet row
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith("Fila 9:"))
+
+    def test_missing_columns(self):
+        wb = Workbook()
+        wb.active.append(["Fecha", "Importe"])
+        wb.save(self.path)
+        transactions, errors = BBVAParser().parse(self.path)
+        self.assertEqual(transactions, [])
+        self.assertEqual(len(errors), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+import os
+import sys
+
+import pandas as pd
+
+# Add repo root
+sys.path.append(os.getcwd())
+
+from src.services.categorization import categorize_record, categorize_records
+
+
+class TestCategorizeRecords(unittest.TestCase):
+    def setUp(self):
+        self.rules = pd.DataFrame([
+            {"Concepto_Contiene": "", "Concepto_Exacto": "UBER TRIP", "Subcategoria_UUID": "uuid-uber-exact", "Prioridad": 3},
+            {"Concepto_Contiene": "UBER", "Concepto_Exacto": "", "Subcategoria_UUID": "uuid-uber", "Prioridad": 2},
+            {"Concepto_Contiene": "Bizum", "Concepto_Exacto": "", "Subcategoria_UUID": "", "Prioridad": 1},
+            {"Concepto_Contiene": "Bi", "Concepto_Exacto": "", "Subcategoria_UUID": "uuid-bi", "Prioridad": 0},
+        ])
+
+    def test_matches_row_by_row_categorization(self):
+        names = ["UBER TRIP", "UBER EATS", "Bizum: cena", "Billete", "Mercadona", None, ""]
+        expected = [categorize_record(n, self.rules) for n in names]
+        self.assertEqual(categorize_records(names, self.rules), expected)
+        self.assertEqual(expected[:4], ["uuid-uber-exact", "uuid-uber", None, "uuid-bi"])
+
+    def test_empty_rules(self):
+        self.assertEqual(categorize_records(["UBER"], pd.DataFrame()), [None])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import unittest
+import tempfile
+import json
+import os
+import sys
+from datetime import date
+from unittest import mock
+
+# Add repo root
+sys.path.append(os.getcwd())
+
+import pandas as pd
+
+from src.services.exporter import ExporterService, watermark_path
+
+
+def page(page_id, name, amount, edited, account="BBVA", archived=False):
+    return {
+        "id": page_id, "url": f"https://notion.so/{page_id}", "last_edited_time": edited,
+        "archived": archived,
+        "properties": {
+            "Nombre": {"type": "title", "title": [{"plain_text": name}]},
+            "Fecha": {"type": "date", "date": {"start": "2024-01-02"}},
+            "Cuenta": {"type": "select", "select": {"name": account}},
+            "Gasto": {"type": "number", "number": amount},
+            "Ingreso": {"type": "number", "number": None},
+        },
+    }
+
+
+class FakeNotion:
+    def __init__(self, pages):
+        self.pages = {p["id"]: p for p in pages}
+        self.sweeps = 0
+
+    def page_flattener(self, sample_pages=None):
+        # Compiled from the pages' own property types, as NotionClient does without a schema
+        from src.services.page_schema import PageFlattener
+        return PageFlattener.from_pages(sample_pages)
+
+    def iter_page_batches(self, filter=None, filter_properties=None):
+        since = (filter or {}).get("last_edited_time", {}).get("on_or_after", "")
+        # Archived pages only show up when they were edited after the watermark
+        yield [p for p in self.pages.values()
+               if p["last_edited_time"] >= since and (since or not p["archived"])]
+
+    def fetch_page_ids(self):
+        self.sweeps += 1
+        return {p["id"] for p in self.pages.values() if not p["archived"]}
+
+
+class ExporterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        # No project database: project names are not looked up
+        env = mock.patch.dict(os.environ)
+        env.start()
+        self.addCleanup(env.stop)
+        os.environ.pop("NOTION_PROJECT_DATABASE_ID", None)
+
+
+class TestIncrementalExport(ExporterTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reset()
+
+    def reset(self):
+        self.notion = FakeNotion([page("a", "Café", 1.5, "2024-01-01T10:00"),
+                                  page("b", "Cine", 8.0, "2024-01-01T12:00"),
+                                  page("c", "Bus", 2.0, "2024-01-01T11:00")])
+        self.exporter = ExporterService(self.notion)
+
+    def export(self, name, **kwargs):
+        path = os.path.join(self.tmp, name)
+        self.assertTrue(self.exporter.export_incremental(path, **kwargs))
+        if path.endswith(".parquet"):
+            return pd.read_parquet(path).set_index("id")
+        return pd.read_csv(path, sep=";", decimal=",").set_index("id")
+
+    def edit(self):
+        self.notion.pages["a"] = page("a", "Café", 3.0, "2024-01-02T09:00")
+        self.notion.pages["d"] = page("d", "Tren", 20.0, "2024-01-02T09:00")
+        self.notion.pages["b"] = page("b", "Cine", 8.0, "2024-01-02T10:00", archived=True)
+        # Archived without a new edit time: only the id sweep finds it
+        self.notion.pages["c"]["archived"] = True
+
+    def test_upserts_and_tombstones(self):
+        for name in ("export.csv", "export.parquet"):
+            with self.subTest(name):
+                self.reset()
+                self.assertEqual(sorted(self.export(name).index), ["a", "b", "c"])
+                self.assertEqual(self.notion.sweeps, 0)  # Full export: nothing to compare yet
+                self.edit()
+
+                df = self.export(name, detect_deletions=True)
+                self.assertEqual(sorted(df.index), ["a", "d"])
+                self.assertEqual(df.loc["a", "Gasto"], 3.0)
+                self.assertEqual(self.notion.sweeps, 1)
+
+    def test_without_sweep(self):
+        path = os.path.join(self.tmp, "export.csv")
+        self.export("export.csv")
+        self.edit()
+
+        # The full export counts as a sweep, so the next one is days away
+        self.assertEqual(sorted(self.export("export.csv").index), ["a", "c", "d"])
+        self.assertEqual(self.notion.sweeps, 0)
+        with open(watermark_path(path), encoding="utf-8") as f:
+            state = json.load(f)
+        self.assertEqual(state["last_edited_time"], "2024-01-02T10:00")
+        self.assertEqual(state["tombstones"], ["b"])
+
+    def test_periodic_sweep(self):
+        path = os.path.join(self.tmp, "export.parquet")
+        self.export("export.parquet")
+        self.notion.pages["c"]["archived"] = True
+
+        self.export("export.parquet")
+        self.assertEqual(self.notion.sweeps, 0)
+
+        # The last sweep is old enough
+        with open(watermark_path(path), encoding="utf-8") as f:
+            state = json.load(f)
+        state["last_sweep"] = "2000-01-01"
+        with open(watermark_path(path), "w", encoding="utf-8") as f:
+            json.dump(state, f)
+
+        self.assertEqual(sorted(self.export("export.parquet").index), ["a", "b"])
+        self.assertEqual(self.notion.sweeps, 1)
+
+
+class TestColumnarExport(ExporterTestCase):
+    def setUp(self):
+        super().setUp()
+        pages = [page(f"p{i}", f"Compra {i}", float(i), "2024-01-01T10:00", account=("BBVA", "Revolut")[i % 2])
+                 for i in range(25)]
+        self.exporter = ExporterService(FakeNotion(pages))
+
+    def test_parquet_and_feather(self):
+        for name, read in (("export.parquet", pd.read_parquet), ("export.feather", pd.read_feather)):
+            path = os.path.join(self.tmp, name)
+            self.assertTrue(self.exporter.export_all_to_columnar(path, row_group_size=10))
+            df = read(path)
+
+            self.assertEqual(len(df), 25)
+            self.assertEqual(df["Gasto"].sum(), sum(range(25)))
+            self.assertEqual(df["Fecha"].iloc[0], date(2024, 1, 2))
+            self.assertIsInstance(df["Cuenta"].dtype, pd.CategoricalDtype)
+            self.assertEqual(df["Cuenta"].iloc[:3].tolist(), ["BBVA", "Revolut", "BBVA"])
+            self.assertEqual(df["Nombre"].iloc[-1], "Compra 24")
+
+    def test_unknown_format(self):
+        self.assertFalse(self.exporter.export_all_to_columnar(os.path.join(self.tmp, "export.xlsx")))
+
+
+if __name__ == "__main__":
+    unittest.main()
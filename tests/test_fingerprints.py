@@ -0,0 +1,50 @@
+import unittest
+from unittest.mock import MagicMock
+from datetime import date
+import os
+import sys
+
+# Add repo root
+sys.path.append(os.getcwd())
+
+from src.core.models import Transaction
+from src.services.fingerprints import assign_fingerprints, backfill_fingerprints
+
+
+class TestFingerprints(unittest.TestCase):
+    def test_identical_movements_get_occurrence_index(self):
+        txs = [
+            Transaction(date=date(2024, 1, 3), description="Coffee", amount=-1.5, account="Revolut"),
+            Transaction(date=date(2024, 1, 3), description="Café", amount=-1.5, account="Revolut"),
+            Transaction(date=date(2024, 1, 3), description="Coffee", amount=-1.5, account="BBVA"),
+        ]
+        assign_fingerprints(txs)
+        self.assertEqual([t.fingerprint for t in txs], [
+            "Revolut|2024-01-03|-150|0",
+            "Revolut|2024-01-03|-150|1",
+            "BBVA|2024-01-03|-150|0",
+        ])
+
+    def test_backfill_skips_used_occurrences(self):
+        notion = MagicMock()
+        notion.iter_page_batches.return_value = iter([[
+            {"id": "p1", "created_time": "2024-01-01"},
+            {"id": "p2", "created_time": "2024-01-02"},
+        ]])
+        notion._map_page_to_transaction.side_effect = [
+            Transaction(date=date(2024, 1, 3), description="a", amount=-1.5, account="Revolut",
+                        fingerprint="Revolut|2024-01-03|-150|0", page_id="p1"),
+            Transaction(date=date(2024, 1, 3), description="b", amount=-1.5, account="Revolut", page_id="p2"),
+        ]
+        notion.update_page.return_value = True
+
+        result = backfill_fingerprints(notion)
+
+        self.assertEqual(result.succeeded, 1)
+        page_id, props = notion.update_page.call_args[0]
+        self.assertEqual(page_id, "p2")
+        self.assertEqual(props["Huella"]["rich_text"][0]["text"]["content"], "Revolut|2024-01-03|-150|1")
+
+
+if __name__ == '__main__':
+    unittest.main()
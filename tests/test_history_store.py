@@ -0,0 +1,91 @@
+import unittest
+import tempfile
+from datetime import date
+import json
+import os
+import sys
+
+# Add repo root
+sys.path.append(os.getcwd())
+
+from src.core.models import Transaction
+from src.services.history_store import HistoryStore
+
+
+def tx(day, amount, description, account="BBVA", page_id=None):
+    return Transaction(date(2024, 1, day), description, amount, account, page_id=page_id)
+
+
+class TestHistoryStore(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def descriptions(self, store):
+        return [t.description for t in store.range().to_transactions()]
+
+    def test_append_and_reload(self):
+        store = HistoryStore(self.path)
+        store.append([tx(1, -10.0, "Café", page_id="p1"), tx(3, 1500.0, "Nómina", "Revolut")])
+        store.append([tx(5, -2.5, "Café")])
+
+        reopened = HistoryStore.open_existing(self.path)
+        self.assertEqual(reopened.rows, 3)
+        self.assertEqual(self.descriptions(reopened), ["Café", "Nómina", "Café"])
+        rows = reopened.range(date(2024, 1, 2), date(2024, 1, 5)).to_transactions()
+        self.assertEqual([(t.account, t.amount) for t in rows], [("Revolut", 1500.0), ("BBVA", -2.5)])
+        self.assertEqual(reopened.range().to_transactions()[0].page_id, "p1")
+
+    def test_older_rows_are_merged_in_date_order(self):
+        store = HistoryStore(self.path)
+        store.append([tx(10, -1.0, "b"), tx(20, -1.0, "d")])
+        store.append([tx(5, -1.0, "a"), tx(15, -1.0, "c")])
+
+        self.assertEqual(self.descriptions(HistoryStore(self.path)), ["a", "b", "c", "d"])
+        # The rewrite committed a new generation and removed the old column files
+        self.assertEqual(sorted(f for f in os.listdir(self.path) if f.startswith("days")), ["days.1.bin"])
+
+    def test_two_instances_do_not_lose_rows(self):
+        first = HistoryStore(self.path)
+        first.append([tx(1, -1.0, "inicial")])
+        second = HistoryStore(self.path)
+
+        first.append([tx(2, -1.0, "de A")])
+        second.append([tx(3, -1.0, "de B")])
+        first.append([tx(1, -1.0, "antigua de A")])  # Merge rewrite from a stale instance
+
+        self.assertEqual(sorted(self.descriptions(HistoryStore(self.path))),
+                         sorted(["inicial", "antigua de A", "de A", "de B"]))
+
+    def test_interrupted_rewrite_keeps_the_committed_store(self):
+        store = HistoryStore(self.path)
+        store.append([tx(10, -1.0, "b")])
+        # Column files of an uncommitted generation are ignored
+        with open(os.path.join(self.path, "days.1.bin"), "wb") as f:
+            f.write(b"\x00" * 12)
+        with open(os.path.join(self.path, "meta.json"), encoding="utf-8") as f:
+            self.assertEqual(json.load(f).get("generation", 0), 0)
+        self.assertEqual(self.descriptions(HistoryStore(self.path)), ["b"])
+
+    def test_mark_transfers(self):
+        store = HistoryStore(self.path)
+        store.append([tx(1, -50.0, "A Revolut", page_id="p1"), tx(1, 50.0, "Desde BBVA", "Revolut", "p2")])
+        HistoryStore(self.path).mark_transfers(["p1"])
+        flags = [t.is_transfer for t in HistoryStore(self.path).range().to_transactions()]
+        self.assertEqual(flags, [True, False])
+
+        HistoryStore(self.path).mark_transfers(["p1"], transfer=False)
+        self.assertFalse(any(t.is_transfer for t in HistoryStore(self.path).range().to_transactions()))
+
+    def test_remove_run(self):
+        store = HistoryStore(self.path)
+        store.append([tx(1, -1.0, "antigua")])
+        store.append([tx(2, -1.0, "a"), tx(4, -1.0, "b")], run_id="run-1")
+        store.append([tx(3, -1.0, "c")], run_id="run-2")
+
+        self.assertEqual(HistoryStore(self.path).remove_run("run-1"), 2)
+        self.assertEqual(HistoryStore(self.path).remove_run("otra"), 0)
+        self.assertEqual(self.descriptions(HistoryStore(self.path)), ["antigua", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
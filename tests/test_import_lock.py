@@ -0,0 +1,88 @@
+import unittest
+import tempfile
+import threading
+import time
+from datetime import date
+import os
+import sys
+from unittest import mock
+
+# Add repo root
+sys.path.append(os.getcwd())
+
+from src.services import import_lock
+from src.services.import_lock import ImportLease, ImportLockTimeout
+
+
+class TestImportLease(unittest.TestCase):
+    def setUp(self):
+        self.lock_dir = tempfile.mkdtemp()
+
+    def lease(self, account, start_day, end_day, **kwargs):
+        return ImportLease(account, date(2024, 1, start_day), date(2024, 1, end_day), self.lock_dir, **kwargs)
+
+    def test_overlapping_range_waits(self):
+        with self.lease("BBVA", 1, 10):
+            with self.assertRaises(ImportLockTimeout):
+                self.lease("BBVA", 10, 20, timeout=0.3).acquire()
+
+    def test_other_account_or_range_runs_in_parallel(self):
+        with self.lease("BBVA", 1, 10):
+            with self.lease("BBVA", 11, 20, timeout=0.3), self.lease("Revolut", 1, 10, timeout=0.3):
+                pass
+
+    def test_released_lease_unblocks_waiter(self):
+        first = self.lease("BBVA", 1, 10)
+        first.acquire()
+        timer = threading.Timer(0.2, first.release)
+        timer.start()
+        with self.lease("BBVA", 5, 6, timeout=5):
+            pass
+        timer.join()
+
+    def test_expired_lease_is_ignored(self):
+        stale = self.lease("BBVA", 1, 10, ttl=0.1)
+        stale.dir.mkdir(parents=True)
+        stale._write()  # written but never renewed, as after a crash
+        time.sleep(0.2)
+        with self.lease("BBVA", 1, 10, timeout=0.5):
+            pass
+
+    def make_mutex(self, lease, age):
+        lease.dir.mkdir(parents=True, exist_ok=True)
+        mutex = lease.dir / ".mutex"
+        mutex.touch()
+        past = time.time() - age
+        os.utime(mutex, (past, past))
+        return mutex
+
+    def test_stale_mutex_is_broken(self):
+        lease = self.lease("BBVA", 1, 10, timeout=0.5)
+        self.make_mutex(lease, ImportLease.MUTEX_STALE_SECONDS + 10)
+        with lease:
+            pass
+        self.assertEqual(os.listdir(lease.dir), [])
+
+        self.make_mutex(lease, 0)
+        with self.assertRaises(ImportLockTimeout):
+            lease.acquire()
+        self.assertTrue((lease.dir / ".mutex").exists())
+
+    def test_mutex_recreated_before_the_break_is_kept(self):
+        lease = self.lease("BBVA", 1, 10)
+        mutex = self.make_mutex(lease, ImportLease.MUTEX_STALE_SECONDS + 10)
+        rename = os.rename
+
+        def rename_after_new_owner(src, dst):
+            # Another waiter broke the stale mutex and took a fresh one meanwhile
+            os.unlink(src)
+            mutex.touch()
+            rename(src, dst)
+
+        with mock.patch.object(import_lock.os, "rename", side_effect=rename_after_new_owner):
+            self.assertFalse(lease._break_stale_mutex(mutex))
+        self.assertEqual(os.listdir(lease.dir), [".mutex"])
+
+
+if __name__ == '__main__':
+    unittest.main()
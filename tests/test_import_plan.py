@@ -0,0 +1,181 @@
+import unittest
+import tempfile
+from datetime import date
+import os
+import sys
+
+import pandas as pd
+
+# Add repo root
+sys.path.append(os.getcwd())
+
+from src.core.interfaces import BankParserStrategy
+from src.core.models import Transaction
+from src.services.fingerprints import assign_fingerprints
+from src.services.import_lock import ImportCoordinator
+from src.services.import_runs import ImportRunLog
+from src.services.notion_service import FINGERPRINT_PROPERTY, RUN_PROPERTY
+from src.services.processor import TransactionProcessor, ImportPlan
+from src.services.reporting import RollupStore
+
+
+class FakeParser(BankParserStrategy):
+    def __init__(self, transactions, errors=()):
+        self.transactions = transactions
+        self.errors = list(errors)
+
+    def parse(self, file_path):
+        return [Transaction(t.date, t.description, t.amount, t.account) for t in self.transactions], self.errors
+
+
+class FakeNotion:
+    """Records writes; stored pages are looked up by fingerprint."""
+    def __init__(self, stored=()):
+        self.schema = {"Nombre": {"type": "title"}, FINGERPRINT_PROPERTY: {"type": "rich_text"}}
+        self.stored = {t.fingerprint for t in stored}
+        self.created = []
+        self.schema_writes = 0
+        self.transfer_candidates = []
+        self.marked = []
+
+    def get_database_schema(self):
+        return self.schema
+
+    def ensure_text_properties(self, names):
+        self.schema_writes += 1
+        self.schema.update({name: {"type": "rich_text"} for name in names})
+
+    def find_existing_fingerprints(self, fingerprints):
+        return self.stored & set(fingerprints)
+
+    def get_transactions_in_range(self, start, end, legacy_only=False, account=None):
+        return []
+
+    def create_transaction(self, tx, run_id=None):
+        self.created.append(tx)
+        self.stored.add(tx.fingerprint)
+        return True
+
+    def get_transfer_candidates(self, amounts, start, end):
+        return self.transfer_candidates
+
+    def mark_as_transfer(self, tx):
+        self.marked.append(tx.page_id)
+        return True
+
+
+def rows():
+    return [
+        Transaction(date(2024, 1, 1), "Mercadona", -30.0, "BBVA"),
+        Transaction(date(2024, 1, 2), "Nómina", 1500.0, "BBVA"),
+        Transaction(date(2024, 1, 3), "Cafetería", -2.5, "BBVA"),
+    ]
+
+
+class TestImportPlan(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tmp = tempfile.mkdtemp()
+        stored = rows()[:1]
+        assign_fingerprints(stored)
+        self.notion = FakeNotion(stored)
+        self.processor = TransactionProcessor(
+            self.notion, ImportRunLog(os.path.join(tmp, "runs.jsonl")), match_transfers=False,
+            coordinator=ImportCoordinator(lock_dir=tmp),
+        )
+        self.processor.categorization_rules = pd.DataFrame([
+            {"Concepto_Contiene": "Caf", "Concepto_Exacto": "", "Subcategoria_UUID": "cafe", "Prioridad": 0},
+        ])
+        self.processor.suggester = None
+        self.processor.rollups = None
+        self.processor.history = None
+
+    def test_plan_writes_nothing(self):
+        plan = self.processor.plan_file("extracto.csv", FakeParser(rows(), ["Fila 5: Error"]))
+
+        self.assertEqual([t.description for t in plan.duplicates], ["Mercadona"])
+        self.assertEqual([t.description for t in plan.new], ["Nómina", "Cafetería"])
+        self.assertEqual([t.subcategory for t in plan.new], [None, "cafe"])
+        self.assertEqual(plan.errors, ["Fila 5: Error"])
+        statuses = plan.statuses()
+        self.assertEqual([statuses[id(t)] for t in plan.transactions],
+                         [ImportPlan.DUPLICATE, ImportPlan.NEW, ImportPlan.NEW])
+        self.assertEqual(self.notion.created, [])
+        self.assertEqual(self.notion.schema_writes, 0)
+
+    def test_plan_without_fingerprint_property_skips_lookup(self):
+        del self.notion.schema[FINGERPRINT_PROPERTY]
+        self.notion.find_existing_fingerprints = None  # Must not be called
+        plan = self.processor.plan_file("extracto.csv", FakeParser(rows()))
+        self.assertEqual(len(plan.new), 3)
+
+    def test_execute_inserts_the_plan(self):
+        plan = self.processor.plan_file("extracto.csv", FakeParser(rows()))
+        result = self.processor.execute(plan)
+
+        self.assertEqual(result.successful_inserts, 2)
+        self.assertEqual(result.duplicates, 1)
+        self.assertIn(RUN_PROPERTY, self.notion.schema)
+
+    def test_execute_skips_rows_inserted_since_the_plan(self):
+        plan = self.processor.plan_file("extracto.csv", FakeParser(rows()))
+        # Another import stores the same statement before the user confirms
+        self.processor.execute(self.processor.plan_file("extracto.csv", FakeParser(rows())))
+        self.notion.created.clear()
+
+        result = self.processor.execute(plan)
+        self.assertEqual(result.successful_inserts, 0)
+        self.assertEqual(result.duplicates, 3)
+        self.assertEqual(self.notion.created, [])
+
+    def test_stored_transfer_needs_a_unique_counterpart(self):
+        self.processor.match_transfers = True
+        move = Transaction(date(2024, 1, 2), "A Revolut", 50.0, "BBVA")
+        unique = Transaction(date(2024, 1, 2), "Desde BBVA", -50.0, "Revolut", page_id="p1")
+        self.notion.transfer_candidates = [unique]
+
+        result = self.processor.process_file("extracto.csv", FakeParser([move]))
+        self.assertEqual(self.notion.marked, ["p1"])
+        self.assertEqual(result.transfers, 1)
+        self.assertEqual([(t.page_id, t.amount) for t in result.marked_transfers], [("p1", -50.0)])
+        with open(self.processor.run_log.path, encoding="utf-8") as f:
+            self.assertIn('"transfers_marked": [{"page_id": "p1", "amount": -50.0}]', f.read())
+
+    def test_stored_transfer_moves_in_the_rollups(self):
+        self.processor.match_transfers = True
+        stored = Transaction(date(2024, 1, 2), "Desde BBVA", -50.0, "Revolut", page_id="p1")
+        self.notion.transfer_candidates = [stored]
+        rollups = RollupStore(os.path.join(self.tmp, "rollups.csv"))
+        rollups.add_transactions([stored])
+        rollups.save()
+        self.processor.rollups = rollups
+
+        def totals():
+            by_account = RollupStore.load(rollups.path).summary("cuenta").set_index("Cuenta")
+            return {account: tuple(row) for account, row in
+                    by_account[["Gasto", "Ingreso", "Transferencias", "Movimientos"]].iterrows()}
+
+        result = self.processor.process_file(
+            "extracto.csv", FakeParser([Transaction(date(2024, 1, 2), "A Revolut", 50.0, "BBVA")]))
+        self.assertEqual(totals(), {"BBVA": (0.0, 0.0, 50.0, 1), "Revolut": (0.0, 0.0, -50.0, 1)})
+
+        # Rolling the import back restores the stored side as an expense
+        store = RollupStore.load(rollups.path)
+        self.assertTrue(store.remove_run(result.run_id))
+        store.save()
+        self.assertEqual(totals(), {"Revolut": (50.0, 0.0, 0.0, 1)})
+
+    def test_ambiguous_stored_transfer_is_left_alone(self):
+        self.processor.match_transfers = True
+        move = Transaction(date(2024, 1, 5), "Alquiler", 50.0, "BBVA")
+        self.notion.transfer_candidates = [
+            Transaction(date(2024, 1, 4), "Cena", -50.0, "Revolut", page_id="p1"),
+            Transaction(date(2024, 1, 6), "Regalo", -50.0, "Laboral Kutxa", page_id="p2"),
+        ]
+
+        plan = self.processor.plan_file("extracto.csv", FakeParser([move]))
+        self.assertEqual(plan.stored_transfers, [])
+        self.assertFalse(plan.new[0].is_transfer)
+
+
+if __name__ == "__main__":
+    unittest.main()
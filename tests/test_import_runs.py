@@ -0,0 +1,124 @@
+import unittest
+import tempfile
+import threading
+from datetime import date
+import os
+import sys
+
+# Add repo root
+sys.path.append(os.getcwd())
+
+from src.core.models import Transaction
+from src.services.history_store import HistoryStore
+from src.services.import_runs import ImportRunLog, rollback_run
+from src.services.processor import ProcessorResult
+from src.services.reporting import RollupStore
+
+
+class FakeNotion:
+    def __init__(self, pages_by_run, failing=()):
+        self.pages_by_run = pages_by_run
+        self.failing = set(failing)
+        self.archived = []
+        self.restored = {}
+        self._lock = threading.Lock()
+
+    def find_pages_by_run(self, run_id):
+        return list(self.pages_by_run.get(run_id, []))
+
+    def archive_page(self, page_id):
+        if page_id in self.failing:
+            return False
+        with self._lock:
+            self.archived.append(page_id)
+        return True
+
+    def restore_amount(self, page_id, amount):
+        with self._lock:
+            self.restored[page_id] = amount
+        return True
+
+
+def result(inserted, marked=()):
+    r = ProcessorResult()
+    r.total_read = inserted
+    r.successful_inserts = inserted
+    r.marked_transfers = list(marked)
+    return r
+
+
+def tx(day, amount, description, page_id=None):
+    return Transaction(date(2024, 1, day), description, amount, "BBVA", page_id=page_id)
+
+
+class TestImportRunLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.log = ImportRunLog(os.path.join(self.tmp, "logs", "import_runs.jsonl"))
+
+    def test_list_runs_and_rollbacks(self):
+        self.assertEqual(self.log.list_runs(), [])
+        self.assertIsNone(self.log.last_run())
+
+        self.log.record_run("r1", "a.xlsx", "BBVA", result(2))
+        self.log.record_run("r2", "b.csv", "Revolut", result(1))
+        self.log.record_run("r3", "c.csv", "Revolut", result(0))
+        self.assertEqual([r["run_id"] for r in self.log.list_runs()], ["r1", "r2", "r3"])
+        # Runs that inserted nothing are not offered for rollback
+        self.assertEqual(self.log.last_run()["run_id"], "r2")
+
+        self.log.record_rollback("r2", archived=0, failed=1)
+        self.assertFalse(self.log.get_run("r2")["rolled_back"])
+        self.log.record_rollback("r2", archived=1, failed=0)
+        self.assertTrue(self.log.get_run("r2")["rolled_back"])
+        self.assertEqual(self.log.last_run()["run_id"], "r1")
+        self.assertIsNone(self.log.get_run("otra"))
+
+
+class TestRollbackRun(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.log = ImportRunLog(os.path.join(self.tmp, "import_runs.jsonl"))
+        self.lock_dir = os.path.join(self.tmp, "locks")
+
+        self.history = HistoryStore(os.path.join(self.tmp, "history"))
+        self.history.append([tx(1, -50.0, "Traspaso", page_id="old")], run_id="r0")
+        self.history.mark_transfers(["old"])
+        self.history.append([tx(1, 50.0, "Desde BBVA", page_id="p1"), tx(2, -3.0, "Café", page_id="p2")],
+                            run_id="r1")
+        self.rollups = RollupStore(os.path.join(self.tmp, "rollups.csv"))
+        self.rollups.add_transactions([tx(1, -50.0, "Traspaso")], run_id="r0")
+        self.rollups.add_transactions([tx(2, -3.0, "Café")], run_id="r1")
+        self.rollups.save()
+
+        self.log.record_run("r1", "a.xlsx", "BBVA", result(2, [tx(1, -50.0, "Traspaso", page_id="old")]))
+
+    def rollback(self, notion):
+        return rollback_run(notion, "r1", self.log, history=HistoryStore.open_existing(self.history.path),
+                            rollups=RollupStore.load(self.rollups.path), lock_dir=self.lock_dir)
+
+    def test_archives_pages_and_restores_marked_transfers(self):
+        notion = FakeNotion({"r1": ["p1", "p2"]})
+        outcome = self.rollback(notion)
+
+        self.assertEqual(sorted(notion.archived), ["p1", "p2"])
+        self.assertEqual(notion.restored, {"old": -50.0})
+        self.assertEqual((outcome.succeeded, outcome.failed), (3, []))
+        self.assertTrue(self.log.get_run("r1")["rolled_back"])
+
+        rows = HistoryStore(self.history.path).range().to_transactions()
+        self.assertEqual([(t.page_id, t.is_transfer) for t in rows], [("old", False)])
+        self.assertEqual(RollupStore.load(self.rollups.path).summary("mes")["Gasto"].sum(), 50.0)
+
+    def test_failed_archive_keeps_local_data(self):
+        notion = FakeNotion({"r1": ["p1", "p2"]}, failing=["p2"])
+        outcome = self.rollback(notion)
+
+        self.assertEqual(len(outcome.failed), 1)
+        self.assertFalse(self.log.get_run("r1")["rolled_back"])
+        self.assertEqual(HistoryStore(self.history.path).rows, 3)
+        self.assertEqual(RollupStore.load(self.rollups.path).summary("mes")["Gasto"].sum(), 53.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
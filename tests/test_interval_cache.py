@@ -0,0 +1,74 @@
+import unittest
+from unittest.mock import MagicMock
+from datetime import date
+import os
+import sys
+
+# Add repo root
+sys.path.append(os.getcwd())
+
+from src.core.models import Transaction
+from src.services.interval_cache import IntervalCache
+from src.services.notion_service import NotionClient
+
+
+def tx(day, account="BBVA", **kwargs):
+    return Transaction(date=date(2024, 1, day), description="x", amount=-1.0, account=account, **kwargs)
+
+
+class TestIntervalCache(unittest.TestCase):
+    def test_missing_returns_only_gaps(self):
+        cache = IntervalCache()
+        cache.add_range("k", date(2024, 1, 5), date(2024, 1, 10), [])
+        cache.add_range("k", date(2024, 1, 15), date(2024, 1, 20), [])
+
+        self.assertEqual(cache.missing("k", date(2024, 1, 1), date(2024, 1, 25)), [
+            (date(2024, 1, 1), date(2024, 1, 4)),
+            (date(2024, 1, 11), date(2024, 1, 14)),
+            (date(2024, 1, 21), date(2024, 1, 25)),
+        ])
+        self.assertEqual(cache.missing("k", date(2024, 1, 6), date(2024, 1, 9)), [])
+        self.assertEqual(cache.missing("other", date(2024, 1, 6), date(2024, 1, 6)),
+                         [(date(2024, 1, 6), date(2024, 1, 6))])
+
+    def test_adjacent_ranges_are_merged(self):
+        cache = IntervalCache()
+        cache.add_range("k", date(2024, 1, 1), date(2024, 1, 3), [tx(2)])
+        cache.add_range("k", date(2024, 1, 4), date(2024, 1, 6), [tx(5)])
+
+        self.assertEqual(cache.missing("k", date(2024, 1, 1), date(2024, 1, 6)), [])
+        self.assertEqual(len(cache.get("k", date(2024, 1, 1), date(2024, 1, 6))), 2)
+
+
+class TestNotionRangeCache(unittest.TestCase):
+    def setUp(self):
+        self.client = NotionClient(token="t", database_id="db")
+        self.client._query_transactions_in_range = MagicMock(return_value=[])
+
+    def test_overlapping_queries_fetch_only_gaps(self):
+        self.client.get_transactions_in_range(date(2024, 1, 1), date(2024, 1, 10))
+        self.client.get_transactions_in_range(date(2024, 1, 5), date(2024, 1, 20))
+
+        calls = [c.args[:2] for c in self.client._query_transactions_in_range.call_args_list]
+        self.assertEqual(calls, [
+            (date(2024, 1, 1), date(2024, 1, 10)),
+            (date(2024, 1, 11), date(2024, 1, 20)),
+        ])
+
+    def test_own_inserts_are_fed_back(self):
+        self.client.get_transactions_in_range(date(2024, 1, 1), date(2024, 1, 10), account="BBVA")
+        self.client._request = MagicMock()
+        self.client._request.return_value.json.return_value = {"id": "page-1"}
+
+        self.client.create_transaction(tx(3, fingerprint="BBVA|2024-01-03|-100|0"))
+        self.client.create_transaction(tx(4, account="Revolut"))
+
+        cached = self.client.get_transactions_in_range(date(2024, 1, 1), date(2024, 1, 10), account="BBVA")
+        self.assertEqual([t.page_id for t in cached], ["page-1"])
+        self.assertEqual(self.client._query_transactions_in_range.call_count, 1)
+        self.assertEqual(self.client.find_existing_fingerprints(["BBVA|2024-01-03|-100|0"]),
+                         {"BBVA|2024-01-03|-100|0"})
+
+
+if __name__ == '__main__':
+    unittest.main()
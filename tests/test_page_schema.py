@@ -0,0 +1,79 @@
+import json
+import os
+import sys
+import unittest
+from datetime import date
+
+# Add repo root
+sys.path.append(os.getcwd())
+
+from src.services.page_schema import PageFlattener
+
+
+def page(page_id, **props):
+    return {"id": page_id, "url": f"https://notion.so/{page_id}", "properties": props}
+
+
+SCHEMA = {
+    "Nombre": {"type": "title"},
+    "Fecha": {"type": "date"},
+    "Cuenta": {"type": "select"},
+    "Gasto": {"type": "number"},
+    "Ingreso": {"type": "number"},
+    "Transferencias": {"type": "number"},
+    "Proyecto/Viaje": {"type": "relation"},
+    "Huella": {"type": "rich_text"},
+}
+
+
+class TestPageFlattener(unittest.TestCase):
+    def test_flatten_columns(self):
+        pages = [
+            page("a",
+                 Nombre={"title": [{"plain_text": "Café"}]},
+                 Fecha={"date": {"start": "2024-01-02"}},
+                 Cuenta={"select": {"name": "BBVA"}},
+                 Gasto={"number": 1.5},
+                 **{"Proyecto/Viaje": {"relation": [{"id": "p1"}, {"id": "p2"}]}}),
+            # Nulls and a missing property: falls back to the safe readers
+            page("b", Nombre={"title": []}, Fecha={"date": None}, Cuenta={"select": None}),
+        ]
+        columns = PageFlattener(SCHEMA).flatten(pages, {"p1": "Roma", "p2": "Lisboa"})
+
+        self.assertEqual(columns["Nombre"], ["Café", None])
+        self.assertEqual(columns["Fecha"], ["2024-01-02", None])
+        self.assertEqual(columns["Cuenta"], ["BBVA", None])
+        self.assertEqual(columns["Gasto"], [1.5, None])
+        self.assertEqual(columns["Proyecto/Viaje"], ["Roma, Lisboa", None])
+        # Not in the schema: empty column
+        self.assertEqual(columns["Categoría"], [None, None])
+        self.assertEqual(columns["id"], ["a", "b"])
+
+    def test_transactions(self):
+        pages = [
+            page("a", Fecha={"date": {"start": "2024-01-02T10:00:00.000+01:00"}}, Gasto={"number": 3},
+                 Huella={"rich_text": [{"plain_text": "BBVA|2024-01-02|-300|0"}]}),
+            page("b", Fecha={"date": {"start": "2024-01-03"}}, Transferencias={"number": -20},
+                 Cuenta={"select": {"name": "Revolut"}}),
+            page("c", Fecha={"date": None}),
+        ]
+        transactions = PageFlattener(SCHEMA).transactions(pages, "Huella")
+
+        self.assertEqual(len(transactions), 2)
+        first, second = transactions
+        self.assertEqual((first.date, first.amount, first.account, first.description),
+                         (date(2024, 1, 2), -3.0, "Unknown", "Sin Nombre"))
+        self.assertEqual(first.fingerprint, "BBVA|2024-01-02|-300|0")
+        self.assertEqual((second.amount, second.is_transfer, second.page_id), (-20.0, True, "b"))
+
+    def test_schema_from_sample_page(self):
+        with open("ejemplo_record_notion.json", encoding="utf-8") as f:
+            pages = json.load(f)
+        flattener = PageFlattener.from_pages(pages)
+        self.assertEqual(flattener.types["Gasto"], "number")
+        columns = flattener.flatten(pages)
+        self.assertEqual(len(columns["Nombre"]), len(pages))
+
+
+if __name__ == "__main__":
+    unittest.main()
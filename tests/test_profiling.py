@@ -0,0 +1,68 @@
+import os
+import sys
+import tempfile
+import threading
+import tracemalloc
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+# Add repo root
+sys.path.append(os.getcwd())
+
+from src.services import profiling
+
+
+def work(n):
+    return sum(range(n))
+
+
+class TestProfiled(unittest.TestCase):
+    def test_disabled_returns_function_untouched(self):
+        with mock.patch.dict(os.environ, {profiling.PROFILE_ENV: ""}):
+            self.assertIs(profiling.profiled(work), work)
+
+    def test_enabled_writes_report(self):
+        with mock.patch.dict(os.environ, {profiling.PROFILE_ENV: "1"}):
+            wrapped = profiling.profiled(work)
+        self.assertIsNot(wrapped, work)
+
+        with mock.patch.object(profiling, "write_report") as write_report:
+            self.assertEqual(wrapped(10), 45)
+        write_report.assert_called_once()
+        self.assertEqual(write_report.call_args.args[0], "work")
+
+    def test_concurrent_calls_profile_one_at_a_time(self):
+        inside = threading.Barrier(2)
+
+        def wait(n):
+            inside.wait(timeout=5)
+            return work(n)
+
+        with mock.patch.dict(os.environ, {profiling.PROFILE_ENV: "1"}):
+            wrapped = profiling.profiled(wait)
+
+        with mock.patch.object(profiling, "write_report") as write_report:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                results = list(executor.map(wrapped, [10, 5]))
+        self.assertEqual(results, [45, 10])
+        profilers = [call.args[2] for call in write_report.call_args_list]
+        self.assertEqual(len(profilers), 2)
+        self.assertEqual(sum(p is None for p in profilers), 1)
+
+    def test_report_without_profiler(self):
+        tracemalloc.start()
+        try:
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        with tempfile.TemporaryDirectory() as tmp:
+            report = profiling.write_report("work", datetime.now(), None, snapshot, snapshot, 0, out_dir=Path(tmp))
+            self.assertIn("otro perfil activo", report.read_text(encoding="utf-8"))
+            self.assertEqual([p.suffix for p in Path(tmp).iterdir()], [".txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import os
+import sys
+
+import pandas as pd
+
+# Add repo root
+sys.path.append(os.getcwd())
+
+from src.services.page_schema import PageFlattener
+from src.services.recategorizer import Recategorizer
+
+
+def page(page_id, name, subcategory=None):
+    return {"id": page_id, "properties": {
+        "Nombre": {"type": "title", "title": [{"plain_text": name}] if name else []},
+        "Subcategoría": {"type": "relation", "relation": [{"id": subcategory}] if subcategory else []},
+        "Script": {"type": "checkbox", "checkbox": True},
+    }}
+
+
+class FakeNotion:
+    def __init__(self, batches):
+        self.batches = batches
+        self.filters = []
+        self.updates = []
+
+    def iter_page_batches(self, filter=None):
+        self.filters.append(filter)
+        yield from self.batches
+
+    def page_flattener(self, sample_pages=None):
+        return PageFlattener.from_pages(sample_pages or [])
+
+    def update_page(self, page_id, properties):
+        self.updates.append((page_id, properties))
+        return True
+
+
+class TestRecategorizer(unittest.TestCase):
+    def setUp(self):
+        self.rules = pd.DataFrame([
+            {"Concepto_Contiene": "", "Concepto_Exacto": "UBER TRIP", "Subcategoria_UUID": "aaaa1111", "Prioridad": 2},
+            {"Concepto_Contiene": "UBER", "Concepto_Exacto": "", "Subcategoria_UUID": "bbbb2222", "Prioridad": 1},
+        ])
+        self.notion = FakeNotion([
+            [
+                page("p1", "UBER EATS", subcategory="old-sub"),   # Changed
+                page("p2", "UBER TRIP", subcategory="aaaa-1111"),  # Same id, dashed
+                page("p3", "Mercadona", subcategory="manual-sub"),  # No rule: kept
+            ],
+            [],
+            [
+                page("p4", "UBER EATS"),  # Uncategorized and matched
+                page("p5", "Mercadona"),  # Uncategorized and not matched
+                page("p6", None),
+            ],
+        ])
+
+    def test_plan(self):
+        plan = Recategorizer(self.notion, self.rules).plan()
+
+        self.assertEqual(plan.scanned, 6)
+        self.assertEqual([(c.page_id, c.description, c.old_subcategory, c.new_subcategory) for c in plan.changes], [
+            ("p1", "UBER EATS", "old-sub", "bbbb2222"),
+            ("p4", "UBER EATS", None, "bbbb2222"),
+        ])
+        self.assertEqual(self.notion.filters, [{"property": "Script", "checkbox": {"equals": True}}])
+        self.assertEqual(self.notion.updates, [])
+
+    def test_apply_sends_the_planned_updates(self):
+        recategorizer = Recategorizer(self.notion, self.rules)
+        plan = recategorizer.plan(only_script=False)
+        result = recategorizer.apply(plan, max_workers=2)
+
+        self.assertEqual(self.notion.filters, [None])
+        self.assertEqual((result.succeeded, result.failed), (2, []))
+        self.assertEqual(sorted(self.notion.updates), [
+            ("p1", {"Subcategoría": {"relation": [{"id": "bbbb2222"}]}}),
+            ("p4", {"Subcategoría": {"relation": [{"id": "bbbb2222"}]}}),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import tempfile
+from datetime import date
+import os
+import sys
+
+# Add repo root
+sys.path.append(os.getcwd())
+
+from src.core.models import Transaction
+from src.services.reporting import RollupStore
+
+
+def tx(month, amount, account="BBVA", subcategory=None, is_transfer=False):
+    return Transaction(date(2024, month, 1), "x", amount, account, subcategory=subcategory, is_transfer=is_transfer)
+
+
+class TestRollupStore(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "rollups.csv")
+
+    def new_store(self):
+        store = RollupStore(self.path)
+        store.category_map = {"sub1": "Comida"}
+        store.save()
+        return store
+
+    def test_add_save_load(self):
+        store = self.new_store()
+        store.add_transactions([tx(1, -10.0, subcategory="SUB-1"), tx(1, -5.0), tx(2, 100.0),
+                                tx(2, -50.0, is_transfer=True)])
+        store.save()
+
+        loaded = RollupStore.load(self.path)
+        by_category = loaded.summary("categoria").set_index("Categoría")
+        self.assertEqual(by_category.loc["Comida", "Gasto"], 10.0)
+        self.assertEqual(by_category.loc["Sin categoría", "Gasto"], 5.0)
+        by_month = loaded.summary("mes").set_index("Mes")
+        self.assertEqual(by_month.loc["2024-02", "Ingreso"], 100.0)
+        self.assertEqual(by_month.loc["2024-02", "Transferencias"], -50.0)
+        self.assertEqual(int(by_month["Movimientos"].sum()), 4)
+
+    def test_missing_file(self):
+        self.assertIsNone(RollupStore.load(self.path))
+
+    def test_two_instances_keep_both_imports(self):
+        self.new_store()
+        first = RollupStore.load(self.path)
+        second = RollupStore.load(self.path)
+
+        for store, amount in ((first, -10.0), (second, -20.0)):
+            store.reload()
+            store.add_transactions([tx(1, amount)])
+            store.save()
+
+        self.assertEqual(RollupStore.load(self.path).summary("mes")["Gasto"].sum(), 30.0)
+
+    def test_remove_run(self):
+        store = self.new_store()
+        store.add_transactions([tx(1, -10.0)], run_id="run-1")
+        store.add_transactions([tx(1, -20.0), tx(2, -5.0)], run_id="run-2")
+        store.save()
+
+        other = RollupStore.load(self.path)
+        self.assertTrue(other.remove_run("run-2"))
+        self.assertFalse(other.remove_run("otra"))
+        other.save()
+
+        by_month = RollupStore.load(self.path).summary("mes").set_index("Mes")
+        self.assertEqual(list(by_month.index), ["2024-01"])
+        self.assertEqual(by_month.loc["2024-01", "Gasto"], 10.0)
+        # Only run-1 can still be removed
+        self.assertFalse(RollupStore.load(self.path).remove_run("run-2"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add repo root
+sys.path.append(os.getcwd())
+
+from src.services.suggestions import CategorySuggester
+
+
+class TestCategorySuggester(unittest.TestCase):
+    def setUp(self):
+        shops = ["MERCADONA", "CARREFOUR", "REPSOL", "IBERDROLA", "NETFLIX", "RENFE"]
+        descriptions = [f"Pago {shop} tienda {i}" for shop in shops for i in range(20)]
+        labels = [f"sub-{shop}" for shop in shops for _ in range(20)]
+        self.suggester = CategorySuggester.build(descriptions, labels)
+        self.queries = [f"Pago {shop} tienda {i}" for shop in shops for i in range(20, 40)]
+
+    def test_best(self):
+        self.assertEqual(self.suggester.best(["Pago MERCADONA tienda 99"], 0.5), ["sub-MERCADONA"])
+        self.assertEqual(self.suggester.best(["zzzz"]), [None])
+
+    def test_threads_share_one_suggester(self):
+        expected = self.suggester.best(self.queries, 0.0)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: self.suggester.best(self.queries, 0.0), range(16)))
+        self.assertTrue(all(r == expected for r in results))
+
+    def test_batches_do_not_change_results(self):
+        queries = self.queries + ["", "zzzz", "Pago RENFE"]
+        expected = [self.suggester.suggest([q])[0] for q in queries]
+        self.assertEqual(self.suggester.suggest(queries), expected)
+        self.assertEqual(self.suggester.suggest(queries, batch_size=7), expected)
+
+    def test_save_load_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "category_index.npz"
+            self.suggester.save(path)
+            loaded = CategorySuggester.load(path)
+        self.assertEqual(loaded.suggest(self.queries), self.suggester.suggest(self.queries))
+        self.assertIsNone(CategorySuggester.load(Path(tmp) / "category_index.npz"))
+
+
+if __name__ == "__main__":
+    unittest.main()
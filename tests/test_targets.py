@@ -0,0 +1,140 @@
+import unittest
+import tempfile
+import threading
+import json
+import os
+import sys
+from pathlib import Path
+from unittest import mock
+
+# Add repo root
+sys.path.append(os.getcwd())
+
+from src.main import main
+from src.services.processor import ProcessorResult
+from src.services.targets import ClientPool, NotionTarget, load_targets, ENV_TARGET_NAME
+
+
+class TestLoadTargets(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "destinos.json")
+
+    def write(self, data):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    def test_entries_with_token_from_environment(self):
+        self.write({"targets": [
+            {"name": "casa", "token_env": "TOKEN_CASA", "database_id": "db1"},
+            {"name": "piso", "token": "secret_2", "database_id": "db2", "state_dir": "otro"},
+        ]})
+        with mock.patch.dict(os.environ, {"TOKEN_CASA": "secret_1"}):
+            casa, piso = load_targets(self.path)
+
+        self.assertEqual(casa.token, "secret_1")
+        self.assertEqual(casa.state_dir, Path("targets") / "casa")
+        self.assertEqual(piso.state_dir, Path("otro"))
+
+    def test_missing_token_and_repeated_names_fail(self):
+        self.write([{"name": "casa", "token_env": "NO_EXISTE", "database_id": "db1"}])
+        with self.assertRaises(ValueError):
+            load_targets(self.path)
+
+        self.write([{"name": "casa", "token": "t", "database_id": "db1"},
+                    {"name": "casa", "token": "t", "database_id": "db2"}])
+        with self.assertRaises(ValueError):
+            load_targets(self.path)
+
+    def test_bad_file_fails_the_command(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("{no es json")
+        with mock.patch("builtins.print"):
+            self.assertEqual(main(["destinos", "listar", "--config", self.path]), 1)
+
+        self.write([{"name": "casa", "token": "t", "database_id": "db1"}])
+        with mock.patch("builtins.print"):
+            self.assertEqual(main(["destinos", "huellas", "--config", self.path, "--solo", "otro"]), 1)
+
+    def test_without_file_uses_environment(self):
+        env = {"NOTION_TOKEN": "secret", "NOTION_DATABASE_ID": "db"}
+        with mock.patch.dict(os.environ, env):
+            [target] = load_targets(os.path.join(self.tmp, "no_existe.json"))
+        self.assertEqual(target.name, ENV_TARGET_NAME)
+        self.assertIsNone(target.state_dir)
+
+
+class TestClientPool(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.pool = ClientPool([
+            NotionTarget("casa", "token_a", "db1", state_dir=Path(self.tmp) / "casa"),
+            NotionTarget("piso", "token_a", "db2", category_database_id="cat2", state_dir=Path(self.tmp) / "piso"),
+            NotionTarget("empresa", "token_b", "db3", state_dir=Path(self.tmp) / "empresa"),
+        ])
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_budget_and_session_per_token(self):
+        casa, piso, empresa = (self.pool.clients[name] for name in ("casa", "piso", "empresa"))
+        self.assertIs(casa.rate_limiter, piso.rate_limiter)
+        self.assertIs(casa.session, piso.session)
+        self.assertIsNot(casa.rate_limiter, empresa.rate_limiter)
+        self.assertIsNot(casa.session, empresa.session)
+        self.assertEqual(empresa.database_id, "db3")
+
+    def test_jobs_run_in_parallel_and_fail_alone(self):
+        # Every job waits for the other two: only possible if they run at the same time
+        barrier = threading.Barrier(3, timeout=5)
+
+        def job(name):
+            barrier.wait()
+            if name == "piso":
+                raise RuntimeError("sin acceso")
+            return True
+
+        result = self.pool.run_all(job)
+        self.assertEqual(result.failed, ["piso"])
+        self.assertTrue(result.results["casa"].ok)
+        self.assertIn("piso: Error: sin acceso", result.to_string())
+
+    def test_unknown_target_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.pool.run_all(lambda name: True, names=["otro"])
+
+    def test_processor_keeps_local_state_per_target(self):
+        processor = self.pool.processor("empresa")
+        self.assertIs(processor.notion, self.pool.clients["empresa"])
+        self.assertEqual(Path(processor.run_log.path), Path(self.tmp) / "empresa" / "import_runs.jsonl")
+        self.assertEqual(Path(processor.coordinator.lock_dir), Path(self.tmp) / "empresa" / "locks")
+        self.assertIs(self.pool.processor("empresa"), processor)
+
+    def test_import_only_selected_targets(self):
+        statement = os.path.join(self.tmp, "lk.csv")
+        with open(statement, "w", encoding="utf-8") as f:
+            f.write("Fecha valor;Concepto;Importe\n05/01/2024;Compra;-1,00\n")
+
+        with mock.patch.object(self.pool, "processor") as processor:
+            processor.return_value.process_file.return_value = ProcessorResult()
+            result = self.pool.import_files({"casa": [statement], "piso": [statement]}, names=["casa"])
+        self.assertEqual(list(result.results), ["casa"])
+        processor.assert_called_once_with("casa")
+
+        with self.assertRaises(ValueError):
+            self.pool.import_files({"casa": [statement]}, names=["otro"])
+
+    def test_category_export_uses_each_targets_database(self):
+        with mock.patch.object(self.pool, "exporter") as exporter:
+            exporter.return_value.export_categories_to_csv.return_value = True
+            result = self.pool.export_categories(self.tmp)
+            self.assertEqual(list(result.results), ["piso"])
+            exporter.return_value.export_categories_to_csv.assert_called_once_with(
+                os.path.join(self.tmp, "piso_subcategorias.csv"), "cat2")
+
+            result = self.pool.export_categories(self.tmp, names=["casa"])
+        self.assertEqual(result.failed, ["casa"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from datetime import date
+import os
+import sys
+
+# Add repo root
+sys.path.append(os.getcwd())
+
+from src.core.models import Transaction
+from src.services.transfers import match_transfers, counterpart_counts
+
+
+def tx(day, amount, account, **kwargs):
+    return Transaction(date=date(2024, 1, day), description=f"{account} {amount}",
+                       amount=amount, account=account, **kwargs)
+
+
+class TestMatchTransfers(unittest.TestCase):
+    def test_pairs_opposite_amounts_across_accounts(self):
+        out = tx(10, -200.0, "BBVA")
+        stored_in = tx(11, 200.0, "Revolut", page_id="p1")
+        same_account = tx(10, 200.0, "BBVA")
+        too_late = tx(20, 200.0, "Laboral Kutxa")
+
+        pairs = match_transfers([out, same_account], [stored_in, too_late])
+
+        self.assertEqual(pairs, [(out, stored_in)])
+
+    def test_each_movement_used_once_closest_first(self):
+        out = tx(10, -50.0, "BBVA")
+        far = tx(12, 50.0, "Revolut")
+        near = tx(10, 50.0, "Laboral Kutxa")
+
+        pairs = match_transfers([out], [far, near])
+
+        self.assertEqual(pairs, [(out, near)])
+
+    def test_stored_pairs_and_existing_transfers_are_ignored(self):
+        a = tx(10, -50.0, "BBVA")
+        b = tx(10, 50.0, "Revolut")
+        already = tx(10, 50.0, "Laboral Kutxa", is_transfer=True)
+
+        self.assertEqual(match_transfers([], [a, b]), [])
+        self.assertEqual(match_transfers([a], [already]), [])
+
+    def test_counterpart_counts(self):
+        out = tx(10, -50.0, "BBVA")
+        near = tx(10, 50.0, "Revolut")
+        other = tx(11, 50.0, "Laboral Kutxa")
+        rent = tx(10, -700.0, "BBVA")
+        landlord = tx(10, 700.0, "Revolut")
+
+        counts = counterpart_counts([out, rent], [near, other, landlord])
+
+        self.assertEqual(counts[id(out)], 2)
+        self.assertEqual(counts[id(near)], 1)
+        self.assertEqual((counts[id(rent)], counts[id(landlord)]), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import tempfile
+import os
+import sys
+
+# Add repo root
+sys.path.append(os.getcwd())
+
+from openpyxl import Workbook
+
+from src.extractors.bbva import BBVAParser
+from src.extractors.detection import detect_parser
+from src.extractors.laboral_kutxa import LaboralKutxaParser
+from src.extractors.revolut import RevolutParser
+from src.services.processor import ProcessorResult
+from src.services.watcher import FolderWatcher, STATE_FILE
+
+
+def write_xlsx(path, rows):
+    wb = Workbook()
+    for row in rows:
+        wb.active.append(row)
+    wb.save(path)
+
+
+class FakeProcessor:
+    def __init__(self, failures=()):
+        self.failures = list(failures)  # upload failures of each call, in order
+        self.calls = []
+
+    def process_file(self, file_path, parser):
+        self.calls.append((os.path.basename(file_path), type(parser).__name__))
+        failures = self.failures.pop(0) if self.failures else 0
+        if failures is None:
+            raise RuntimeError("sin conexión")
+        result = ProcessorResult()
+        result.total_read = result.successful_inserts = 1
+        result.upload_failures = failures
+        return result
+
+
+class TestDetection(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def path(self, name):
+        return os.path.join(self.tmp, name)
+
+    def test_csv_by_header(self):
+        with open(self.path("lk.csv"), "w", encoding="utf-8") as f:
+            f.write("Fecha valor;Concepto;Importe\n")
+        with open(self.path("revolut.csv"), "w", encoding="utf-8") as f:
+            f.write("Tipo,Fecha de inicio,Descripción,Importe,Comisión\n")
+        with open(self.path("otro.csv"), "w", encoding="utf-8") as f:
+            f.write("a,b,c\n")
+
+        self.assertIsInstance(detect_parser(self.path("lk.csv")), LaboralKutxaParser)
+        self.assertIsInstance(detect_parser(self.path("revolut.csv")), RevolutParser)
+        self.assertIsNone(detect_parser(self.path("otro.csv")))
+        self.assertIsNone(detect_parser(self.path("extracto.pdf")))
+
+    def test_spreadsheets_need_the_bbva_header(self):
+        write_xlsx(self.path("bbva.xlsx"), [["Últimos movimientos"], [], [],
+                                            ["F.Valor", "Fecha", "Concepto", "Importe", "Observaciones"]])
+        write_xlsx(self.path("presupuesto.xlsx"), [["Mes", "Gasto"], ["Enero", 100]])
+        with open(self.path("roto.xlsx"), "wb") as f:
+            f.write(b"no es un libro")
+
+        self.assertIsInstance(detect_parser(self.path("bbva.xlsx")), BBVAParser)
+        self.assertIsNone(detect_parser(self.path("presupuesto.xlsx")))
+        self.assertIsNone(detect_parser(self.path("roto.xlsx")))
+
+
+class TestFolderWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.file = os.path.join(self.tmp, "lk.csv")
+        with open(self.file, "w", encoding="utf-8") as f:
+            f.write("Fecha valor;Concepto;Importe\n05/01/2024;Compra;-1,00\n")
+
+    def watcher(self, processor, retry_seconds=300.0):
+        return FolderWatcher(self.tmp, processor, settle_seconds=0, retry_seconds=retry_seconds)
+
+    def poll(self, watcher):
+        # The first poll sees the file, the next one imports it once it has settled
+        watcher.poll_once()
+        return watcher.poll_once()
+
+    def test_imports_once_and_skips_unchanged_content(self):
+        processor = FakeProcessor()
+        self.assertEqual(self.poll(self.watcher(processor)), 1)
+        self.assertEqual(processor.calls, [("lk.csv", "LaboralKutxaParser")])
+        self.assertTrue(os.path.exists(os.path.join(self.tmp, STATE_FILE)))
+
+        # A new watcher (restart) finds the hash in the state file
+        self.assertEqual(self.poll(self.watcher(processor)), 0)
+        self.assertEqual(len(processor.calls), 1)
+
+    def test_failed_uploads_are_retried(self):
+        processor = FakeProcessor(failures=[2, None, 0])
+        watcher = self.watcher(processor, retry_seconds=0)
+
+        self.assertEqual(self.poll(watcher), 0)  # Some rows did not reach Notion
+        self.assertEqual(self.poll(watcher), 0)  # The import raised
+        self.assertEqual(self.poll(watcher), 1)
+        self.assertEqual(len(processor.calls), 3)
+        self.assertEqual(self.poll(watcher), 0)
+        self.assertEqual(len(processor.calls), 3)
+
+    def test_failed_file_waits_for_the_retry_delay(self):
+        processor = FakeProcessor(failures=[1])
+        watcher = self.watcher(processor, retry_seconds=3600)
+        self.poll(watcher)
+        self.poll(watcher)
+        self.assertEqual(len(processor.calls), 1)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, STATE_FILE)))
+
+
+if __name__ == "__main__":
+    unittest.main()